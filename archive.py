@@ -0,0 +1,63 @@
+"""
+Archival of checked-off grocery rows, for cron.
+
+    python archive.py --days 7 --batch-size 1000
+
+Purchased rows otherwise stay in grocery_items forever, and every list read
+sorts past them. Each one was logged to purchase_history when it was
+checked off (migration 9 backfilled the older ones), so archiving only has
+to delete the rows purchased more than --days ago from the hot table. The
+history and the spending rollups keep them.
+
+Deletes run in batches of --batch-size, each in its own short transaction,
+oldest first through ix_grocery_items_archive. Rows someone is editing at
+that moment are skipped (SKIP LOCKED on Postgres) and picked up next run.
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, tuple_
+
+from db import get_engine, grocery_items
+
+def _batch_stmt(cutoff, batch_size):
+    g = grocery_items.c
+    # (household_id, id) is the key of a partitioned table (partitioning.py)
+    oldest = (
+        select(g.household_id, g.id)
+        .where(g.purchased == True, g.purchased_at < cutoff)
+        .order_by(g.purchased_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    return delete(grocery_items).where(tuple_(g.household_id, g.id).in_(oldest))
+
+def archive_purchased(days: int = 7, batch_size: int = 1000, engine=None) -> int:
+    """
+    Delete grocery rows (every household's) purchased more than `days` days
+    ago. Returns how many were removed.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive")
+    engine = engine or get_engine()
+    stmt = _batch_stmt(datetime.utcnow() - timedelta(days=days), batch_size)
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            n = conn.execute(stmt).rowcount
+        total += n
+        if n < batch_size:
+            return total
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--days", type=int, default=7, help="keep rows purchased within this many days")
+    ap.add_argument("--batch-size", type=int, default=1000)
+    args = ap.parse_args(argv)
+    n = archive_purchased(args.days, args.batch_size)
+    print(f"Archived {n} purchased row(s).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Async data access for the web dashboard, on SQLAlchemy's asyncio extension.
+
+AsyncGroceryStore mirrors the db module's API with coroutines. It is built
+from the same statements, so both paths issue identical SQL. Every method
+checks out its own pooled connection, which lets independent reads run
+concurrently:
+
+    store = AsyncGroceryStore()
+    page = await store.dashboard()      # list, pantry and expiring at once
+    await store.dispose()
+
+Queries are scoped to db's current list and household, which is a
+ContextVar: each asyncio task (one per web request) can switch with
+`await store.set_list(list_id)` without affecting the others.
+
+The schema is still owned by db.init_db()/migrations.
+"""
+import asyncio
+import json
+import os
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import db
+from db import grocery_items, lists, pantry_items, purchase_history, recipe_ingredients, recipes
+
+def async_database_url(url: str) -> str:
+    """postgresql[+driver]://... -> postgresql+asyncpg://..."""
+    scheme, sep, rest = url.partition("://")
+    if scheme.split("+")[0] in ("postgresql", "postgres"):
+        return "postgresql+asyncpg" + sep + rest
+    return url
+
+class AsyncGroceryStore:
+    def __init__(self, url: str | None = None, pool_size: int | None = None,
+                 max_overflow: int | None = None, **engine_kwargs):
+        load_dotenv()
+        url = url or os.getenv("DATABASE_URL")
+        if not url:
+            raise RuntimeError("DATABASE_URL not set in .env")
+        # One dashboard render fans out to ~3 queries; size for a few at once
+        self.engine = create_async_engine(
+            async_database_url(url),
+            pool_size=pool_size or int(os.getenv("ASYNC_DB_POOL_SIZE", 10)),
+            max_overflow=max_overflow if max_overflow is not None else int(os.getenv("ASYNC_DB_MAX_OVERFLOW", 10)),
+            pool_pre_ping=True,
+            pool_recycle=1800,
+            **engine_kwargs,
+        )
+
+    async def dispose(self):
+        await self.engine.dispose()
+
+    async def _all(self, stmt, params=None):
+        async with self.engine.connect() as conn:
+            result = await conn.execute(stmt, params or {})
+            return result.mappings().all()
+
+    async def set_list(self, list_id: int) -> tuple[int, int]:
+        """Async db.set_list(): switch the current task to `list_id` and its household."""
+        async with self.engine.connect() as conn:
+            household_id = (await conn.execute(
+                select(lists.c.household_id).where(lists.c.id == list_id))).scalar()
+        if household_id is None:
+            raise ValueError(f"no list with id {list_id}")
+        db._scope.set((household_id, list_id))
+        return household_id, list_id
+
+    # --- grocery list ---
+    async def list_items(self):
+        rows = await self._all(select(grocery_items).where(db._on_list()).order_by(*db._LIST_ORDER))
+        return [db._grocery_row(r) for r in rows]
+
+    async def list_items_page(self, after: dict | None = None, limit: int = 50):
+        rows = await self._all(db._list_page_stmt(after, limit))
+        return [db._grocery_row(r) for r in rows]
+
+    async def shopping_list_page(self, after: dict | None = None, limit: int = 50):
+        rows = await self._all(*db._shopping_page_stmt(after, limit))
+        return [db._shopping_row(r) for r in rows]
+
+    async def add_item(self, name: str, quantity: float = 1.0, unit: str | None = None, snap: float | None = None):
+        return await self.add_items([{"name": name, "quantity": quantity, "unit": unit}], snap=snap)
+
+    async def add_items(self, rows, snap: float | None = None) -> dict:
+        payload = db._normalize_rows(rows)
+        if not payload:
+            return {"updated": 0, "inserted": 0}
+        async with self.engine.begin() as conn:
+            await conn.run_sync(db._with_ingredient_ids, payload)
+            if snap is not None:
+                await conn.run_sync(db._snap_ingredient_ids, payload, snap)
+            result = await conn.execute(db._ADD_ITEMS, db._scope_params(rows=json.dumps(payload), now=datetime.utcnow()))
+            return dict(result.mappings().one())
+
+    async def remove_item(self, item_id: int):
+        await self.remove_items([item_id])
+
+    async def remove_items(self, item_ids: list[int]) -> int:
+        async with self.engine.begin() as conn:
+            result = await conn.execute(delete(grocery_items).where(db._on_list(), grocery_items.c.id.in_(item_ids)))
+            return result.rowcount
+
+    async def toggle_purchased(self, item_id: int, price: float | None = None) -> bool:
+        async with self.engine.begin() as conn:
+            result = await conn.execute(db._toggle_stmt(item_id, price, datetime.utcnow()))
+            row = result.mappings().first()
+            if row is not None:
+                await conn.execute(purchase_history.insert(), db._history_rows([row], 1 if row["purchased"] else -1))
+        return bool(row and row["purchased"])
+
+    async def spending(self, period: str = "week", since=None) -> list[dict]:
+        if period not in db.PERIODS:
+            raise ValueError(f"period must be one of {', '.join(db.PERIODS)}")
+        rows = await self._all(db._spending_stmt(period, since))
+        return [{**r, "spent": round(r["spent"], 2)} for r in rows]
+
+    async def purchase_items(self, item_ids: list[int], pantry_overrides: dict | None = None) -> list[dict]:
+        async with self.engine.begin() as conn:
+            result = await conn.execute(db._PURCHASE, db._purchase_params(item_ids, pantry_overrides))
+            return [dict(r) for r in result.mappings().all()]
+
+    # --- recipes ---
+    async def create_recipe(self, title: str, source_url: str | None, ingredients: list[dict]) -> int:
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                recipes.insert().values(title=title, source_url=source_url, created_at=datetime.utcnow(),
+                                        household_id=db.current_scope()[0])
+            )
+            rid = result.inserted_primary_key[0]
+            ids = []
+            if ingredients:
+                names = [ing["name"] for ing in ingredients]
+                ids = await conn.run_sync(lambda c: db.ingredient_ids(names, conn=c))
+                await conn.execute(recipe_ingredients.insert(), [
+                    {"recipe_id": rid, "name": ing["name"], "quantity": float(ing.get("quantity") or 1),
+                     "unit": ing.get("unit"), "ingredient_id": iid}
+                    for ing, iid in zip(ingredients, ids)
+                ])
+        db._recipes_created([(rid, title, ids)])
+        return rid
+
+    async def get_recipe(self, recipe_id: int):
+        async with self.engine.connect() as conn:
+            r = (await conn.execute(db._recipe_stmt(recipe_id))).mappings().first()
+            if not r:
+                return None
+            ings = (await conn.execute(db._recipe_ingredients_stmt(recipe_id))).mappings().all()
+            return db._recipe_row(r, ings)
+
+    async def import_recipe(self, title: str, source_url: str | None, ingredients: list[dict]) -> int:
+        async with self.engine.begin() as conn:
+            params = await conn.run_sync(db._import_params, title, source_url, ingredients)
+            rid = (await conn.execute(db._IMPORT_RECIPE, params)).scalar_one()
+        db._recipes_created([db._imported(rid, params)])
+        return rid
+
+    async def add_recipe_to_grocery(self, recipe_id: int) -> bool:
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                db._ADD_RECIPE_TO_GROCERY, db._scope_params(recipe_id=recipe_id, now=datetime.utcnow())
+            )
+            return result.scalar_one()
+
+    async def plan_recipes(self, recipe_ids: list[int], dry_run: bool = False) -> list[dict]:
+        stmt, params = db._plan_stmt(recipe_ids, dry_run)
+        async with self.engine.begin() as conn:
+            result = await conn.execute(stmt, params)
+            return [dict(r) for r in result.mappings().all()]
+
+    # --- pantry ---
+    async def add_pantry_item(self, name: str, quantity: float = 1.0, unit: str | None = None,
+                              expires_at: str | None = None):
+        await self.add_pantry_items([{"name": name, "quantity": quantity, "unit": unit, "expires_at": expires_at}])
+
+    async def add_pantry_items(self, rows) -> int:
+        async with self.engine.begin() as conn:
+            values = await conn.run_sync(db._pantry_values, rows)
+            if values:
+                await conn.execute(pantry_items.insert(), values)
+        return len(values)
+
+    async def list_pantry_items(self):
+        rows = await self._all(select(pantry_items).where(db._in_household(pantry_items)).order_by(*db._PANTRY_ORDER))
+        return [db._pantry_row(r) for r in rows]
+
+    async def list_pantry_page(self, after: dict | None = None, limit: int = 50):
+        rows = await self._all(db._pantry_page_stmt(after, limit))
+        return [db._pantry_row(r) for r in rows]
+
+    async def get_expiring_items(self, days: int = 3):
+        rows = await self._all(db._expiring_stmt(days))
+        return [db._expiring_row(r) for r in rows]
+
+    # --- composite reads ---
+    async def dashboard(self, days: int = 3, limit: int = 50) -> dict:
+        """Everything one dashboard render needs, fetched concurrently."""
+        shopping, pantry, expiring = await asyncio.gather(
+            self.shopping_list_page(limit=limit),
+            self.list_pantry_page(limit=limit),
+            self.get_expiring_items(days),
+        )
+        return {"shopping_list": shopping, "pantry": pantry, "expiring": expiring}
@@ -0,0 +1,250 @@
+"""
+Benchmark for the database and recipe hot paths.
+
+    python benchmarks/bench_db.py                       # in-memory SQLite
+    python benchmarks/bench_db.py --url postgresql+psycopg2://localhost/grocery_bench --reset
+    python benchmarks/bench_db.py --json after.json --compare before.json
+
+Seeds a synthetic household (--grocery rows, --pantry rows, --recipes
+recipes) and times add_item, list_items, add_recipe_to_grocery,
+get_expiring_items, parse_pasted_ingredients and spoonacular_from_url
+against a local stub of the Spoonacular API. Reports the median, p95 and
+min per call; the JSON output can be compared with --compare to spot
+regressions between commits.
+
+Against a database that already has rows, --reset is required (every table
+is emptied first), so never point it at real data.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import func, select
+
+from bench_parser import NAMES, UNITS, make_document
+
+class _SpoonacularStub(BaseHTTPRequestHandler):
+    BODY = json.dumps({
+        "title": "Stub Recipe",
+        "extendedIngredients": [
+            {"name": "Tomatoes", "amount": 2, "unit": "cups"},
+            {"name": "butter", "measures": {"metric": {"amount": 30, "unitShort": "g"}}},
+            {"name": "Garlic Cloves", "amount": 3, "unit": "cloves"},
+            {"name": "salt", "amount": 1, "unit": "pinch"},
+        ],
+    }).encode()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.BODY)))
+        self.end_headers()
+        self.wfile.write(self.BODY)
+
+    def log_message(self, *args):
+        pass
+
+def start_stub() -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SpoonacularStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+def seed(n_grocery: int, n_pantry: int, n_recipes: int, seed: int = 1):
+    import db
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    today = date.today()
+    units = [u or None for u in UNITS]
+
+    def name(i):
+        return f"{rnd.choice(NAMES)} {i % 500}"
+
+    def with_ids(conn, rows):
+        for row, iid in zip(rows, db.ingredient_ids([r["name"] for r in rows], conn=conn)):
+            row["ingredient_id"] = iid
+        return rows
+
+    with db.transaction() as conn:
+        if n_grocery:
+            conn.execute(db.grocery_items.insert(), with_ids(conn, [
+                {"name": name(i), "purchased": rnd.random() < 0.3, "added_at": now,
+                 "quantity": float(rnd.randint(1, 5)), "unit": rnd.choice(units)}
+                for i in range(n_grocery)
+            ]))
+        if n_pantry:
+            conn.execute(db.pantry_items.insert(), with_ids(conn, [
+                {"name": name(i), "quantity": float(rnd.randint(1, 5)), "unit": rnd.choice(units),
+                 "expires_at": today + timedelta(days=rnd.randint(-10, 60)) if rnd.random() < 0.8 else None,
+                 "added_at": now}
+                for i in range(n_pantry)
+            ]))
+        if n_recipes:
+            conn.execute(db.recipes.insert(), [
+                {"title": f"Recipe {i}", "source_url": None, "created_at": now} for i in range(n_recipes)
+            ])
+            ids = list(conn.execute(select(db.recipes.c.id)).scalars())
+            conn.execute(db.recipe_ingredients.insert(), with_ids(conn, [
+                {"recipe_id": rid, "name": name(j), "quantity": float(rnd.randint(1, 3)), "unit": rnd.choice(units)}
+                for rid in ids for j in range(rnd.randint(4, 12))
+            ]))
+
+def reset():
+    import db
+    with db.transaction() as conn:
+        for table in reversed(db.metadata.sorted_tables):
+            # Reference data from the migrations, and the append-only ingredient catalog
+            if table in (db.units, db.ingredients):
+                continue
+            stmt = table.delete()
+            if table is db.households:
+                stmt = stmt.where(table.c.id != db.DEFAULT_HOUSEHOLD_ID)
+            elif table is db.lists:
+                stmt = stmt.where(table.c.id != db.DEFAULT_LIST_ID)
+            conn.execute(stmt)
+
+def row_count() -> int:
+    import db
+    with db.transaction() as conn:
+        return sum(conn.execute(select(func.count()).select_from(t)).scalar_one()
+                   for t in (db.grocery_items, db.pantry_items, db.recipes))
+
+def timeit(fn, repeat: int, warmup: int = 1, setup=None) -> dict:
+    """Stats of `repeat` timed calls of fn; `setup` runs untimed before each."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "n": repeat,
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_ms": samples[0],
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(result: dict, baseline: dict, threshold: float) -> list[str]:
+    """Ops whose median got slower than the baseline by more than `threshold` (0.2 = 20%)."""
+    regressions = []
+    print(f"\nvs {baseline['meta'].get('commit') or 'baseline'}:")
+    for op, stats in result["ops"].items():
+        old = baseline["ops"].get(op)
+        if not old:
+            continue
+        ratio = stats["median_ms"] / old["median_ms"] if old["median_ms"] else float("inf")
+        flag = "  REGRESSION" if ratio > 1 + threshold else ""
+        print(f"  {op:<28}{old['median_ms']:10.3f} -> {stats['median_ms']:10.3f} ms  x{ratio:.2f}{flag}")
+        if flag:
+            regressions.append(op)
+    return regressions
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--url", default="sqlite://", help="database URL (default: in-memory SQLite)")
+    ap.add_argument("--reset", action="store_true", help="empty every table before seeding")
+    ap.add_argument("--grocery", type=int, default=2000)
+    ap.add_argument("--pantry", type=int, default=1000)
+    ap.add_argument("--recipes", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="also write results to this file")
+    ap.add_argument("--compare", help="earlier --json output to compare against")
+    ap.add_argument("--threshold", type=float, default=0.2,
+                    help="median slowdown that counts as a regression (default 0.2 = 20%%)")
+    args = ap.parse_args(argv)
+
+    # db reads DATABASE_URL on first use
+    os.environ["DATABASE_URL"] = args.url
+    import db
+    import recipes
+    from http_client import ResponseCache
+
+    # Point the Spoonacular client at the local stub, with a throwaway cache
+    recipes.SPOON_BASE_URL = start_stub()
+    recipes.SPOON_KEY = "bench"
+    recipes.extract_cache = ResponseCache(os.path.join(tempfile.mkdtemp(prefix="grocery-bench-"), "cache.sqlite3"))
+
+    if args.reset:
+        reset()
+    elif row_count():
+        sys.exit("database is not empty; pass --reset to wipe it (never on real data)")
+    seed(args.grocery, args.pantry, args.recipes, args.seed)
+
+    rnd = random.Random(args.seed)
+    with db.transaction() as conn:
+        recipe_ids = list(conn.execute(select(db.recipes.c.id)).scalars())
+    paste = make_document(40, seed=args.seed)
+    counter = iter(range(10 ** 9))
+
+    ops = {
+        "add_item": lambda: db.add_item(f"{rnd.choice(NAMES)} {next(counter) % 1000}", 1.0, rnd.choice(UNITS) or None),
+        "list_items": db.list_items,
+        "add_recipe_to_grocery": lambda: db.add_recipe_to_grocery(rnd.choice(recipe_ids)),
+        "get_expiring_items": lambda: db.get_expiring_items(3),
+        "parse_pasted_ingredients": lambda: recipes.parse_pasted_ingredients("Bench", paste),
+        "spoonacular_from_url": lambda: recipes.spoonacular_from_url(
+            f"https://example.com/recipe/{next(counter)}", use_cache=False),
+        "spoonacular_from_url_cached": lambda: recipes.spoonacular_from_url("https://example.com/recipe/cached"),
+    }
+
+    def cold_parser():
+        # Same paste every call: without this each one would be all cache hits
+        recipes.parse_quantity_unit.cache_clear()
+        recipes.canonical_name.cache_clear()
+    setups = {"parse_pasted_ingredients": cold_parser}
+
+    engine = db.get_engine()
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "backend": engine.dialect.name,
+            "python": platform.python_version(),
+            "grocery": args.grocery, "pantry": args.pantry, "recipes": args.recipes,
+            "repeat": args.repeat, "seed": args.seed,
+        },
+        "ops": {},
+    }
+    print(f"{engine.dialect.name}: {args.grocery} grocery, {args.pantry} pantry, "
+          f"{args.recipes} recipes; {args.repeat} calls each")
+    for name, fn in ops.items():
+        stats = result["ops"][name] = timeit(fn, args.repeat, setup=setups.get(name))
+        print(f"  {name:<28}median {stats['median_ms']:9.3f} ms   "
+              f"p95 {stats['p95_ms']:9.3f} ms   min {stats['min_ms']:9.3f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
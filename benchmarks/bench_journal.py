@@ -0,0 +1,64 @@
+"""
+Write latency through the offline journal (journal.py) versus straight to the database.
+
+    python benchmarks/bench_journal.py                  # in-memory SQLite
+    python benchmarks/bench_journal.py --url postgresql+psycopg2://localhost/grocery_bench --reset
+
+Times one `add` queued in a scratch journal file against the same `add`
+committed to the database, then how long `sync` takes to replay --ops
+queued operations in batches of --batch-size, and a second sync of the
+same operations (all skipped by their idempotency keys).
+
+Like bench_db.py, it needs an empty database or --reset, so never point it
+at real data.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_db import reset, timeit
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--url", default="sqlite://", help="database URL (default: in-memory SQLite)")
+    ap.add_argument("--reset", action="store_true", help="empty every table first")
+    ap.add_argument("--ops", type=int, default=5000)
+    ap.add_argument("--batch-size", type=int, default=500)
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args(argv)
+
+    # db reads DATABASE_URL on first use
+    os.environ["DATABASE_URL"] = args.url
+    import db
+    import journal
+    if args.reset:
+        reset()
+    list_id = db.current_scope()[1]
+    with tempfile.TemporaryDirectory() as tmp:
+        j = journal.Journal(os.path.join(tmp, "journal.sqlite3"))
+        op = {"op": "add", "name": "milk", "quantity": 1, "unit": None}
+        queued = timeit(lambda: j.append([op], list_id), args.repeat)
+        direct = timeit(lambda: db.add_item("milk", 1, None), args.repeat)
+        print(f"{args.url}, best of {args.repeat}")
+        print(f"  queue one add:   median {queued['median_ms'] * 1000:>8.1f} µs   p95 {queued['p95_ms'] * 1000:>8.1f} µs")
+        print(f"  commit one add:  median {direct['median_ms'] * 1000:>8.1f} µs   p95 {direct['p95_ms'] * 1000:>8.1f} µs")
+
+        j.append([{"op": "add", "name": f"item {i % 500}", "quantity": 1, "unit": None}
+                  for i in range(args.ops - len(j.pending()))], list_id)
+        t = time.perf_counter()
+        summary = journal.sync(j, args.batch_size)
+        took = time.perf_counter() - t
+        print(f"  sync {summary['applied']} ops:   {took * 1000:>8.1f} ms ({summary['applied'] / took:,.0f} ops/s)")
+        with j._db() as conn:
+            conn.execute("UPDATE operations SET synced_at = NULL")
+        t = time.perf_counter()
+        summary = journal.sync(j, args.batch_size)
+        print(f"  resync (skipped {summary['skipped']}): {(time.perf_counter() - t) * 1000:>8.1f} ms")
+        j.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark for autocomplete and fuzzy matching (matching.py).
+
+    python benchmarks/bench_matching.py --names 5000 --repeat 5
+
+Builds a PrefixIndex over synthetic item names (no database) and prints
+the build time, then the mean time per complete() for short prefixes (the
+keystrokes of the item prompt) and per suggest() for misspelt names.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matching import PrefixIndex
+
+WORDS = [
+    "tomato", "roma", "cherry", "milk", "oat", "cheese", "cheddar", "rice", "basmati", "bean",
+    "black", "green", "onion", "red", "garlic", "butter", "peanut", "bread", "wheat", "apple",
+    "chicken", "breast", "thigh", "beef", "ground", "pepper", "bell", "olive", "oil", "yogurt",
+]
+
+def make_names(n: int, seed: int = 1) -> dict:
+    rnd = random.Random(seed)
+    names = {}
+    while len(names) < n:
+        # A numeric suffix keeps the vocabulary growing past the word list
+        name = " ".join(rnd.sample(WORDS, rnd.randint(1, 3))) + f" {len(names) % (n // 10 or 1)}"
+        names[name] = rnd.randint(1, 50)
+    return names
+
+def typo(name: str, rnd: random.Random) -> str:
+    i = rnd.randrange(len(name))
+    return name[:i] + name[i + 1:]
+
+def per_call(fn, args, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for a in args:
+            fn(a)
+        best = min(best, (time.perf_counter() - t) / len(args))
+    return best
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--names", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    names = make_names(args.names)
+    t = time.perf_counter()
+    index = PrefixIndex(names)
+    built = time.perf_counter() - t
+    rnd = random.Random(2)
+    prefixes = [w[:n] for w in WORDS for n in (1, 2, 3)]
+    typos = [typo(n, rnd) for n in rnd.sample(sorted(names), 50)]
+    print(f"{args.names} names, best of {args.repeat}")
+    print(f"  build:    {built * 1000:>10.1f} ms")
+    print(f"  complete: {per_call(index.complete, prefixes, args.repeat) * 1e6:>10.1f} µs/call")
+    print(f"  suggest:  {per_call(index.suggest, typos, args.repeat) * 1e6:>10.1f} µs/call")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Micro-benchmark for the ingredient parser.
+
+    python benchmarks/bench_parser.py --lines 5000 --repeat 5
+
+Prints lines/sec for a cold parse (caches cleared before every run) and a
+warm parse (the same document again, as when a paste is re-submitted).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recipes import canonical_name, parse_ingredient_lines, parse_quantity_unit
+
+QUANTITIES = ["1", "2", "1 1/2", "½", "3/4", "2-3", "1.5", "2 (14 oz)", ""]
+UNITS = ["cups", "tbsp", "teaspoons", "lb", "g", "ounces", "cans", "", ""]
+NAMES = [
+    "chopped tomatoes", "ground beef", "Spinach", "chicken breasts", "garlic cloves",
+    "olive oil", "Red Onions", "black beans", "shredded cheddar", "fresh basil leaves",
+]
+
+def make_document(n_lines: int, seed: int = 1) -> str:
+    rnd = random.Random(seed)
+    lines = []
+    for i in range(n_lines):
+        qty, unit = rnd.choice(QUANTITIES), rnd.choice(UNITS)
+        # A numeric suffix keeps most lines unique, like a real mixed paste
+        name = f"{rnd.choice(NAMES)} {i % (n_lines // 4 or 1)}"
+        lines.append(" ".join(p for p in (qty, unit, name) if p))
+    return "\n".join(lines)
+
+def run(doc: str, repeat: int, clear: bool) -> float:
+    n_lines = doc.count("\n") + 1
+    best = float("inf")
+    for _ in range(repeat):
+        if clear:
+            parse_quantity_unit.cache_clear()
+            canonical_name.cache_clear()
+        start = time.perf_counter()
+        for _ in parse_ingredient_lines(doc.splitlines()):
+            pass
+        best = min(best, time.perf_counter() - start)
+    return n_lines / best
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--lines", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    doc = make_document(args.lines)
+    print(f"{args.lines} lines, best of {args.repeat}")
+    print(f"  cold: {run(doc, args.repeat, clear=True):>12,.0f} lines/sec")
+    print(f"  warm: {run(doc, args.repeat, clear=False):>12,.0f} lines/sec")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Cold-start benchmark for the CLI.
+
+    python benchmarks/bench_startup.py --runs 10 [--json out.json]
+
+Measures, in fresh interpreters:
+  * import time of `grocery` from `python -X importtime` (total and the
+    slowest top-level imports),
+  * wall time until the interactive menu is first rendered,
+  * wall time of a one-shot command (`grocery.py --help`).
+Neither of the latter needs the database, so neither should connect.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MENU_PROMPT = b"Choose an option:"
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def import_profile(module: str = "grocery"):
+    """
+    Return (total_us, [(cumulative_us, name), ...]) where total is the
+    cumulative import time of `module` and the list holds the modules and
+    top-level packages it pulls in, slowest first.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    total, parts = 0, {}
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if not m:
+            continue
+        cumulative, name = int(m.group(2)), m.group(4)
+        if name == module:
+            total = cumulative
+        elif "." not in name:
+            parts[name] = max(parts.get(name, 0), cumulative)
+    return total, sorted(((us, name) for name, us in parts.items()), reverse=True)
+
+def time_to_menu() -> float:
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "grocery.py"], cwd=ROOT,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    seen = b""
+    while MENU_PROMPT not in seen:
+        chunk = proc.stdout.read1(4096)
+        if not chunk:
+            raise RuntimeError("grocery.py exited before rendering the menu")
+        seen += chunk
+    elapsed = time.perf_counter() - start
+    proc.communicate(b"7\n")
+    return elapsed
+
+def time_command(*args) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "grocery.py", *args], cwd=ROOT,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args(argv)
+
+    totals = []
+    for _ in range(args.runs):
+        total, top = import_profile()
+        totals.append(total)
+    menu = [time_to_menu() for _ in range(args.runs)]
+    helps = [time_command("--help") for _ in range(args.runs)]
+
+    result = {
+        "runs": args.runs,
+        "import_grocery_ms": statistics.median(totals) / 1000,
+        "slowest_imports_ms": {name: us / 1000 for us, name in top[:8]},
+        "time_to_menu_ms": statistics.median(menu) * 1000,
+        "help_command_ms": statistics.median(helps) * 1000,
+    }
+    print(f"import grocery:     {result['import_grocery_ms']:8.1f} ms (median of {args.runs})")
+    for name, ms in result["slowest_imports_ms"].items():
+        print(f"  {name:<24}{ms:8.1f} ms")
+    print(f"time to first menu: {result['time_to_menu_ms']:8.1f} ms")
+    print(f"grocery.py --help:  {result['help_command_ms']:8.1f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
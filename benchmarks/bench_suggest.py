@@ -0,0 +1,73 @@
+"""
+Micro-benchmark for the meal-suggestion index (suggest.RecipeIndex).
+
+    python benchmarks/bench_suggest.py --recipes 20000 --pantry 150 --repeat 20
+
+Builds an index over synthetic recipes (no database) and prints the build
+time and the best top-k time for a random pantry, with NumPy and with the
+pure-Python fallback, after checking that both rank the same recipes.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suggest import RecipeIndex, np
+
+def make_recipes(n: int, vocabulary: int, seed: int = 1):
+    rnd = random.Random(seed)
+    # A few staples (salt, onion, ...) show up in most recipes, as in real ones
+    weights = [1 / (i + 1) for i in range(vocabulary)]
+    return [
+        (i + 1, f"recipe {i + 1}", rnd.choices(range(1, vocabulary + 1), weights, k=rnd.randint(4, 15)))
+        for i in range(n)
+    ]
+
+def build(recipes, use_numpy: bool) -> tuple[RecipeIndex, float]:
+    t = time.perf_counter()
+    index = RecipeIndex(use_numpy=use_numpy)
+    for recipe_id, title, ids in recipes:
+        index.add(recipe_id, title, ids)
+    return index, time.perf_counter() - t
+
+def best_of(index: RecipeIndex, weights: dict, k: int, repeat: int) -> float:
+    index.top(weights, k)  # warm the per-ingredient arrays, as a long-running app would be
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        index.top(weights, k)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--recipes", type=int, default=20000)
+    ap.add_argument("--vocabulary", type=int, default=2000, help="distinct ingredients")
+    ap.add_argument("--pantry", type=int, default=150, help="distinct ingredients on hand")
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args(argv)
+
+    recipes = make_recipes(args.recipes, args.vocabulary)
+    rnd = random.Random(2)
+    weights = {iid: 1.0 + rnd.random() * rnd.choice((0, 1))
+               for iid in rnd.sample(range(1, args.vocabulary + 1), args.pantry)}
+    modes = [("python", False)] + ([("numpy", True)] if np is not None else [])
+    print(f"{args.recipes} recipes over {args.vocabulary} ingredients, pantry of {args.pantry}, "
+          f"top {args.top}, best of {args.repeat}")
+    ranked = {}
+    for name, use_numpy in modes:
+        index, built = build(recipes, use_numpy)
+        ranked[name] = [(pos, round(score, 9)) for pos, score in index.top(weights, args.top)]
+        took = best_of(index, weights, args.top, args.repeat)
+        print(f"  {name:>6}: build {built * 1000:>8.1f} ms   top-k {took * 1000:>8.3f} ms")
+    if np is None:
+        print("  (numpy not installed)")
+    elif ranked["numpy"] != ranked["python"]:
+        sys.exit("numpy and python rankings differ")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Per-list latency as the number of households grows.
+
+    python benchmarks/bench_tenants.py                  # in-memory SQLite
+    python benchmarks/bench_tenants.py --url postgresql+psycopg2://localhost/grocery_bench --reset
+    python benchmarks/bench_tenants.py --url ... --reset --partitions 16 --json part.json
+
+Grows the database in steps (--households 1,10,100,1000), each household
+with its own list of --grocery rows and --pantry rows, and after every step
+times the list, shopping-list, add, pantry and expiry reads of one fixed
+household. With the tenant-leading indexes the medians should stay flat
+while the tables grow a thousandfold. --partitions hash-partitions the
+tables first (Postgres only, see partitioning.py).
+
+Like bench_db.py, it needs an empty database or --reset, so never point it
+at real data.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import func, select, text
+
+from bench_db import git_commit, reset, row_count, timeit
+from bench_parser import NAMES, UNITS
+
+def fill(conn, household_id: int, list_id: int, n_grocery: int, n_pantry: int, rnd: random.Random):
+    import db
+    now = datetime.utcnow()
+    today = date.today()
+    units = [u or None for u in UNITS]
+    ids = dict(zip(NAMES, db.ingredient_ids(NAMES, conn=conn)))
+    names = [rnd.choice(NAMES) for _ in range(n_grocery + n_pantry)]
+    conn.execute(db.grocery_items.insert(), [
+        {"name": n, "purchased": rnd.random() < 0.3, "added_at": now,
+         "quantity": float(rnd.randint(1, 5)), "unit": rnd.choice(units),
+         "ingredient_id": ids[n], "household_id": household_id, "list_id": list_id}
+        for n in names[:n_grocery]
+    ])
+    conn.execute(db.pantry_items.insert(), [
+        {"name": n, "quantity": float(rnd.randint(1, 5)), "unit": rnd.choice(units),
+         "expires_at": today + timedelta(days=rnd.randint(-10, 60)), "added_at": now,
+         "ingredient_id": ids[n], "household_id": household_id}
+        for n in names[n_grocery:]
+    ])
+
+def grow(households: int, n_grocery: int, n_pantry: int, rnd: random.Random):
+    """Add households (each with one filled list) until there are `households`."""
+    import db
+    now = datetime.utcnow()
+    with db.transaction() as conn:
+        have = conn.execute(select(func.count()).select_from(db.households)).scalar_one()
+        for _ in range(households - have):
+            household_id = conn.execute(
+                db.households.insert().values(name="bench", created_at=now)
+            ).inserted_primary_key[0]
+            list_id = conn.execute(
+                db.lists.insert().values(household_id=household_id, name="Groceries", created_at=now)
+            ).inserted_primary_key[0]
+            fill(conn, household_id, list_id, n_grocery, n_pantry, rnd)
+        if conn.dialect.name == "postgresql":
+            # Fresh statistics, as autovacuum would eventually give a real install
+            conn.execute(text("ANALYZE grocery_items"))
+            conn.execute(text("ANALYZE pantry_items"))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--url", default="sqlite://", help="database URL (default: in-memory SQLite)")
+    ap.add_argument("--reset", action="store_true", help="empty every table before seeding")
+    ap.add_argument("--partitions", type=int, help="hash-partition by household first (Postgres)")
+    ap.add_argument("--households", default="1,10,100,1000", help="comma-separated growth steps")
+    ap.add_argument("--grocery", type=int, default=200, help="grocery rows per household")
+    ap.add_argument("--pantry", type=int, default=100, help="pantry rows per household")
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args(argv)
+    steps = sorted(int(n) for n in args.households.split(","))
+
+    # db reads DATABASE_URL on first use
+    os.environ["DATABASE_URL"] = args.url
+    import db
+
+    if args.reset:
+        reset()
+    elif row_count():
+        sys.exit("database is not empty; pass --reset to wipe it (never on real data)")
+    if args.partitions:
+        from partitioning import partition_by_household
+        partition_by_household(args.partitions)
+
+    rnd = random.Random(args.seed)
+    engine = db.get_engine()
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "backend": engine.dialect.name,
+            "partitions": args.partitions,
+            "python": platform.python_version(),
+            "grocery": args.grocery, "pantry": args.pantry, "repeat": args.repeat, "seed": args.seed,
+        },
+        "steps": [],
+    }
+    print(f"{engine.dialect.name}{f', {args.partitions} partitions' if args.partitions else ''}: "
+          f"{args.grocery} grocery + {args.pantry} pantry rows per household; {args.repeat} calls each")
+
+    ops = {
+        "list_items_page": lambda: db.list_items_page(limit=50),
+        "shopping_list_page": lambda: db.shopping_list_page(limit=50),
+        "add_item": lambda: db.add_item(rnd.choice(NAMES), 1.0, rnd.choice(UNITS) or None),
+        "list_pantry_page": lambda: db.list_pantry_page(limit=50),
+        "get_expiring_items": lambda: db.get_expiring_items(3),
+    }
+    if engine.dialect.name != "postgresql":
+        del ops["shopping_list_page"]  # array_agg() & co. are Postgres-only
+    # The default household (from the migrations) is the one probed; fill it like the others
+    with db.transaction() as conn:
+        fill(conn, db.DEFAULT_HOUSEHOLD_ID, db.DEFAULT_LIST_ID, args.grocery, args.pantry, rnd)
+
+    print(f"  {'households':>10}" + "".join(f"{op:>22}" for op in ops) + "   (median ms)")
+    for households in steps:
+        grow(households, args.grocery, args.pantry, rnd)
+        with db.use_list(db.DEFAULT_LIST_ID):
+            stats = {op: timeit(fn, args.repeat) for op, fn in ops.items()}
+        result["steps"].append({"households": households, "ops": stats})
+        print(f"  {households:>10}" + "".join(f"{s['median_ms']:>22.3f}" for s in stats.values()))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
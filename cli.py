@@ -0,0 +1,459 @@
+"""
+Non-interactive command line for scripts and cron jobs.
+
+    python grocery.py add milk --qty 2
+    python grocery.py add "roma tomatoes" --snap 0.4
+    python grocery.py complete tom
+    python grocery.py --json list
+    python grocery.py purchase 12 15 --expires 2025-10-01
+    python grocery.py pantry add rice --qty 2 --unit kg
+    python grocery.py recipe import --file urls.txt
+    python grocery.py recipe suggest --top 5
+    python grocery.py apply ops.ndjson --batch-size 500
+    python grocery.py import data/grocery_list.txt
+    python grocery.py export all --out digest/ --since 2025-10-01
+    python grocery.py lists add Chores
+    python grocery.py spending --period month --since 2025-01-01
+    python grocery.py --list 2 add "take out bins"
+    python grocery.py --offline add milk
+    python grocery.py sync
+
+`apply` streams NDJSON (or CSV with the same field names as columns) where
+every record is one operation:
+
+    {"op": "add", "name": "milk", "quantity": 2, "unit": null}
+    {"op": "remove", "id": 12}
+    {"op": "purchase", "id": 12, "expires_at": "2025-10-01", "price": 3.49}
+    {"op": "unpurchase", "id": 12}
+    {"op": "pantry_add", "name": "rice", "quantity": 2, "unit": "kg", "expires_at": null}
+
+Each batch of operations is committed in one transaction, and consecutive
+operations of the same kind are sent as one statement. A record may carry
+a "key" (any unique string): an operation whose key was applied before is
+skipped, so a stream can safely be sent again (this is how `sync` replays
+the offline journal, see journal.py).
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+import db
+import profiling
+from matching import SNAP_THRESHOLD, load_prefix_index
+
+OPS = ("add", "remove", "purchase", "unpurchase", "pantry_add")
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="grocery.py", description="Family grocery list.")
+    p.add_argument("--json", action="store_true", help="machine-readable JSON output")
+    p.add_argument("--profile", action="store_true",
+                   help="print statements, rows, transactions and timings per action to stderr on exit")
+    p.add_argument("--trace", metavar="FILE", help="like --profile, and write a JSON trace to FILE")
+    p.add_argument("--list", type=int, metavar="ID", dest="list_id",
+                   help="work on this list (and its household's pantry and recipes); default: list 1")
+    p.add_argument("--offline", action="store_true", default=os.getenv("GROCERY_OFFLINE") == "1",
+                   help="queue add/remove/purchase/pantry add (and the menu's writes) in the local journal; "
+                        "send them with `sync`")
+    sub = p.add_subparsers(dest="command")
+
+    a = sub.add_parser("add", help="add items to the grocery list")
+    a.add_argument("names", nargs="+")
+    a.add_argument("--qty", type=float, default=1.0)
+    a.add_argument("--unit")
+    a.add_argument("--snap", type=float, nargs="?", const=SNAP_THRESHOLD, metavar="THRESHOLD",
+                   help=f"merge into the most similar item on the list (similarity 0-1, default {SNAP_THRESHOLD})")
+
+    l = sub.add_parser("list", help="print the grocery list")
+    l.add_argument("--raw", action="store_true", help="one line per stored row instead of aggregated")
+
+    pu = sub.add_parser("purchase", help="check off items and move them to the pantry")
+    pu.add_argument("ids", nargs="+", type=int)
+    pu.add_argument("--expires", help="expiration date for the pantry (YYYY-MM-DD)")
+    pu.add_argument("--price", type=float, help="price paid for each item, for the spending rollups")
+
+    r = sub.add_parser("remove", help="remove items")
+    r.add_argument("ids", nargs="+", type=int)
+
+    pantry = sub.add_parser("pantry", help="pantry commands")
+    psub = pantry.add_subparsers(dest="pantry_command", required=True)
+    pa = psub.add_parser("add")
+    pa.add_argument("name")
+    pa.add_argument("--qty", type=float, default=1.0)
+    pa.add_argument("--unit")
+    pa.add_argument("--expires")
+    psub.add_parser("list")
+    pe = psub.add_parser("expiring")
+    pe.add_argument("--days", type=int, default=3)
+
+    recipe = sub.add_parser("recipe", help="recipe commands")
+    rsub = recipe.add_subparsers(dest="recipe_command", required=True)
+    ri = rsub.add_parser("import", help="import recipe URLs and add their ingredients")
+    ri.add_argument("urls", nargs="*")
+    ri.add_argument("--file", help="file with one URL per line ('-' for stdin)")
+    ri.add_argument("--workers", type=int, default=8)
+    rp = rsub.add_parser("plan", help="add what the recipes need beyond the pantry")
+    rp.add_argument("ids", nargs="+", type=int)
+    rp.add_argument("--dry-run", action="store_true")
+    rs = rsub.add_parser("suggest", help="recipes that use up the pantry (see suggest.py)")
+    rs.add_argument("--top", type=int, default=10)
+    rs.add_argument("--days", type=int, default=7, help="favour items expiring within this many days")
+
+    ap = sub.add_parser("apply", help="apply a stream of NDJSON/CSV operations")
+    ap.add_argument("file", help="operations file ('-' for stdin)")
+    ap.add_argument("--format", choices=("ndjson", "csv"), help="default: from the file extension")
+    ap.add_argument("--batch-size", type=int, default=500)
+
+    im = sub.add_parser("import", help="bulk-load a legacy .txt list or a CSV dump (see importer.py)")
+    im.add_argument("file")
+    im.add_argument("--into", choices=("grocery", "pantry"), help="default: grocery for .txt, pantry for .csv")
+
+    ex = sub.add_parser("export", help="stream the list, pantry or recipes to CSV/NDJSON/JSON (see exporter.py)")
+    ex.add_argument("kind", choices=("grocery", "pantry", "recipes", "all"))
+    ex.add_argument("--out", default="-", help="file ('-' for stdout), or a directory for 'all'")
+    ex.add_argument("--format", choices=("csv", "ndjson", "json"), help="default: from the file extension")
+    ex.add_argument("--since", help="only rows added/created at or after this date or ISO timestamp")
+
+    ls = sub.add_parser("lists", help="show or add the household's lists")
+    lsub = ls.add_subparsers(dest="lists_command")
+    la = lsub.add_parser("add")
+    la.add_argument("name")
+
+    co = sub.add_parser("complete", help="known item names starting with PREFIX (for shell completion)")
+    co.add_argument("prefix")
+    co.add_argument("--top", type=int, default=8)
+
+    sp = sub.add_parser("spending", help="items bought and money spent per week or month")
+    sp.add_argument("--period", choices=db.PERIODS, default="week")
+    sp.add_argument("--since", help="first period to show (YYYY-MM-DD)")
+
+    sy = sub.add_parser("sync", help="send operations queued with --offline to the database (see journal.py)")
+    sy.add_argument("--batch-size", type=int, default=500)
+    return p
+
+# --- output ---
+def _emit(args, payload, text_lines=()):
+    if args.json:
+        print(json.dumps(payload, default=str))
+    else:
+        for line in text_lines:
+            print(line)
+
+def _qty(q):
+    return f"{q:.2f}".rstrip("0").rstrip(".")
+
+# --- commands ---
+def cmd_add(args):
+    rows = [{"name": n, "quantity": args.qty, "unit": args.unit} for n in args.names]
+    counts = db.add_items(rows, snap=args.snap)
+    _emit(args, counts, [f"Added: {n}" for n in args.names])
+
+def cmd_list(args):
+    rows = db.iter_items() if args.raw else iter(db.shopping_list())
+    for row in rows:
+        if args.json:
+            print(json.dumps(row, default=str))
+        else:
+            box = "☑" if row["purchased"] else "☐"
+            unit = f" {row['unit']}" if row.get("unit") else ""
+            print(f"{row['id']}\t{box} {row['name']} — {_qty(row['quantity'])}{unit}")
+
+def cmd_purchase(args):
+    override = {k: v for k, v in (("expires_at", args.expires), ("price", args.price)) if v is not None}
+    overrides = {i: override for i in args.ids} if override else None
+    bought = db.purchase_items(args.ids, overrides)
+    _emit(args, {"purchased": bought}, [f"Purchased: {r['name']}" for r in bought])
+
+def cmd_remove(args):
+    n = db.remove_items(args.ids)
+    _emit(args, {"removed": n}, [f"Removed {n} item(s)."])
+
+def cmd_pantry(args):
+    if args.pantry_command == "add":
+        db.add_pantry_item(args.name, args.qty, args.unit, args.expires)
+        _emit(args, {"added": 1}, [f"Added {args.name} to pantry."])
+    elif args.pantry_command == "list":
+        for row in db.iter_pantry_items():
+            if args.json:
+                print(json.dumps(row, default=str))
+            else:
+                unit = f" {row['unit']}" if row["unit"] else ""
+                exp = f" (expires {row['expires_at']})" if row["expires_at"] else ""
+                print(f"{row['id']}\t{row['name']} — {row['quantity']}{unit}{exp}")
+    else:
+        rows = db.get_expiring_items(args.days)
+        _emit(args, rows, [f"- {e['name']} (expires {e['expires_at']})" for e in rows])
+
+def cmd_recipe(args):
+    if args.recipe_command == "plan":
+        rows = db.plan_recipes(args.ids, dry_run=args.dry_run)
+        _emit(args, rows, [
+            f"{'+' if r['missing'] > 1e-9 else '='} {r['name']} — buy {_qty(r['missing'])}"
+            f"{(' ' + r['unit']) if r['unit'] else ''}"
+            for r in rows
+        ])
+        return
+    if args.recipe_command == "suggest":
+        from suggest import suggest_meals
+        rows = suggest_meals(args.top, horizon_days=args.days)
+        _emit(args, rows, [
+            f"{r['id']}\t{r['title']} — have {r['have']}/{r['total']}"
+            f"{' (uses ' + ', '.join(r['expiring']) + ')' if r['expiring'] else ''}"
+            for r in rows
+        ] or ["No recipe uses anything in the pantry."])
+        return
+
+    from recipes import fetch_recipes
+    urls = list(args.urls)
+    if args.file:
+        try:
+            f = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+        except OSError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+        with f:
+            urls += [l.strip() for l in f if l.strip() and not l.strip().startswith("#")]
+    results = fetch_recipes(urls, max_workers=args.workers)
+    fetched = [data for _, data, err in results if err is None]
+    ids = db.import_recipes(fetched) if fetched else []
+    failed = [{"url": url, "error": str(err)} for url, _, err in results if err is not None]
+    _emit(
+        args,
+        {"imported": [{"id": i, "title": d["title"], "source_url": d["source_url"]} for i, d in zip(ids, fetched)],
+         "failed": failed},
+        [f"✓ {d['title']}" for d in fetched] + [f"✗ {f['url']}: {f['error']}" for f in failed],
+    )
+    return 1 if failed and not fetched else 0
+
+# --- apply ---
+def read_operations(f, fmt: str):
+    """Lazily yield (line_no, op_dict) from an NDJSON or CSV stream."""
+    if fmt == "csv":
+        for n, rec in enumerate(csv.DictReader(f), 2):
+            yield n, {k: (v if v != "" else None) for k, v in rec.items()}
+    else:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield n, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield n, {"_error": f"invalid JSON: {e}"}
+
+def _validate(op: dict) -> dict:
+    if "_error" in op:
+        raise ValueError(op["_error"])
+    kind = op.get("op")
+    if kind not in OPS:
+        raise ValueError(f"unknown op {kind!r}")
+    if kind in ("add", "pantry_add"):
+        if not (op.get("name") or "").strip():
+            raise ValueError("missing name")
+        if op.get("quantity") is not None:
+            op["quantity"] = float(op["quantity"])
+    else:
+        op["id"] = int(op["id"])
+        if isinstance(op.get("pantry"), str):  # CSV
+            op["pantry"] = op["pantry"].strip().lower() not in ("0", "false", "no")
+    return op
+
+def _apply_run(conn, kind, ops):
+    if kind == "add":
+        db.add_items(ops, conn=conn)
+    elif kind == "pantry_add":
+        db.add_pantry_items(ops, conn=conn)
+    elif kind == "remove":
+        db.remove_items([o["id"] for o in ops], conn=conn)
+    elif kind == "unpurchase":
+        db.unpurchase_items([o["id"] for o in ops], conn=conn)
+    else:
+        # An item checked off twice keeps the first purchase, as if applied one by one
+        overrides = {}
+        for o in ops:
+            overrides.setdefault(o["id"], {k: o[k] for k in ("quantity", "unit", "expires_at", "pantry", "price")
+                                           if o.get(k) is not None})
+        db.purchase_items(list(overrides), {i: v for i, v in overrides.items() if v}, conn=conn)
+
+def _unapplied(conn, batch):
+    # Claim the batch's keys in its transaction; drop operations (and repeats
+    # within the batch) whose key is already taken
+    fresh = db.claim_operation_keys([op["key"] for _, op in batch if op.get("key")], conn)
+    todo = []
+    for line_no, op in batch:
+        key = op.get("key")
+        if not key:
+            todo.append((line_no, op))
+        elif key in fresh:
+            fresh.discard(key)
+            todo.append((line_no, op))
+    return todo
+
+def apply_operations(records, batch_size: int = 500) -> dict:
+    """
+    Apply (line_no, op) records, committing every `batch_size` operations.
+    Invalid records are reported and skipped; a batch that fails in the
+    database is rolled back and reported without stopping later batches.
+    """
+    summary = {"applied": 0, "skipped": 0, "batches": 0, "errors": []}
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, batch_size))
+        if not chunk:
+            break
+        batch = []
+        for line_no, op in chunk:
+            try:
+                batch.append((line_no, _validate(dict(op))))
+            except (ValueError, TypeError, KeyError) as e:
+                summary["errors"].append({"line": line_no, "error": str(e)})
+        if not batch:
+            continue
+        try:
+            with db.transaction() as conn:
+                todo = _unapplied(conn, batch)
+                for kind, run in itertools.groupby(todo, key=lambda r: r[1]["op"]):
+                    _apply_run(conn, kind, [op for _, op in run])
+            summary["applied"] += len(todo)
+            summary["skipped"] += len(batch) - len(todo)
+        except Exception as e:
+            summary["errors"].append({"lines": [batch[0][0], batch[-1][0]], "error": str(e).splitlines()[0]})
+        summary["batches"] += 1
+    return summary
+
+def cmd_apply(args):
+    fmt = args.format or ("csv" if args.file.lower().endswith(".csv") else "ndjson")
+    try:
+        f = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8", newline="")
+    except OSError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    with f:
+        summary = apply_operations(read_operations(f, fmt), args.batch_size)
+    _emit(args, summary, [f"Applied {summary['applied']} operation(s) in {summary['batches']} batch(es)."
+                          + (f" Skipped {summary['skipped']} already applied." if summary["skipped"] else "")]
+          + [f"error: {e}" for e in summary["errors"]])
+    return 1 if summary["errors"] else 0
+
+def cmd_import(args):
+    from importer import import_file
+    try:
+        summary = import_file(args.file, args.into)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    _emit(args, summary, [f"Read {summary['read']} row(s): {summary['inserted']} inserted, "
+                          f"{summary['updated']} merged into existing items"
+                          + (f", {summary['history']} added to purchase history." if summary.get("history")
+                             else ".")]
+          + [f"line {e['line']}: {e['error']}" for e in summary["errors"]])
+    return 1 if summary["errors"] else 0
+
+def cmd_export(args):
+    import exporter
+    if args.kind == "all" and args.out == "-":
+        print("error: export all needs --out DIRECTORY", file=sys.stderr)
+        return 2
+    try:
+        since = exporter.parse_since(args.since)
+        if args.kind == "all":
+            counts = exporter.export_all(args.out, args.format or "csv", since)
+        else:
+            fmt = args.format or ("ndjson" if args.out == "-" else None)
+            counts = {args.kind: exporter.export(args.kind, args.out, fmt, since)}
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    if args.out != "-":
+        _emit(args, counts, [f"Exported {n} {kind} row(s)." for kind, n in counts.items()])
+
+def cmd_lists(args):
+    if args.lists_command == "add":
+        try:
+            list_id = db.create_list(args.name)
+        except IntegrityError:  # uq_lists_household_name
+            print(f"error: list {args.name!r} already exists", file=sys.stderr)
+            return 2
+        _emit(args, {"id": list_id, "name": args.name}, [f"Added list {list_id}: {args.name}"])
+        return
+    current = db.current_scope()[1]
+    rows = db.get_lists()
+    _emit(args, rows, [f"{'*' if r['id'] == current else ' '} {r['id']}\t{r['name']}" for r in rows])
+
+def cmd_complete(args):
+    names = load_prefix_index().complete(args.prefix, args.top)
+    _emit(args, names, names)
+
+def cmd_spending(args):
+    try:
+        since = datetime.strptime(args.since, "%Y-%m-%d").date() if args.since else None
+    except ValueError:
+        print("error: --since must be YYYY-MM-DD", file=sys.stderr)
+        return 2
+    rows = db.spending(args.period, since)
+    lines = []
+    for r in rows:
+        unpriced = r["item_count"] - r["priced_count"]
+        lines.append(f"{r['period_start']}\t{r['item_count']} item(s)\t{r['spent']:.2f}"
+                     + (f" ({unpriced} without a price)" if unpriced else ""))
+    _emit(args, rows, lines or ["No purchases yet."])
+
+def queued_operations(args):
+    """The apply records for a write command that --offline queues, else None."""
+    if args.command == "add":
+        return [{"op": "add", "name": n, "quantity": args.qty, "unit": args.unit} for n in args.names]
+    if args.command == "remove":
+        return [{"op": "remove", "id": i} for i in args.ids]
+    if args.command == "purchase":
+        return [{"op": "purchase", "id": i, "expires_at": args.expires, "price": args.price} for i in args.ids]
+    if args.command == "pantry" and args.pantry_command == "add":
+        return [{"op": "pantry_add", "name": args.name, "quantity": args.qty, "unit": args.unit,
+                 "expires_at": args.expires}]
+    return None
+
+def cmd_queue(args, ops):
+    from journal import Journal
+    journal = Journal()
+    # The list given with --list, unchecked: the database may be unreachable
+    keys = journal.append(ops, args.list_id or db.current_scope()[1])
+    pending = journal.counts()["pending"]
+    _emit(args, {"queued": len(keys), "pending": pending},
+          [f"Queued {len(keys)} operation(s); {pending} waiting for `sync`."])
+
+def cmd_sync(args):
+    import journal
+    summary = journal.sync(batch_size=args.batch_size)
+    lines = [f"Applied {summary['applied']} operation(s)"
+             + (f", skipped {summary['skipped']} already applied" if summary["skipped"] else "") + "."]
+    lines += [f"rejected #{r['seq']}: {r['error']}" for r in summary["rejected"]]
+    if summary["offline"]:
+        lines.append(f"Database unreachable ({summary['error']}); {summary['pending']} operation(s) still queued.")
+    _emit(args, summary, lines)
+    return 1 if summary["offline"] or summary["rejected"] else 0
+
+COMMANDS = {
+    "add": cmd_add,
+    "list": cmd_list,
+    "purchase": cmd_purchase,
+    "remove": cmd_remove,
+    "pantry": cmd_pantry,
+    "recipe": cmd_recipe,
+    "apply": cmd_apply,
+    "import": cmd_import,
+    "export": cmd_export,
+    "lists": cmd_lists,
+    "complete": cmd_complete,
+    "spending": cmd_spending,
+    "sync": cmd_sync,
+}
+
+def run(args) -> int:
+    with profiling.operation(args.command):
+        ops = queued_operations(args) if args.offline else None
+        if ops is not None:
+            return cmd_queue(args, ops) or 0
+        return COMMANDS[args.command](args) or 0
@@ -1,20 +1,92 @@
 import os
+import json
+import threading
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 from dotenv import load_dotenv
 from sqlalchemy import (
-    create_engine, MetaData, Table, Column,
-    Integer, String, Boolean, DateTime, Float, ForeignKey, Date, text, select, delete, update
+    create_engine, event, MetaData, Table, Column,
+    Integer, String, Boolean, DateTime, Float, ForeignKey, Date, UniqueConstraint, text, select,
+    delete, update, tuple_, and_, or_, func, bindparam, case
 )
+from sqlalchemy.engine import Engine
 
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise RuntimeError("DATABASE_URL not set in .env")
-
-engine = create_engine(DATABASE_URL, future=True)
 metadata = MetaData()
 
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """
+    The shared engine, created on first use. The first call also brings the
+    schema up to date (a single version query when nothing changed), so
+    commands that never touch the database never connect.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                load_dotenv()
+                url = os.getenv("DATABASE_URL")
+                if not url:
+                    raise RuntimeError("DATABASE_URL not set in .env")
+                eng = create_engine(url, future=True)
+                if eng.dialect.name == "sqlite":
+                    event.listen(eng, "connect", _sqlite_connect)
+                from migrations import migrate
+                migrate(eng)
+                _engine = eng
+    return _engine
+
+def _sqlite_connect(dbapi_conn, _record):
+    # SQLite (benchmarks, throwaway databases) gets canonical_name() from Python
+    from recipes import canonical_name
+    dbapi_conn.create_function("canonical_name", 1, canonical_name, deterministic=True)
+
+def _portable(conn) -> bool:
+    # The set-based statements below use Postgres-only SQL (data-modifying
+    # CTEs, jsonb); other backends take a row-at-a-time path instead.
+    return conn.dialect.name != "postgresql"
+
+def __getattr__(name):
+    # `db.engine` still works for older callers, but no longer connects at import
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # --- Tables ---
+# Catalog of canonical ingredient names (recipes.canonical_name). Rows are
+# never updated or deleted, so a name's id can be memoized for good.
+ingredients = Table(
+    "ingredients",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("name", String(200), nullable=False, unique=True),
+)
+
+# Tenancy: a household (one family) owns its pantry, recipes and any number
+# of lists (Groceries, Chores, To-Do). Rows created before multi-tenancy
+# belong to household 1 and its list 1.
+households = Table(
+    "households",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("name", String(200), nullable=False),
+    Column("created_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+lists = Table(
+    "lists",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("household_id", Integer, ForeignKey("households.id"), nullable=False),
+    Column("name", String(200), nullable=False),
+    Column("created_at", DateTime, nullable=False, default=datetime.utcnow),
+    UniqueConstraint("household_id", "name", name="uq_lists_household_name"),
+)
+
 grocery_items = Table(
     "grocery_items",
     metadata,
@@ -25,6 +97,47 @@ grocery_items = Table(
     # NEW in Week 6:
     Column("quantity", Float, nullable=False, server_default=text("1")),
     Column("unit", String(50), nullable=True),
+    Column("ingredient_id", Integer, ForeignKey("ingredients.id"), nullable=True),
+    # household_id is denormalized from the list so it can be the partition key
+    Column("household_id", Integer, ForeignKey("households.id"), nullable=False, server_default=text("1")),
+    Column("list_id", Integer, ForeignKey("lists.id"), nullable=False, server_default=text("1")),
+    # Set when the row is checked off; archive.py moves old purchased rows out
+    Column("purchased_at", DateTime, nullable=True),
+    Column("price", Float, nullable=True),
+)
+
+# Append-only log of checked-off items. Un-checking one appends a row with
+# delta -1 and quantity and price negated, dated like the purchase it
+# cancels, so sums over any range net out. Rows outlive the grocery rows
+# they came from (item_id), which archive.py deletes.
+purchase_history = Table(
+    "purchase_history",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("household_id", Integer, ForeignKey("households.id"), nullable=False),
+    Column("list_id", Integer, ForeignKey("lists.id"), nullable=False),
+    Column("item_id", Integer, nullable=True),
+    Column("ingredient_id", Integer, ForeignKey("ingredients.id"), nullable=True),
+    Column("name", String(200), nullable=False),
+    Column("quantity", Float, nullable=False),
+    Column("unit", String(50), nullable=True),
+    Column("price", Float, nullable=True),
+    Column("purchased_at", DateTime, nullable=False),
+    Column("delta", Integer, nullable=False, server_default=text("1")),
+)
+
+# Per-household totals by week (starting Monday) and month, kept current by a
+# Postgres trigger on purchase_history (migration 9), so charts never scan the log.
+# priced_count counts the purchases that had a price; spent sums those.
+purchase_rollups = Table(
+    "purchase_rollups",
+    metadata,
+    Column("household_id", Integer, ForeignKey("households.id"), primary_key=True),
+    Column("period", String(10), primary_key=True),  # 'week' or 'month'
+    Column("period_start", Date, primary_key=True),
+    Column("item_count", Integer, nullable=False, server_default=text("0")),
+    Column("priced_count", Integer, nullable=False, server_default=text("0")),
+    Column("spent", Float, nullable=False, server_default=text("0")),
 )
 
 pantry_items = Table(
@@ -36,6 +149,10 @@ pantry_items = Table(
     Column("unit", String(50), nullable=True),
     Column("expires_at", Date, nullable=True),  # NEW: expiration date
     Column("added_at", DateTime, nullable=False, default=datetime.utcnow),
+    Column("ingredient_id", Integer, ForeignKey("ingredients.id"), nullable=True),
+    Column("household_id", Integer, ForeignKey("households.id"), nullable=False, server_default=text("1")),
+    # The last alert expiry.scan() sent for this row: 'expiring' or 'expired'
+    Column("alerted", String(10), nullable=True),
 )
 
 recipes = Table(
@@ -45,6 +162,7 @@ recipes = Table(
     Column("title", String(300), nullable=False),
     Column("source_url", String(1000), nullable=True),
     Column("created_at", DateTime, nullable=False, default=datetime.utcnow),
+    Column("household_id", Integer, ForeignKey("households.id"), nullable=False, server_default=text("1")),
 )
 
 recipe_ingredients = Table(
@@ -55,198 +173,1227 @@ recipe_ingredients = Table(
     Column("name", String(200), nullable=False),
     Column("quantity", Float, nullable=False, server_default=text("1")),
     Column("unit", String(50), nullable=True),
+    Column("ingredient_id", Integer, ForeignKey("ingredients.id"), nullable=True),
+)
+
+# Unit spellings -> canonical unit, its family (volume/mass) and the factor
+# to the family's base unit (ml / g). Seeded from recipes.UNIT_ALIASES.
+units = Table(
+    "units",
+    metadata,
+    Column("alias", String(50), primary_key=True),
+    Column("unit", String(50), nullable=False),
+    Column("family", String(20), nullable=True),
+    Column("factor", Float, nullable=False, server_default=text("1")),
+)
+
+# When and how far each household's last expiry scan looked (see expiry.py)
+expiry_scans = Table(
+    "expiry_scans",
+    metadata,
+    Column("name", String(50), primary_key=True),
+    Column("expired_through", Date, nullable=True),
+    Column("soon_through", Date, nullable=True),
+    Column("scanned_at", DateTime, nullable=True),
 )
 
+# Idempotency keys of operations already applied (see journal.py): a batch
+# replayed after a lost acknowledgement skips what it already did.
+applied_operations = Table(
+    "applied_operations",
+    metadata,
+    Column("key", String(64), primary_key=True),
+    Column("household_id", Integer, ForeignKey("households.id"), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+@contextmanager
+def _begin(conn=None):
+    # Join the caller's transaction if one is passed in, else open our own
+    if conn is not None:
+        yield conn
+    else:
+        with get_engine().begin() as c:
+            yield c
+
+def transaction():
+    """
+    Group several writes into one transaction:
+        with db.transaction() as conn:
+            add_items(rows, conn=conn)
+            purchase_items(ids, conn=conn)
+    """
+    return get_engine().begin()
+
 def init_db():
-    # Create tables if they don't exist
-    metadata.create_all(engine)
-    # Ensure new columns exist (safe on Postgres)
-    with engine.begin() as conn:
-        conn.execute(text("""
-            ALTER TABLE grocery_items
-            ADD COLUMN IF NOT EXISTS quantity DOUBLE PRECISION DEFAULT 1
-        """))
-        conn.execute(text("""
-            ALTER TABLE grocery_items
-            ADD COLUMN IF NOT EXISTS unit VARCHAR(50)
-        """))
+    # Re-check the schema explicitly; get_engine() already does this once on first use
+    from migrations import migrate
+    migrate(get_engine())
+
+# --- Ingredient catalog ---
+# engine -> {canonical name: id}: ids belong to one database, so each
+# engine has its own memo. Only ids from committed rows land here: ones
+# created inside a transaction wait in conn.info until it commits.
+_INGREDIENT_IDS = weakref.WeakKeyDictionary()
+_PENDING = "pending_ingredient_ids"
+
+def _known_ids(conn) -> dict:
+    return _INGREDIENT_IDS.setdefault(conn.engine, {})
+
+def _insert_ignore(conn, table):
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table).on_conflict_do_nothing()
+
+def ingredient_ids(names, conn=None) -> list[int]:
+    """
+    Catalog ids for `names` (any spelling: canonical_name() decides), in
+    order, adding catalog rows for names seen for the first time. Costs no
+    query once every name has been seen.
+    """
+    from recipes import canonical_name
+    keys = [canonical_name(n) for n in names]
+    with _begin(conn) as conn:
+        known = _known_ids(conn)
+        pending = conn.info.get(_PENDING, {})
+        missing = {k for k in keys if k not in known and k not in pending}
+        if missing:
+            lookup = select(ingredients.c.name, ingredients.c.id)
+            known.update(conn.execute(lookup.where(ingredients.c.name.in_(missing))).all())
+            new = missing - known.keys()
+            if new:
+                conn.execute(_insert_ignore(conn, ingredients), [{"name": k} for k in sorted(new)])
+                pending = conn.info.setdefault(_PENDING, {})
+                pending.update(conn.execute(lookup.where(ingredients.c.name.in_(new))).all())
+        return [known.get(k) or pending[k] for k in keys]
+
+@event.listens_for(Engine, "commit")
+def _promote_ingredient_ids(conn):
+    pending = conn.info.pop(_PENDING, None)
+    if pending:
+        _known_ids(conn).update(pending)
+
+@event.listens_for(Engine, "rollback")
+def _drop_ingredient_ids(conn):
+    conn.info.pop(_PENDING, None)
+
+def claim_operation_keys(keys, conn) -> set[str]:
+    """
+    Record idempotency keys in the caller's transaction. Returns the ones
+    not seen before, i.e. whose operations should run now; if the
+    transaction rolls back, so do the claims.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return set()
+    rows = [{"key": k, "household_id": _scope.get()[0], "applied_at": datetime.utcnow()} for k in keys]
+    stmt = _insert_ignore(conn, applied_operations).returning(applied_operations.c.key)
+    return set(conn.execute(stmt, rows).scalars())
+
+# --- Households and lists ---
+# Every query below works on the current list and its household. The scope
+# is a ContextVar, so each asyncio task sees its own (new threads start on
+# the default list).
+DEFAULT_HOUSEHOLD_ID = 1
+DEFAULT_LIST_ID = 1
+_scope = ContextVar("grocery_scope", default=(DEFAULT_HOUSEHOLD_ID, DEFAULT_LIST_ID))
+
+def current_scope() -> tuple[int, int]:
+    """(household_id, list_id) that the functions in this module work on."""
+    return _scope.get()
+
+def _scope_params(**params) -> dict:
+    household_id, list_id = _scope.get()
+    return {"household_id": household_id, "list_id": list_id, **params}
+
+def _on_list(table=None):
+    # household_id too, so a hash-partitioned table (partitioning.py) is pruned
+    table = table if table is not None else grocery_items
+    household_id, list_id = _scope.get()
+    return and_(table.c.household_id == household_id, table.c.list_id == list_id)
+
+def _in_household(table):
+    return table.c.household_id == _scope.get()[0]
+
+def _list_scope(list_id):
+    with get_engine().begin() as conn:
+        household_id = conn.execute(select(lists.c.household_id).where(lists.c.id == list_id)).scalar()
+    if household_id is None:
+        raise ValueError(f"no list with id {list_id}")
+    return household_id, list_id
+
+def set_list(list_id: int) -> tuple[int, int]:
+    """Switch this context to `list_id` (and the household that owns it)."""
+    scope = _list_scope(list_id)
+    _scope.set(scope)
+    return scope
+
+@contextmanager
+def use_list(list_id: int):
+    """Run the block against `list_id`, then switch back."""
+    scope = _list_scope(list_id)
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+def create_household(name: str) -> tuple[int, int]:
+    """New household with one "Groceries" list. Returns (household_id, list_id)."""
+    with get_engine().begin() as conn:
+        household_id = conn.execute(
+            households.insert().values(name=name, created_at=datetime.utcnow())
+        ).inserted_primary_key[0]
+        list_id = conn.execute(
+            lists.insert().values(household_id=household_id, name="Groceries", created_at=datetime.utcnow())
+        ).inserted_primary_key[0]
+    return household_id, list_id
+
+def create_list(name: str) -> int:
+    """Add a list to the current household. Returns its id."""
+    with get_engine().begin() as conn:
+        return conn.execute(
+            lists.insert().values(household_id=_scope.get()[0], name=name, created_at=datetime.utcnow())
+        ).inserted_primary_key[0]
+
+def get_lists():
+    """The current household's lists, oldest first."""
+    stmt = select(lists.c.id, lists.c.name).where(_in_household(lists)).order_by(lists.c.id)
+    with get_engine().begin() as conn:
+        return [dict(r) for r in conn.execute(stmt).mappings().all()]
 
 # --- Queries used by the CLI ---
+def _grocery_row(r):
+    return {
+        "id": r["id"],
+        "name": r["name"],
+        "purchased": r["purchased"],
+        "added_at": r["added_at"].strftime("%Y-%m-%d %H:%M"),
+        "quantity": r["quantity"] or 1,
+        "unit": r["unit"],
+    }
+
+_LIST_ORDER = (grocery_items.c.purchased.asc(), grocery_items.c.name.asc(), grocery_items.c.id.asc())
+
 def list_items():
-    stmt = select(grocery_items).order_by(grocery_items.c.purchased.asc(),
-                                          grocery_items.c.name.asc())
-    with engine.begin() as conn:
+    stmt = select(grocery_items).where(_on_list()).order_by(*_LIST_ORDER)
+    with get_engine().begin() as conn:
         rows = conn.execute(stmt).mappings().all()
-    return [
-        {
-            "id": r["id"],
-            "name": r["name"],
-            "purchased": r["purchased"],
-            "added_at": r["added_at"].strftime("%Y-%m-%d %H:%M"),
-            "quantity": r["quantity"] or 1,
-            "unit": r["unit"],
-        } for r in rows
-    ]
+    return [_grocery_row(r) for r in rows]
 
-def add_item(name: str, quantity: float = 1.0, unit: str | None = None):
+def iter_items(batch_size: int = 500):
+    """Yield grocery rows in list order, streamed through a server-side cursor."""
+    stmt = select(grocery_items).where(_on_list()).order_by(*_LIST_ORDER)
+    with get_engine().connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(stmt)
+        for r in result.mappings():
+            yield _grocery_row(r)
+
+def _list_page_stmt(after, limit):
+    stmt = select(grocery_items).where(_on_list()).order_by(*_LIST_ORDER).limit(limit)
+    if after:
+        stmt = stmt.where(
+            tuple_(grocery_items.c.purchased, grocery_items.c.name, grocery_items.c.id)
+            > tuple_(after["purchased"], after["name"], after["id"])
+        )
+    return stmt
+
+def list_items_page(after: dict | None = None, limit: int = 50):
+    """
+    One page of the grocery list in list order. Pass the last row of the
+    previous page as `after` to get the next one (keyset, no OFFSET scan).
+    """
+    stmt = _list_page_stmt(after, limit)
+    with get_engine().begin() as conn:
+        rows = conn.execute(stmt).mappings().all()
+    return [_grocery_row(r) for r in rows]
+
+# One line per (purchased, ingredient, unit family). Quantities are summed
+# in the family's base unit and shown in the largest unit used in the group
+# that gives a total of at least 1 (else the smallest one).
+#
+# A page's cursor is applied in `lines` (`{after}`), so rows before it are
+# never joined or aggregated and later pages get cheaper. The key comes
+# from the catalog join, so no index returns rows in key order: the first
+# page still reads and groups the whole list (tens of ms at 20k rows),
+# which archive.py keeps short. list_items_page() is the raw-row path
+# whose time to first row stays flat however long the list gets.
+_SHOPPING_LIST = """
+    WITH lines AS (
+        SELECT g.id, g.purchased, g.added_at, g.name,
+               coalesce(ing.name, canonical_name(g.name)) AS key,
+               coalesce(g.quantity, 1) AS quantity,
+               coalesce(u.unit, g.unit) AS unit,
+               coalesce(u.family, u.unit, lower(g.unit), '') AS family,
+               coalesce(u.factor, 1) AS factor
+        FROM grocery_items g
+        LEFT JOIN ingredients ing ON ing.id = g.ingredient_id
+        LEFT JOIN units u ON u.alias = lower(g.unit)
+        WHERE g.household_id = :household_id AND g.list_id = :list_id {after}
+    ),
+    groups AS (
+        SELECT purchased, key, family,
+               (array_agg(name ORDER BY id))[1] AS name,
+               array_agg(id ORDER BY id) AS ids,
+               min(added_at) AS added_at,
+               sum(quantity * factor) AS base_total,
+               max(factor) AS big_factor,
+               min(factor) AS small_factor,
+               (array_agg(unit ORDER BY factor DESC, unit COLLATE "C"))[1] AS big_unit,
+               (array_agg(unit ORDER BY factor ASC, unit COLLATE "C"))[1] AS small_unit
+        FROM lines
+        GROUP BY purchased, key, family
+    )
+    SELECT purchased, key, family, name, ids, added_at,
+           CASE WHEN base_total / big_factor >= 1 THEN big_unit ELSE small_unit END AS unit,
+           CASE WHEN base_total / big_factor >= 1 THEN base_total / big_factor
+                ELSE base_total / small_factor END AS quantity
+    FROM groups
+    {where}
+    ORDER BY purchased, key, family
+    {limit}
+"""
+
+def _shopping_row(r):
+    return {
+        "id": r["ids"][0],
+        "ids": list(r["ids"]),
+        "key": r["key"],
+        "family": r["family"],
+        "name": r["name"],
+        "purchased": r["purchased"],
+        "added_at": r["added_at"].strftime("%Y-%m-%d %H:%M"),
+        "quantity": round(r["quantity"], 3),
+        "unit": r["unit"],
+    }
+
+def unit_measures(conn):
+    """
+    The units table as a function: unit -> (display unit, family, factor),
+    matching `LEFT JOIN units u ON u.alias = lower(unit)` in the SQL above.
+    Unknown units keep their spelling, in a family of their own.
+    """
+    by_alias = {u.alias: u for u in conn.execute(select(units))}
+
+    def measure(unit):
+        u = by_alias.get(unit.lower()) if unit else None
+        if u is None:
+            return unit, (unit or "").lower(), 1.0
+        return u.unit, u.family or u.unit, u.factor
+    return measure
+
+def _shopping_list_portable(conn):
+    """_SHOPPING_LIST for backends without array_agg: group in Python."""
+    from live_cache import _aggregate
+    g = grocery_items.c
+    rows = conn.execute(
+        select(g.id, g.name, g.purchased, g.added_at, g.quantity, g.unit,
+               func.coalesce(ingredients.c.name, func.canonical_name(g.name)).label("key"))
+        .select_from(grocery_items.outerjoin(ingredients, ingredients.c.id == g.ingredient_id))
+        .where(_on_list())
+    ).mappings().all()
+    return _aggregate(rows, unit_measures(conn))
+
+def shopping_list():
+    """The aggregated list: one line per ingredient and unit family."""
+    stmt = text(_SHOPPING_LIST.format(after="", where="", limit=""))
+    with get_engine().begin() as conn:
+        if _portable(conn):
+            return _shopping_list_portable(conn)
+        rows = conn.execute(stmt, _scope_params()).mappings().all()
+    return [_shopping_row(r) for r in rows]
+
+def _shopping_page_stmt(after, limit):
+    cut, where, params = "", "", _scope_params(limit=limit)
+    if after:
+        # `purchased` alone can use ix_grocery_items_scoped_order
+        cut = """AND g.purchased >= :purchased
+                 AND (g.purchased, coalesce(ing.name, canonical_name(g.name))) >= (:purchased, :key)"""
+        where = "WHERE (purchased, key, family) > (:purchased, :key, :family)"
+        params.update(purchased=after["purchased"], key=after["key"], family=after["family"])
+    return text(_SHOPPING_LIST.format(after=cut, where=where, limit="LIMIT :limit")), params
+
+def shopping_list_page(after: dict | None = None, limit: int = 50):
+    """Keyset-paginated shopping_list(); `after` is the last line of the previous page."""
+    stmt, params = _shopping_page_stmt(after, limit)
+    with get_engine().begin() as conn:
+        if _portable(conn):
+            cursor = after and (after["purchased"], after["key"], after["family"])
+            lines = [l for l in _shopping_list_portable(conn)
+                     if not cursor or (l["purchased"], l["key"], l["family"]) > cursor]
+            return lines[:limit]
+        rows = conn.execute(stmt, params).mappings().all()
+    return [_shopping_row(r) for r in rows]
+
+def add_item(name: str, quantity: float = 1.0, unit: str | None = None, snap: float | None = None):
     # Merge with existing unpurchased same-name+unit item by increasing quantity
-    with engine.begin() as conn:
-        # Build the unit-matching predicate depending on Python value of `unit`
-        if unit is None:
-            unit_pred = grocery_items.c.unit.is_(None)
-        else:
-            unit_pred = grocery_items.c.unit == unit
-
-        existing = conn.execute(
-            select(grocery_items.c.id, grocery_items.c.quantity)
-            .where(grocery_items.c.name.ilike(name))
-            .where(unit_pred)
-            .where(grocery_items.c.purchased == False)
-        ).mappings().first()
-
-        new_qty = float(quantity or 1)
-
-        if existing:
-            conn.execute(
-                update(grocery_items)
-                .where(grocery_items.c.id == existing["id"])
-                .values(quantity=(existing["quantity"] or 1) + new_qty)
-            )
+    add_items([{"name": name, "quantity": quantity, "unit": unit}], snap=snap)
+
+# Set-based merge of incoming rows into the unpurchased part of the current
+# list. `{source}` must yield (ord, name, quantity, unit, ingredient_id); rows
+# are keyed on (ingredient_id, unit) so a whole batch costs a single statement.
+# Build it with _merge_ctes().
+_MERGE_CTES = """
+    incoming AS (
+        SELECT min(src.ord) AS ord,
+               src.ingredient_id,
+               (array_agg(src.name ORDER BY src.ord))[1] AS name,
+               src.unit,
+               sum(coalesce(src.quantity, 1)) AS quantity{added_at_column}
+        FROM ({source}) AS src
+        GROUP BY src.ingredient_id, src.unit
+    ),
+    targets AS (
+        SELECT DISTINCT ON (g.ingredient_id, g.unit)
+               g.id, g.ingredient_id, g.unit
+        FROM grocery_items g
+        JOIN incoming i
+          ON g.ingredient_id = i.ingredient_id AND g.unit IS NOT DISTINCT FROM i.unit
+        WHERE g.household_id = :household_id AND g.list_id = :list_id AND g.purchased = false
+        ORDER BY g.ingredient_id, g.unit, g.id
+    ),
+    updated AS (
+        UPDATE grocery_items g
+        SET quantity = coalesce(g.quantity, 1) + i.quantity
+        FROM targets t
+        JOIN incoming i ON i.ingredient_id = t.ingredient_id AND i.unit IS NOT DISTINCT FROM t.unit
+        WHERE g.household_id = :household_id AND g.id = t.id
+        RETURNING g.id
+    ),
+    inserted AS (
+        INSERT INTO grocery_items (name, purchased, added_at, quantity, unit, ingredient_id, household_id, list_id)
+        SELECT i.name, false, {added_at}, i.quantity, i.unit, i.ingredient_id, :household_id, :list_id
+        FROM incoming i
+        WHERE NOT EXISTS (
+            SELECT 1 FROM targets t
+            WHERE t.ingredient_id = i.ingredient_id AND t.unit IS NOT DISTINCT FROM i.unit
+        )
+        ORDER BY i.ord
+        RETURNING id
+    )
+"""
+
+def _added_at(added_at):
+    # New rows are stamped :now, or with `added_at`, an aggregate over the
+    # source rows of each group (e.g. "coalesce(min(src.added_at), :now)")
+    if added_at is None:
+        return {"added_at_column": "", "added_at": ":now"}
+    return {"added_at_column": f",\n               {added_at} AS added_at", "added_at": "i.added_at"}
+
+def _merge_ctes(source: str, added_at: str | None = None) -> str:
+    return _MERGE_CTES.format(source=source, **_added_at(added_at))
+
+_MERGE_COUNTS = """
+    (SELECT count(*) FROM updated) AS updated,
+    (SELECT count(*) FROM inserted) AS inserted
+"""
+
+# Rows passed in from Python travel as one jsonb parameter.
+_JSON_ROWS = """
+    SELECT r.ord, r.name, r.quantity, r.unit, r.ingredient_id
+    FROM jsonb_to_recordset(CAST(:rows AS jsonb))
+         AS r(ord integer, name text, quantity double precision, unit text, ingredient_id integer)
+"""
+
+def _normalize_rows(rows) -> list[dict]:
+    """
+    {name, quantity, unit} dicts -> [{ord, name, quantity, unit}], blanks
+    dropped. Units are canonical ("cups", "Cup" -> "cup") so they merge.
+    """
+    from recipes import canonical_unit
+    payload = []
+    for row in rows:
+        name = (row.get("name") or "").strip()
+        if not name:
+            continue
+        payload.append({
+            "ord": len(payload),
+            "name": name,
+            "quantity": float(row.get("quantity") or 1),
+            "unit": canonical_unit(row.get("unit")),
+        })
+    return payload
+
+def _with_ingredient_ids(conn, payload: list[dict]) -> list[dict]:
+    """Set each row's ingredient_id (in place) and return the rows."""
+    for row, iid in zip(payload, ingredient_ids([r["name"] for r in payload], conn=conn)):
+        row["ingredient_id"] = iid
+    return payload
+
+# --- Snapping to similar items (matching.py) ---
+def _has_trgm(conn) -> bool:
+    # Asked once per pooled connection; migration 10 installs it where it can
+    if "pg_trgm" not in conn.info:
+        conn.info["pg_trgm"] = conn.dialect.name == "postgresql" and conn.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).first() is not None
+    return conn.info["pg_trgm"]
+
+# Per incoming name, the most similar ingredient among `candidates` (found
+# through the trigram index on the catalog; `%` honours the threshold set
+# just before). Exact matches score 1, so they always win.
+_SNAP = """
+    SELECT DISTINCT ON (q.ord) q.ord, i.id
+    FROM unnest(CAST(:names AS text[])) WITH ORDINALITY AS q(name, ord)
+    JOIN ingredients i ON i.name % q.name
+    WHERE EXISTS ({candidates} AND c.ingredient_id = i.id)
+    ORDER BY q.ord, similarity(i.name, q.name) DESC, i.id
+"""
+_SNAP_GROCERY = text(_SNAP.format(candidates="""
+    SELECT 1 FROM grocery_items c
+    WHERE c.household_id = :household_id AND c.list_id = :list_id AND c.purchased = false"""))
+_SNAP_PANTRY = text(_SNAP.format(candidates="""
+    SELECT 1 FROM pantry_items c WHERE c.household_id = :household_id"""))
+
+def _snap_ingredient_ids(conn, payload: list[dict], threshold: float, pantry: bool = False) -> list[dict]:
+    """
+    Point each row (in place) at the most similar ingredient already on the
+    current list (or in the pantry), if one scores at least `threshold`,
+    so "roma tomatoes" merges into "tomato". Rows with none keep their own.
+    """
+    from matching import closest
+    from recipes import canonical_name
+    names = [canonical_name(r["name"]) for r in payload]
+    if _has_trgm(conn):
+        conn.execute(text("SELECT set_config('pg_trgm.similarity_threshold', :t, true)"), {"t": str(threshold)})
+        stmt = _SNAP_PANTRY if pantry else _SNAP_GROCERY
+        for ord_, iid in conn.execute(stmt, _scope_params(names=names)):
+            payload[ord_ - 1]["ingredient_id"] = iid
+        return payload
+    table = pantry_items if pantry else grocery_items
+    scope = _in_household(table) if pantry else and_(_on_list(), grocery_items.c.purchased == False)
+    candidates = conn.execute(
+        select(ingredients.c.id, ingredients.c.name)
+        .where(ingredients.c.id.in_(select(table.c.ingredient_id).where(scope)))
+    ).all()
+    for row, name in zip(payload, names):
+        match = closest(name, candidates, threshold)
+        if match:
+            row["ingredient_id"] = match[0]
+    return payload
+
+def _merge_portable(conn, rows, now) -> dict:
+    """_MERGE_CTES for backends without data-modifying CTEs."""
+    incoming = {}
+    for r in rows:
+        key = (r["ingredient_id"], r["unit"])
+        if key in incoming:
+            incoming[key]["quantity"] += r["quantity"]
         else:
-            conn.execute(grocery_items.insert().values(
-                name=name,
-                purchased=False,
-                added_at=datetime.utcnow(),
-                quantity=new_qty,
-                unit=unit
-            ))
+            incoming[key] = dict(r)
+    if not incoming:
+        return {"updated": 0, "inserted": 0}
+    targets = {}
+    existing = conn.execute(
+        select(grocery_items.c.id, grocery_items.c.ingredient_id, grocery_items.c.unit)
+        .where(_on_list(), grocery_items.c.purchased == False,
+               grocery_items.c.ingredient_id.in_({k for k, _ in incoming}))
+        .order_by(grocery_items.c.id)
+    )
+    for gid, iid, unit in existing:
+        targets.setdefault((iid, unit), gid)
+    updates = [{"gid": targets[k], "q": r["quantity"]} for k, r in incoming.items() if k in targets]
+    household_id, list_id = _scope.get()
+    inserts = [
+        {"name": r["name"], "purchased": False, "added_at": now, "quantity": r["quantity"],
+         "unit": r["unit"], "ingredient_id": r["ingredient_id"],
+         "household_id": household_id, "list_id": list_id}
+        for k, r in sorted(incoming.items(), key=lambda kv: kv[1]["ord"]) if k not in targets
+    ]
+    if updates:
+        conn.execute(
+            update(grocery_items).where(grocery_items.c.id == bindparam("gid"))
+            .values(quantity=func.coalesce(grocery_items.c.quantity, 1) + bindparam("q")),
+            updates,
+        )
+    if inserts:
+        conn.execute(grocery_items.insert(), inserts)
+    return {"updated": len(updates), "inserted": len(inserts)}
+
+_ADD_ITEMS = text("WITH " + _merge_ctes(_JSON_ROWS) + "SELECT " + _MERGE_COUNTS)
+
+def add_items(rows, conn=None, snap: float | None = None) -> dict:
+    """
+    Merge many {name, quantity, unit} rows into grocery_items in one statement.
+    Unpurchased rows for the same ingredient (see ingredient_ids) and unit
+    have their quantity increased; everything else is inserted. With `snap`
+    (a similarity threshold, e.g. matching.SNAP_THRESHOLD), a name also
+    merges into the most similar item on the list scoring at least that.
+    Returns {"updated": n, "inserted": n}.
+    """
+    payload = _normalize_rows(rows)
+    if not payload:
+        return {"updated": 0, "inserted": 0}
+    with _begin(conn) as conn:
+        _with_ingredient_ids(conn, payload)
+        if snap is not None:
+            _snap_ingredient_ids(conn, payload, snap)
+        if _portable(conn):
+            return _merge_portable(conn, payload, datetime.utcnow())
+        counts = conn.execute(
+            _ADD_ITEMS, _scope_params(rows=json.dumps(payload), now=datetime.utcnow())
+        ).mappings().one()
+    return dict(counts)
 
 def remove_item(item_id: int):
-    with engine.begin() as conn:
-        conn.execute(delete(grocery_items).where(grocery_items.c.id == item_id))
+    with get_engine().begin() as conn:
+        conn.execute(delete(grocery_items).where(_on_list(), grocery_items.c.id == item_id))
+
+def remove_items(item_ids: list[int], conn=None) -> int:
+    with _begin(conn) as conn:
+        return conn.execute(delete(grocery_items).where(_on_list(), grocery_items.c.id.in_(item_ids))).rowcount
+
+def _history_rows(rows, delta: int) -> list[dict]:
+    # purchase_history rows for flipped grocery rows; delta -1 cancels a purchase
+    return [{
+        "household_id": r["household_id"],
+        "list_id": r["list_id"],
+        "item_id": r["id"],
+        "ingredient_id": r["ingredient_id"],
+        "name": r["name"],
+        "quantity": delta * (r["quantity"] or 1),
+        "unit": r["unit"],
+        "price": None if r["price"] is None else delta * r["price"],
+        "purchased_at": r["purchased_at"],
+        "delta": delta,
+    } for r in rows]
+
+def _toggle_stmt(item_id, price, now):
+    # Flip in one statement. Checking off stamps purchased_at and price;
+    # un-checking keeps them, so the history row can cancel the right week.
+    g = grocery_items.c
+    checking = g.purchased == False
+    return (
+        update(grocery_items)
+        .where(_on_list(), g.id == item_id)
+        .values(purchased=~g.purchased,
+                purchased_at=case((checking, now), else_=g.purchased_at),
+                price=case((checking, price), else_=g.price))
+        .returning(grocery_items)
+    )
+
+def toggle_purchased(item_id: int, price: float | None = None) -> bool:
+    # Returns the new state (False if the id is gone)
+    with get_engine().begin() as conn:
+        row = conn.execute(_toggle_stmt(item_id, price, datetime.utcnow())).mappings().first()
+        if row is not None:
+            conn.execute(purchase_history.insert(), _history_rows([row], 1 if row["purchased"] else -1))
+    return bool(row and row["purchased"])
+
+def unpurchase_items(item_ids: list[int], conn=None) -> int:
+    with _begin(conn) as conn:
+        rows = conn.execute(
+            update(grocery_items)
+            .where(_on_list(), grocery_items.c.id.in_(item_ids), grocery_items.c.purchased == True)
+            .values(purchased=False)
+            .returning(grocery_items)
+        ).mappings().all()
+        if rows:
+            conn.execute(purchase_history.insert(), _history_rows(rows, -1))
+    return len(rows)
+
+# Set-based merge into the household's pantry keyed on (ingredient_id, unit,
+# expires_at). `{source}` must yield (ord, name, quantity, unit, expires_at,
+# ingredient_id); build it with _pantry_merge_ctes().
+_PANTRY_MERGE_CTES = """
+    incoming AS (
+        SELECT src.ingredient_id,
+               (array_agg(src.name ORDER BY src.ord))[1] AS name,
+               src.unit, src.expires_at,
+               sum(coalesce(src.quantity, 1)) AS quantity,
+               min(src.ord) AS ord{added_at_column}
+        FROM ({source}) AS src
+        GROUP BY src.ingredient_id, src.unit, src.expires_at
+    ),
+    targets AS (
+        SELECT DISTINCT ON (p.ingredient_id, p.unit, p.expires_at)
+               p.id, p.ingredient_id, p.unit, p.expires_at
+        FROM pantry_items p
+        JOIN incoming i
+          ON p.ingredient_id = i.ingredient_id
+         AND p.unit IS NOT DISTINCT FROM i.unit
+         AND p.expires_at IS NOT DISTINCT FROM i.expires_at
+        WHERE p.household_id = :household_id
+        ORDER BY p.ingredient_id, p.unit, p.expires_at, p.id
+    ),
+    pantry_updated AS (
+        UPDATE pantry_items p
+        SET quantity = coalesce(p.quantity, 0) + i.quantity
+        FROM targets t
+        JOIN incoming i
+          ON i.ingredient_id = t.ingredient_id
+         AND i.unit IS NOT DISTINCT FROM t.unit
+         AND i.expires_at IS NOT DISTINCT FROM t.expires_at
+        WHERE p.household_id = :household_id AND p.id = t.id
+        RETURNING p.id
+    ),
+    pantry_inserted AS (
+        INSERT INTO pantry_items (name, quantity, unit, expires_at, added_at, ingredient_id, household_id)
+        SELECT i.name, i.quantity, i.unit, i.expires_at, {added_at}, i.ingredient_id, :household_id
+        FROM incoming i
+        WHERE NOT EXISTS (
+            SELECT 1 FROM targets t
+            WHERE t.ingredient_id = i.ingredient_id
+              AND t.unit IS NOT DISTINCT FROM i.unit
+              AND t.expires_at IS NOT DISTINCT FROM i.expires_at
+        )
+        ORDER BY i.ord
+        RETURNING id
+    )
+"""
+
+def _pantry_merge_ctes(source: str, added_at: str | None = None) -> str:
+    return _PANTRY_MERGE_CTES.format(source=source, **_added_at(added_at))
 
-def toggle_purchased(item_id: int):
-    with engine.begin() as conn:
-        # flip bool in DB
-        conn.execute(update(grocery_items)
-                     .where(grocery_items.c.id == item_id)
-                     .values(purchased=~grocery_items.c.purchased))
+# Flip unpurchased rows to purchased and merge them into the pantry keyed on
+# (ingredient_id, unit, expires_at), all in one statement. Rows already
+# purchased (e.g. by someone else a moment ago) are skipped, so two people
+# checking off the same item can't stock it twice. Each flipped row is also
+# logged to purchase_history (whose trigger updates the rollups).
+_PURCHASE = text("""
+    WITH overrides AS (
+        SELECT * FROM jsonb_to_recordset(CAST(:overrides AS jsonb))
+            AS o(id integer, quantity double precision, unit text, expires_at date, pantry boolean,
+                 price double precision)
+    ),
+    flipped AS (
+        UPDATE grocery_items g
+        SET purchased = true, purchased_at = :now,
+            price = (SELECT o.price FROM overrides o WHERE o.id = g.id)
+        WHERE g.household_id = :household_id AND g.list_id = :list_id
+          AND g.id = ANY(:ids) AND g.purchased = false
+        RETURNING g.id, g.name, g.quantity, g.unit, g.ingredient_id, g.price
+    ),
+    history AS (
+        INSERT INTO purchase_history
+            (household_id, list_id, item_id, ingredient_id, name, quantity, unit, price, purchased_at, delta)
+        SELECT :household_id, :list_id, f.id, f.ingredient_id, f.name, coalesce(f.quantity, 1), f.unit,
+               f.price, :now, 1
+        FROM flipped f
+        ORDER BY f.id
+    ),
+    stocked AS (
+        SELECT f.id AS ord, f.name,
+               coalesce(o.quantity, f.quantity) AS quantity,
+               CASE WHEN o.id IS NULL THEN f.unit ELSE o.unit END AS unit,
+               o.expires_at, f.ingredient_id
+        FROM flipped f
+        LEFT JOIN overrides o ON o.id = f.id
+        WHERE coalesce(o.pantry, true)
+    ),""" + _pantry_merge_ctes("SELECT * FROM stocked") + """
+    SELECT id, name, quantity, unit FROM flipped ORDER BY id
+""")
+
+def purchase_items(item_ids: list[int], pantry_overrides: dict | None = None, conn=None) -> list[dict]:
+    """
+    Check off many grocery rows at once and move them into the pantry, in a
+    single atomic statement.
+    pantry_overrides: optional {item_id: {quantity, unit, expires_at ("YYYY-MM-DD"),
+    pantry (False = don't stock it), price (paid, for purchase_history)}}; a
+    given override replaces the row's quantity/unit for the pantry entry.
+    Returns the rows that were actually flipped (already purchased ones are skipped).
+    """
+    params = _purchase_params(item_ids, pantry_overrides)
+    with _begin(conn) as conn:
+        if _portable(conn):
+            return _purchase_portable(conn, params)
+        rows = conn.execute(_PURCHASE, params).mappings().all()
+    return [dict(r) for r in rows]
+
+def _purchase_params(item_ids, pantry_overrides):
+    overrides = []
+    for item_id, o in (pantry_overrides or {}).items():
+        exp = o.get("expires_at") or None
+        if exp:
+            try:
+                datetime.strptime(exp, "%Y-%m-%d")
+            except ValueError:
+                exp = None
+        overrides.append({
+            "id": int(item_id),
+            "quantity": float(o["quantity"]) if o.get("quantity") is not None else None,
+            "unit": o.get("unit") or None,
+            "expires_at": exp,
+            "pantry": o.get("pantry", True),
+            "price": float(o["price"]) if o.get("price") is not None else None,
+        })
+    return _scope_params(ids=list(item_ids), overrides=json.dumps(overrides), now=datetime.utcnow())
+
+def _merge_pantry_portable(conn, rows, now) -> dict:
+    """_PANTRY_MERGE_CTES for backends without data-modifying CTEs."""
+    incoming = {}
+    for r in rows:
+        key = (r["ingredient_id"], r["unit"], r["expires_at"])
+        quantity = 1 if r["quantity"] is None else r["quantity"]
+        if key in incoming:
+            incoming[key]["quantity"] += quantity
+        else:
+            incoming[key] = {**r, "quantity": quantity}
+    if not incoming:
+        return {"updated": 0, "inserted": 0}
+    p = pantry_items.c
+    targets = {}
+    existing = conn.execute(
+        select(p.id, p.ingredient_id, p.unit, p.expires_at)
+        .where(_in_household(pantry_items), p.ingredient_id.in_({k[0] for k in incoming}))
+        .order_by(p.id)
+    )
+    for pid, iid, unit, exp in existing:
+        targets.setdefault((iid, unit, exp), pid)
+    updates = [{"pid": targets[k], "q": r["quantity"]} for k, r in incoming.items() if k in targets]
+    household_id = _scope.get()[0]
+    inserts = [
+        {"name": r["name"], "quantity": r["quantity"], "unit": r["unit"], "expires_at": r["expires_at"],
+         "added_at": now, "ingredient_id": r["ingredient_id"], "household_id": household_id}
+        for k, r in sorted(incoming.items(), key=lambda kv: kv[1]["ord"]) if k not in targets
+    ]
+    if updates:
+        conn.execute(
+            update(pantry_items).where(p.id == bindparam("pid"))
+            .values(quantity=func.coalesce(p.quantity, 0) + bindparam("q")),
+            updates,
+        )
+    if inserts:
+        conn.execute(pantry_items.insert(), inserts)
+    return {"updated": len(updates), "inserted": len(inserts)}
+
+def _purchase_portable(conn, params) -> list[dict]:
+    """_PURCHASE for backends without data-modifying CTEs."""
+    overrides = {o["id"]: o for o in json.loads(params["overrides"])}
+    g = grocery_items.c
+    prices = [(g.id == o["id"], o["price"]) for o in overrides.values() if o["price"] is not None]
+    flipped = conn.execute(
+        update(grocery_items)
+        .where(_on_list(), g.id.in_(params["ids"]), g.purchased == False)
+        .values(purchased=True, purchased_at=params["now"], price=case(*prices, else_=None) if prices else None)
+        .returning(grocery_items)
+    ).mappings().all()
+    flipped = sorted(flipped, key=lambda r: r["id"])
+    if not flipped:
+        return []
+    conn.execute(purchase_history.insert(), _history_rows(flipped, 1))
+    stocked = []
+    for r in flipped:
+        o = overrides.get(r["id"])
+        if o is not None and o["pantry"] is not None and not o["pantry"]:
+            continue
+        stocked.append({
+            "ord": r["id"],
+            "name": r["name"],
+            "quantity": o["quantity"] if o is not None and o["quantity"] is not None else r["quantity"],
+            "unit": o["unit"] if o is not None else r["unit"],
+            "expires_at": _parse_date(o["expires_at"]) if o is not None else None,
+            "ingredient_id": r["ingredient_id"],
+        })
+    _merge_pantry_portable(conn, stocked, params["now"])
+    return [{"id": r["id"], "name": r["name"], "quantity": r["quantity"], "unit": r["unit"]} for r in flipped]
+
+# --- Spending (purchase_rollups) ---
+PERIODS = ("week", "month")
+
+def _spending_stmt(period, since):
+    r = purchase_rollups.c
+    stmt = (
+        select(r.period_start, r.item_count, r.priced_count, r.spent)
+        .where(r.household_id == _scope.get()[0], r.period == period)
+        .order_by(r.period_start)
+    )
+    if since is not None:
+        stmt = stmt.where(r.period_start >= since)
+    return stmt
+
+def spending(period: str = "week", since=None) -> list[dict]:
+    """
+    The current household's purchases per week (starting Monday) or month,
+    oldest first: [{period_start, item_count, priced_count, spent}]. Reads the
+    precomputed rollups, one row per period. `since`: a date.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    with get_engine().begin() as conn:
+        rows = conn.execute(_spending_stmt(period, since)).mappings().all()
+    return [{**r, "spent": round(r["spent"], 2)} for r in rows]
 
 # --- Recipe helpers ---
+# Observer for new recipes, called once their transaction has committed as
+# on_recipe_created(household_id, recipe_id, title, ingredient_ids).
+# suggest.py keeps its index current through it.
+on_recipe_created = None
+
+def _recipes_created(created):
+    if on_recipe_created is not None:
+        household_id = _scope.get()[0]
+        for recipe_id, title, ids in created:
+            on_recipe_created(household_id, recipe_id, title, ids)
+
+def _imported(recipe_id, params):
+    return recipe_id, params["title"], [r["ingredient_id"] for r in json.loads(params["rows"])]
+
 def create_recipe(title: str, source_url: str | None, ingredients: list[dict]) -> int:
     """
     ingredients: list of {name, quantity (float), unit (str|None)}
     Returns new recipe_id
     """
-    with engine.begin() as conn:
+    with get_engine().begin() as conn:
         rid = conn.execute(
-            recipes.insert().values(title=title, source_url=source_url, created_at=datetime.utcnow())
+            recipes.insert().values(title=title, source_url=source_url, created_at=datetime.utcnow(),
+                                    household_id=_scope.get()[0])
         ).inserted_primary_key[0]
+        ids = ingredient_ids([ing["name"] for ing in ingredients], conn=conn) if ingredients else []
         if ingredients:
             conn.execute(recipe_ingredients.insert(), [
-                {"recipe_id": rid, "name": ing["name"], "quantity": float(ing.get("quantity") or 1), "unit": ing.get("unit")}
-                for ing in ingredients
+                {"recipe_id": rid, "name": ing["name"], "quantity": float(ing.get("quantity") or 1),
+                 "unit": ing.get("unit"), "ingredient_id": iid}
+                for ing, iid in zip(ingredients, ids)
             ])
-        return rid
+    _recipes_created([(rid, title, ids)])
+    return rid
+
+def _recipe_ingredients_stmt(recipe_id):
+    return (select(recipe_ingredients)
+            .where(recipe_ingredients.c.recipe_id == recipe_id)
+            .order_by(recipe_ingredients.c.name.asc()))
+
+def _recipe_row(r, ings):
+    return {
+        "id": r["id"],
+        "title": r["title"],
+        "source_url": r["source_url"],
+        "ingredients": [{"name": i["name"], "quantity": i["quantity"], "unit": i["unit"]} for i in ings]
+    }
+
+def _recipe_stmt(recipe_id):
+    return select(recipes).where(_in_household(recipes), recipes.c.id == recipe_id)
 
 def get_recipe(recipe_id: int):
-    with engine.begin() as conn:
-        r = conn.execute(select(recipes).where(recipes.c.id == recipe_id)).mappings().first()
+    with get_engine().begin() as conn:
+        r = conn.execute(_recipe_stmt(recipe_id)).mappings().first()
         if not r:
             return None
-        ings = conn.execute(select(recipe_ingredients)
-                            .where(recipe_ingredients.c.recipe_id == recipe_id)
-                            .order_by(recipe_ingredients.c.name.asc())).mappings().all()
-        return {
-            "id": r["id"],
-            "title": r["title"],
-            "source_url": r["source_url"],
-            "ingredients": [{"name": i["name"], "quantity": i["quantity"], "unit": i["unit"]} for i in ings]
-        }
+        ings = conn.execute(_recipe_ingredients_stmt(recipe_id)).mappings().all()
+        return _recipe_row(r, ings)
+
+# Merge straight from recipe_ingredients: one statement, however many ingredients
+_ADD_RECIPE_TO_GROCERY = text(
+    "WITH " + _merge_ctes("""
+        SELECT ri.id AS ord, ri.name, ri.quantity, ri.unit, ri.ingredient_id
+        FROM recipe_ingredients ri
+        JOIN recipes r ON r.id = ri.recipe_id AND r.household_id = :household_id
+        WHERE ri.recipe_id = :recipe_id
+    """)
+    + "SELECT EXISTS (SELECT 1 FROM recipes WHERE id = :recipe_id AND household_id = :household_id) AS found"
+)
 
 def add_recipe_to_grocery(recipe_id: int):
-    rec = get_recipe(recipe_id)
-    if not rec:
-        return False
-    for ing in rec["ingredients"]:
-        add_item(ing["name"], ing.get("quantity", 1) or 1, ing.get("unit"))
-    return True
+    with get_engine().begin() as conn:
+        if _portable(conn):
+            found = conn.execute(_recipe_stmt(recipe_id)).first() is not None
+            if not found:
+                return False
+            ings = conn.execute(
+                select(recipe_ingredients).where(recipe_ingredients.c.recipe_id == recipe_id)
+                .order_by(recipe_ingredients.c.id)
+            ).mappings().all()
+            _merge_portable(conn, [
+                {"ord": i["id"], "name": i["name"], "quantity": i["quantity"] or 1,
+                 "unit": i["unit"], "ingredient_id": i["ingredient_id"]}
+                for i in ings
+            ], datetime.utcnow())
+            return found
+        found = conn.execute(
+            _ADD_RECIPE_TO_GROCERY, _scope_params(recipe_id=recipe_id, now=datetime.utcnow())
+        ).scalar_one()
+    return found
+
+_IMPORT_RECIPE = text("""
+    WITH new_recipe AS (
+        INSERT INTO recipes (title, source_url, created_at, household_id)
+        VALUES (:title, :source_url, :now, :household_id)
+        RETURNING id
+    ),
+    src AS (""" + _JSON_ROWS + """),
+    new_ingredients AS (
+        INSERT INTO recipe_ingredients (recipe_id, name, quantity, unit, ingredient_id)
+        SELECT new_recipe.id, src.name, src.quantity, src.unit, src.ingredient_id
+        FROM new_recipe, src
+        ORDER BY src.ord
+        RETURNING id
+    ),""" + _merge_ctes("SELECT * FROM src") + """
+    SELECT (SELECT id FROM new_recipe) AS recipe_id
+""")
+
+def _import_params(conn, title, source_url, ingredients):
+    return _scope_params(
+        title=title,
+        source_url=source_url,
+        rows=json.dumps(_with_ingredient_ids(conn, _normalize_rows(ingredients))),
+        now=datetime.utcnow(),
+    )
+
+def import_recipe(title: str, source_url: str | None, ingredients: list[dict]) -> int:
+    """
+    Create a recipe, store its ingredients and merge them into the grocery list
+    in a single statement (one round trip). Returns the new recipe_id.
+    """
+    with get_engine().begin() as conn:
+        params = _import_params(conn, title, source_url, ingredients)
+        rid = conn.execute(_IMPORT_RECIPE, params).scalar_one()
+    _recipes_created([_imported(rid, params)])
+    return rid
+
+def import_recipes(batch: list[dict], batch_size: int = 50) -> list[int]:
+    """
+    Import many {title, source_url, ingredients} recipes, committing
+    `batch_size` recipes per transaction. Returns the new recipe ids in order.
+    """
+    ids = []
+    for start in range(0, len(batch), batch_size):
+        created = []
+        with get_engine().begin() as conn:
+            for data in batch[start:start + batch_size]:
+                params = _import_params(conn, data["title"], data.get("source_url"), data["ingredients"])
+                created.append(_imported(conn.execute(_IMPORT_RECIPE, params).scalar_one(), params))
+        _recipes_created(created)
+        ids += [rid for rid, _, _ in created]
+    return ids
+
+def list_recipes_page(after: dict | None = None, limit: int = 50):
+    """Keyset-paginated recipes ordered by title; `after` is the last row of the previous page."""
+    stmt = (select(recipes.c.id, recipes.c.title, recipes.c.source_url)
+            .where(_in_household(recipes))
+            .order_by(recipes.c.title.asc(), recipes.c.id.asc()).limit(limit))
+    if after:
+        stmt = stmt.where(tuple_(recipes.c.title, recipes.c.id) > tuple_(after["title"], after["id"]))
+    with get_engine().begin() as conn:
+        return [dict(r) for r in conn.execute(stmt).mappings().all()]
+
+# Recipe needs minus usable (unexpired) pantry stock, per ingredient and
+# unit family, reported in the largest unit the recipes use.
+_SHORTFALL_CTES = """
+    needed AS (
+        SELECT ri.ingredient_id,
+               ing.name AS key,
+               coalesce(u.family, u.unit, lower(ri.unit), '') AS family,
+               (array_agg(ri.name ORDER BY ri.id))[1] AS name,
+               (array_agg(coalesce(u.unit, ri.unit) ORDER BY coalesce(u.factor, 1) DESC))[1] AS unit,
+               max(coalesce(u.factor, 1)) AS factor,
+               sum(coalesce(ri.quantity, 1) * coalesce(u.factor, 1)) AS base_needed
+        FROM recipe_ingredients ri
+        JOIN recipes r ON r.id = ri.recipe_id AND r.household_id = :household_id
+        JOIN ingredients ing ON ing.id = ri.ingredient_id
+        LEFT JOIN units u ON u.alias = lower(ri.unit)
+        WHERE ri.recipe_id = ANY(:recipe_ids)
+        GROUP BY 1, 2, 3
+    ),
+    stocked AS (
+        SELECT p.ingredient_id,
+               coalesce(u.family, u.unit, lower(p.unit), '') AS family,
+               sum(coalesce(p.quantity, 0) * coalesce(u.factor, 1)) AS base_have
+        FROM pantry_items p
+        LEFT JOIN units u ON u.alias = lower(p.unit)
+        WHERE p.household_id = :household_id
+          AND (p.expires_at IS NULL OR p.expires_at >= :today)
+          AND p.ingredient_id IN (SELECT ingredient_id FROM needed)
+        GROUP BY 1, 2
+    ),
+    shortfall AS (
+        SELECT n.ingredient_id, n.key, n.name, n.unit,
+               n.base_needed / n.factor AS needed,
+               coalesce(s.base_have, 0) / n.factor AS have,
+               greatest(n.base_needed - coalesce(s.base_have, 0), 0) / n.factor AS missing
+        FROM needed n
+        LEFT JOIN stocked s ON s.ingredient_id = n.ingredient_id AND s.family = n.family
+    )
+"""
+
+def _plan_stmt(recipe_ids, dry_run):
+    if dry_run:
+        sql = "WITH " + _SHORTFALL_CTES
+    else:
+        deficits = """
+            SELECT row_number() OVER (ORDER BY key) AS ord, name, missing AS quantity, unit, ingredient_id
+            FROM shortfall WHERE missing > 1e-9
+        """
+        sql = "WITH " + _SHORTFALL_CTES + "," + _merge_ctes(deficits)
+    sql += """
+        SELECT name, unit, needed, have, missing FROM shortfall ORDER BY key
+    """
+    params = _scope_params(
+        recipe_ids=list(recipe_ids),
+        today=datetime.now().date(),
+        now=datetime.utcnow(),
+    )
+    return text(sql), params
+
+def _plan_portable(conn, params, dry_run) -> list[dict]:
+    """_SHORTFALL_CTES (and the merge) for backends without array_agg."""
+    household_id = params["household_id"]
+    measure = unit_measures(conn)
+    ri = recipe_ingredients.c
+    needed = {}
+    for r in conn.execute(
+        select(ri.id, ri.name, ri.quantity, ri.unit, ri.ingredient_id, ingredients.c.name.label("key"))
+        .join(recipes, and_(recipes.c.id == ri.recipe_id, recipes.c.household_id == household_id))
+        .join(ingredients, ingredients.c.id == ri.ingredient_id)
+        .where(ri.recipe_id.in_(params["recipe_ids"]))
+        .order_by(ri.id)
+    ):
+        unit, family, factor = measure(r.unit)
+        n = needed.setdefault((r.ingredient_id, r.key, family),
+                              {"name": r.name, "unit": unit, "factor": factor, "base": 0.0})
+        if factor > n["factor"]:
+            n["unit"], n["factor"] = unit, factor
+        n["base"] += (r.quantity or 1) * factor
+    have = {}
+    p = pantry_items.c
+    for r in conn.execute(
+        select(p.ingredient_id, p.quantity, p.unit)
+        .where(p.household_id == household_id,
+               or_(p.expires_at.is_(None), p.expires_at >= params["today"]),
+               p.ingredient_id.in_({iid for iid, _, _ in needed}))
+    ):
+        _, family, factor = measure(r.unit)
+        have[r.ingredient_id, family] = have.get((r.ingredient_id, family), 0.0) + (r.quantity or 0) * factor
+    rows = []
+    for (iid, key, family), n in sorted(needed.items(), key=lambda kv: kv[0][1]):
+        base_have = have.get((iid, family), 0.0)
+        rows.append({"name": n["name"], "unit": n["unit"], "needed": n["base"] / n["factor"],
+                     "have": base_have / n["factor"],
+                     "missing": max(n["base"] - base_have, 0) / n["factor"], "ingredient_id": iid})
+    if not dry_run:
+        _merge_portable(conn, [
+            {"ord": i, "name": r["name"], "quantity": r["missing"], "unit": r["unit"], "ingredient_id": r["ingredient_id"]}
+            for i, r in enumerate(r for r in rows if r["missing"] > 1e-9)
+        ], params["now"])
+    return [{k: v for k, v in r.items() if k != "ingredient_id"} for r in rows]
+
+def plan_recipes(recipe_ids: list[int], dry_run: bool = False) -> list[dict]:
+    """
+    Work out what the given recipes need beyond what the pantry already
+    holds (expired stock doesn't count) and, unless `dry_run`, add only the
+    shortfall to the grocery list -- all in one statement.
+    Returns one {name, unit, needed, have, missing} row per ingredient.
+    """
+    stmt, params = _plan_stmt(recipe_ids, dry_run)
+    with get_engine().begin() as conn:
+        if _portable(conn):
+            return _plan_portable(conn, params, dry_run)
+        rows = conn.execute(stmt, params).mappings().all()
+    return [dict(r) for r in rows]
+
+def _parse_date(value: str | None):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        return None
 
 def add_pantry_item(name: str, quantity: float = 1.0, unit: str | None = None, expires_at: str | None = None):
     """Add an item to pantry, with optional expiration date (YYYY-MM-DD)."""
-    from datetime import datetime
-    exp_date = None
-    if expires_at:
-        try:
-            exp_date = datetime.strptime(expires_at, "%Y-%m-%d").date()
-        except ValueError:
-            exp_date = None
-
-    with engine.begin() as conn:
-        conn.execute(pantry_items.insert().values(
-            name=name,
-            quantity=quantity,
-            unit=unit,
-            expires_at=exp_date,
-            added_at=datetime.utcnow()
-        ))
+    add_pantry_items([{"name": name, "quantity": quantity, "unit": unit, "expires_at": expires_at}])
 
-def list_pantry_items():
-    stmt = select(pantry_items).order_by(pantry_items.c.expires_at.asc().nulls_last())
-    with engine.begin() as conn:
-        rows = conn.execute(stmt).mappings().all()
+def _pantry_values(conn, rows):
+    rows = list(rows)
+    ids = ingredient_ids([r["name"] for r in rows], conn=conn) if rows else []
+    household_id = _scope.get()[0]
+    now = datetime.utcnow()
     return [
         {
-            "id": r["id"],
             "name": r["name"],
-            "quantity": r["quantity"],
-            "unit": r["unit"],
-            "expires_at": r["expires_at"].strftime("%Y-%m-%d") if r["expires_at"] else None,
-            "added_at": r["added_at"].strftime("%Y-%m-%d %H:%M"),
-        } for r in rows
+            "quantity": float(r["quantity"]) if r.get("quantity") is not None else 1.0,
+            "unit": r.get("unit") or None,
+            "expires_at": _parse_date(r.get("expires_at")),
+            "added_at": now,
+            "ingredient_id": iid,
+            "household_id": household_id,
+        }
+        for r, iid in zip(rows, ids)
     ]
 
-def get_expiring_items(days: int = 3):
-    """Return items expiring within `days` days."""
-    from datetime import datetime, timedelta
+def add_pantry_items(rows, conn=None) -> int:
+    """Insert many {name, quantity, unit, expires_at} pantry rows in one statement."""
+    with _begin(conn) as conn:
+        values = _pantry_values(conn, rows)
+        if values:
+            conn.execute(pantry_items.insert(), values)
+    return len(values)
+
+def _pantry_row(r):
+    return {
+        "id": r["id"],
+        "name": r["name"],
+        "quantity": r["quantity"],
+        "unit": r["unit"],
+        "expires_at": r["expires_at"].strftime("%Y-%m-%d") if r["expires_at"] else None,
+        "added_at": r["added_at"].strftime("%Y-%m-%d %H:%M"),
+    }
+
+_PANTRY_ORDER = (pantry_items.c.expires_at.asc().nulls_last(), pantry_items.c.id.asc())
+
+def list_pantry_items():
+    stmt = select(pantry_items).where(_in_household(pantry_items)).order_by(*_PANTRY_ORDER)
+    with get_engine().begin() as conn:
+        rows = conn.execute(stmt).mappings().all()
+    return [_pantry_row(r) for r in rows]
+
+def iter_pantry_items(batch_size: int = 500):
+    """Yield pantry rows (soonest expiry first), streamed through a server-side cursor."""
+    stmt = select(pantry_items).where(_in_household(pantry_items)).order_by(*_PANTRY_ORDER)
+    with get_engine().connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(stmt)
+        for r in result.mappings():
+            yield _pantry_row(r)
+
+def _pantry_page_stmt(after, limit):
+    stmt = select(pantry_items).where(_in_household(pantry_items)).order_by(*_PANTRY_ORDER).limit(limit)
+    if after:
+        exp, pid = pantry_items.c.expires_at, pantry_items.c.id
+        if after["expires_at"] is None:
+            # Already into the undated tail (NULLS LAST)
+            stmt = stmt.where(exp.is_(None), pid > after["id"])
+        else:
+            last_exp = datetime.strptime(after["expires_at"], "%Y-%m-%d").date()
+            stmt = stmt.where(or_(
+                exp > last_exp,
+                and_(exp == last_exp, pid > after["id"]),
+                exp.is_(None),
+            ))
+    return stmt
+
+def list_pantry_page(after: dict | None = None, limit: int = 50):
+    """Keyset-paginated pantry rows; `after` is the last row of the previous page."""
+    stmt = _pantry_page_stmt(after, limit)
+    with get_engine().begin() as conn:
+        rows = conn.execute(stmt).mappings().all()
+    return [_pantry_row(r) for r in rows]
+
+def _expiring_stmt(days):
+    from datetime import timedelta
     today = datetime.now().date()
     cutoff = today + timedelta(days=days)
-
-    stmt = select(pantry_items).where(
-        pantry_items.c.expires_at <= cutoff
+    return select(pantry_items).where(
+        _in_household(pantry_items), pantry_items.c.expires_at <= cutoff
     ).order_by(pantry_items.c.expires_at.asc())
-    with engine.begin() as conn:
-        rows = conn.execute(stmt).mappings().all()
-    return [
-        {"name": r["name"], 
-         "quantity": r["quantity"], 
-         "unit": r["unit"], 
-         "expires_at": r["expires_at"].strftime("%Y-%m-%d")}
-        for r in rows
-    ]
 
+def _expiring_row(r):
+    return {"name": r["name"],
+            "quantity": r["quantity"],
+            "unit": r["unit"],
+            "expires_at": r["expires_at"].strftime("%Y-%m-%d")}
 
-def toggle_purchased(item_id: int) -> bool:
-    with engine.begin() as conn:
-        row = conn.execute(
-            select(grocery_items.c.purchased,
-                   grocery_items.c.name,
-                   grocery_items.c.quantity,
-                   grocery_items.c.unit)
-            .where(grocery_items.c.id == item_id)
-        ).mappings().first()
-        if not row:
-            return False
-        new_val = not row["purchased"]
-        conn.execute(
-            update(grocery_items)
-            .where(grocery_items.c.id == item_id)
-            .values(purchased=new_val)
-        )
-        return new_val
-                
-def add_or_merge_pantry_item(name: str, quantity: float = 1.0, unit: str | None = None, expires_at: str | None = None):
-        """Insert or merge pantry items by (name, unit, expires_at)."""
+def get_expiring_items(days: int = 3):
+    """Return items expiring within `days` days."""
+    with get_engine().begin() as conn:
+        rows = conn.execute(_expiring_stmt(days)).mappings().all()
+    return [_expiring_row(r) for r in rows]
+
+
+def add_or_merge_pantry_item(name: str, quantity: float = 1.0, unit: str | None = None, expires_at: str | None = None,
+                             snap: float | None = None):
+        """Insert or merge pantry items by (name, unit, expires_at); `snap` as in add_items."""
         exp_date = None
         if expires_at:
             try:
@@ -254,11 +1401,14 @@ def add_or_merge_pantry_item(name: str, quantity: float = 1.0, unit: str | None
             except ValueError:
                 exp_date = None
     
-        with engine.begin() as conn:
-            # Find existing pantry row with same (name, unit, expires_at)
+        with get_engine().begin() as conn:
+            iid = ingredient_ids([name], conn=conn)[0]
+            if snap is not None:
+                iid = _snap_ingredient_ids(conn, [{"name": name, "ingredient_id": iid}], snap, pantry=True)[0]["ingredient_id"]
+            # Find existing pantry row with same (ingredient, unit, expires_at)
             existing = conn.execute(
                 select(pantry_items.c.id, pantry_items.c.quantity)
-                .where(pantry_items.c.name.ilike(name))
+                .where(_in_household(pantry_items), pantry_items.c.ingredient_id == iid)
                 .where((pantry_items.c.unit == unit) if unit is not None else pantry_items.c.unit.is_(None))
                 .where((pantry_items.c.expires_at == exp_date) if exp_date is not None else pantry_items.c.expires_at.is_(None))
             ).mappings().first()
@@ -278,6 +1428,8 @@ def add_or_merge_pantry_item(name: str, quantity: float = 1.0, unit: str | None
                         quantity=q,
                         unit=unit,
                         expires_at=exp_date,
-                        added_at=datetime.utcnow()
+                        added_at=datetime.utcnow(),
+                        ingredient_id=iid,
+                        household_id=_scope.get()[0],
                     )
                 )   
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""
+Incremental expiration scanner.
+
+Each pantry row remembers the last alert it was part of (`alerted`:
+'expiring' or 'expired'), and a scan fetches only the rows inside the
+"expiring soon" window whose status differs from that. The remaining
+candidates sit in a partial index that a row leaves once it has been
+reported as expired, so a daily check costs the same however long the
+pantry history grows. Because the state is per row, a row is reported
+whenever it becomes visible -- even if the transaction that added it
+committed after a scan with an earlier `added_at` -- and changing
+`expires_at` clears the state so the new date is alerted again. New
+alerts are batched into one Digest and handed to pluggable sinks (stdout,
+a file, and later the email sender). Each household sees only its own
+pantry; `expiry_scans` records when and how far its last scan looked.
+"""
+import sys
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, bindparam, case, or_, select
+
+import db
+from db import current_scope, expiry_scans, get_engine, pantry_items
+
+SCAN_NAME = "pantry"
+
+def _new_alerts(household_id: int, today: date, cutoff: date):
+    p = pantry_items.c
+    due = select(
+        p.id, p.name, p.quantity, p.unit, p.expires_at, p.alerted,
+        case((p.expires_at < today, "expired"), else_="expiring").label("status"),
+    ).where(
+        p.household_id == household_id,
+        p.expires_at <= cutoff,
+        or_(p.alerted.is_(None), p.alerted != "expired"),
+    ).subquery()
+    return select(due.c.id, due.c.name, due.c.quantity, due.c.unit, due.c.expires_at, due.c.status).where(
+        or_(due.c.alerted.is_(None), due.c.alerted != due.c.status)
+    ).order_by(due.c.expires_at, due.c.id)
+
+# Only if the date is still the one that was reported
+_MARK_ALERTED = pantry_items.update().where(
+    and_(pantry_items.c.id == bindparam("item_id"), pantry_items.c.expires_at == bindparam("reported_date"))
+).values(alerted=bindparam("status"))
+
+@dataclass
+class Digest:
+    generated_at: datetime
+    days: int
+    expired: list = field(default_factory=list)
+    expiring: list = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.expired or self.expiring)
+
+    def render_text(self) -> str:
+        lines = [f"Pantry expiration digest — {self.generated_at:%Y-%m-%d %H:%M}"]
+        for title, items in (("Expired", self.expired),
+                             (f"Expiring within {self.days} days", self.expiring)):
+            if not items:
+                continue
+            lines.append(f"{title}:")
+            for e in items:
+                unit = f" {e['unit']}" if e["unit"] else ""
+                lines.append(f"- {e['name']} — {e['quantity']}{unit} (expires {e['expires_at']})")
+        return "\n".join(lines) + "\n"
+
+class StdoutSink:
+    def send(self, digest: Digest):
+        sys.stdout.write(digest.render_text())
+
+class FileSink:
+    """Appends each digest to a text file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def send(self, digest: Digest):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(digest.render_text() + "\n")
+
+def scan(days: int = 3, sinks=(), today: date | None = None) -> Digest:
+    """
+    Collect pantry items that newly expired or entered the `days`-day
+    window since they were last reported and send them to every sink
+    (objects with a `send(digest)` method). Rows are only marked as
+    reported if all sinks succeed, so a failed delivery is retried by the
+    next scan. Only the current household's pantry is scanned; concurrent
+    scans of one household queue on its `expiry_scans` row.
+    """
+    today = today or datetime.now().date()
+    cutoff = today + timedelta(days=days)
+    now = datetime.utcnow()
+    household_id = current_scope()[0]
+    name = f"{SCAN_NAME}:{household_id}"
+
+    with get_engine().begin() as conn:
+        conn.execute(db._insert_ignore(conn, expiry_scans).values(name=name))
+        conn.execute(select(expiry_scans.c.name).where(expiry_scans.c.name == name).with_for_update())
+        rows = conn.execute(_new_alerts(household_id, today, cutoff)).mappings().all()
+
+        digest = Digest(generated_at=now, days=days)
+        for r in rows:
+            item = {
+                "id": r["id"],
+                "name": r["name"],
+                "quantity": r["quantity"],
+                "unit": r["unit"],
+                "expires_at": r["expires_at"].strftime("%Y-%m-%d"),
+            }
+            (digest.expired if r["status"] == "expired" else digest.expiring).append(item)
+
+        if digest:
+            for sink in sinks:
+                sink.send(digest)
+            conn.execute(_MARK_ALERTED, [
+                {"item_id": r["id"], "reported_date": r["expires_at"], "status": r["status"]} for r in rows
+            ])
+
+        conn.execute(expiry_scans.update().where(expiry_scans.c.name == name).values(
+            expired_through=today - timedelta(days=1), soon_through=cutoff, scanned_at=now,
+        ))
+    return digest
@@ -0,0 +1,164 @@
+"""
+Streaming snapshots of the grocery list, pantry and recipes for the weekly
+digest (or anything else that wants a file).
+
+    python grocery.py export pantry --out pantry.csv
+    python grocery.py export recipes --format json --out recipes.json
+    python grocery.py export all --format ndjson --out digest/ --since 2025-10-01
+
+Rows come off a server-side cursor and go straight to the writer, so memory
+stays constant however big the tables are. Recipes and their ingredients
+come from one joined query. --since limits the export to rows added (or
+recipes created) at or after that time. Files appear atomically: a reader
+sees the previous version or the complete new one, never a partial write.
+The grocery export covers the current list, and the pantry and recipes
+exports cover the current household (see db.use_list).
+"""
+import csv
+import itertools
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import select
+
+from db import current_scope, get_engine, grocery_items, pantry_items, recipes, recipe_ingredients
+
+FORMATS = ("csv", "ndjson", "json")
+KINDS = ("grocery", "pantry", "recipes")
+
+def _stream(stmt, batch_size):
+    with get_engine().connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(stmt)
+        for r in result.mappings():
+            yield dict(r)
+
+def iter_grocery(since: datetime | None = None, batch_size: int = 1000):
+    household_id, list_id = current_scope()
+    stmt = (select(grocery_items)
+            .where(grocery_items.c.household_id == household_id, grocery_items.c.list_id == list_id)
+            .order_by(grocery_items.c.id))
+    if since:
+        stmt = stmt.where(grocery_items.c.added_at >= since)
+    return _stream(stmt, batch_size)
+
+def iter_pantry(since: datetime | None = None, batch_size: int = 1000):
+    stmt = (select(pantry_items)
+            .where(pantry_items.c.household_id == current_scope()[0])
+            .order_by(pantry_items.c.id))
+    if since:
+        stmt = stmt.where(pantry_items.c.added_at >= since)
+    return _stream(stmt, batch_size)
+
+def iter_recipes(since: datetime | None = None, batch_size: int = 1000):
+    """Yield {id, title, source_url, created_at, ingredients: [...]} from one joined query."""
+    ri = recipe_ingredients
+    stmt = (
+        select(recipes, ri.c.id.label("ingredient_id"), ri.c.name, ri.c.quantity, ri.c.unit)
+        .outerjoin(ri, ri.c.recipe_id == recipes.c.id)
+        .where(recipes.c.household_id == current_scope()[0])
+        .order_by(recipes.c.id, ri.c.id)
+    )
+    if since:
+        stmt = stmt.where(recipes.c.created_at >= since)
+    for _, rows in itertools.groupby(_stream(stmt, batch_size), key=lambda r: r["id"]):
+        first = next(rows)
+        recipe = {k: first[k] for k in ("id", "title", "source_url", "created_at")}
+        recipe["ingredients"] = [
+            {"name": r["name"], "quantity": r["quantity"], "unit": r["unit"]}
+            for r in itertools.chain([first], rows) if r["ingredient_id"] is not None
+        ]
+        yield recipe
+
+_READERS = {"grocery": iter_grocery, "pantry": iter_pantry, "recipes": iter_recipes}
+
+def _csv_rows(kind, rows):
+    # CSV is flat: one line per recipe ingredient (recipes without any get one blank line)
+    if kind != "recipes":
+        yield from rows
+        return
+    for recipe in rows:
+        base = {k: recipe[k] for k in ("id", "title", "source_url", "created_at")}
+        for ing in recipe["ingredients"] or [{"name": None, "quantity": None, "unit": None}]:
+            yield {**base, "ingredient": ing["name"], "quantity": ing["quantity"], "unit": ing["unit"]}
+
+_CSV_FIELDS = {
+    "grocery": ["id", "name", "purchased", "added_at", "quantity", "unit"],
+    "pantry": ["id", "name", "quantity", "unit", "expires_at", "added_at"],
+    "recipes": ["id", "title", "source_url", "created_at", "ingredient", "quantity", "unit"],
+}
+
+def _json_default(value):
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+def write_rows(f, kind: str, rows, fmt: str) -> int:
+    """
+    Write `rows` of `kind` to the text file `f` as they are read. Returns the
+    number of rows written (for recipes as CSV, one per ingredient).
+    """
+    n = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(f, fieldnames=_CSV_FIELDS[kind], extrasaction="ignore", lineterminator="\n")
+        writer.writeheader()
+        for n, row in enumerate(rows, 1):
+            writer.writerow(row)
+        return n
+    if fmt == "ndjson":
+        for n, row in enumerate(rows, 1):
+            f.write(json.dumps(row, default=_json_default))
+            f.write("\n")
+        return n
+    # One JSON array, still written element by element
+    f.write("[")
+    for n, row in enumerate(rows, 1):
+        f.write(",\n" if n > 1 else "\n")
+        f.write(json.dumps(row, default=_json_default))
+    f.write("\n]\n" if n else "]\n")
+    return n
+
+@contextmanager
+def atomic_write(path: str):
+    """Open a temp file next to `path` and move it into place only if the block succeeds."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        # mkstemp creates 0600; give the file the mode a plain open() would
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp, 0o666 & ~umask)
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def export(kind: str, path: str, fmt: str | None = None, since: datetime | None = None) -> int:
+    """
+    Export one of KINDS to `path` ("-" for stdout). The format defaults to
+    the file extension. Returns the number of rows written.
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r} (expected one of {', '.join(FORMATS)})")
+    rows = _READERS[kind](since)
+    if fmt == "csv":
+        rows = _csv_rows(kind, rows)
+    if path == "-":
+        return write_rows(sys.stdout, kind, rows, fmt)
+    with atomic_write(path) as f:
+        return write_rows(f, kind, rows, fmt)
+
+def export_all(directory: str, fmt: str = "csv", since: datetime | None = None) -> dict:
+    """Write grocery.<fmt>, pantry.<fmt> and recipes.<fmt> into `directory`."""
+    return {kind: export(kind, os.path.join(directory, f"{kind}.{fmt}"), fmt, since) for kind in KINDS}
+
+def parse_since(value: str | None) -> datetime | None:
+    """YYYY-MM-DD or a full ISO timestamp."""
+    return datetime.fromisoformat(value) if value else None
@@ -1,30 +1,208 @@
-from db import (
-    init_db, list_items as db_list_items, add_item as db_add_item,
-    remove_item as db_remove_item, toggle_purchased as db_toggle_purchased,
-    create_recipe, add_recipe_to_grocery,add_pantry_item, list_pantry_items,
-    add_or_merge_pantry_item, get_expiring_items
-)
-from recipes import spoonacular_from_url, parse_pasted_ingredients
+import os
+import sys
+
+import profiling
+
+# db (and with it SQLAlchemy) and journal are imported by the actions that
+# use them: importing grocery stays cheap (benchmarks/bench_startup.py)
 
 SORT_MODE = "name"
+PAGE_SIZE = 25
 
-def show_list():
-    items = db_list_items()
-    if not items:
-        print("\nYour grocery list is empty.\n")
-        return items
-    print("\nGrocery List (auto-sorted: unpurchased first; by " + SORT_MODE + "):")
-    for i, item in enumerate(items, 1):
-        box = "☑" if item["purchased"] else "☐"
-        qty_unit = f"{item['quantity']:.2f}".rstrip("0").rstrip(".")
-        if item.get("unit"):
-            qty_unit += f" {item['unit']}"
-        print(f"{i}. {box} {item['name']}  —  {qty_unit}  —  added {item['added_at']}")
+# Set GROCERY_LIVE_CACHE=1 to serve the list/pantry from a LISTEN/NOTIFY-fed cache
+LIVE = None
+# How long a poll waits for our own just-committed changes to arrive
+LIVE_POLL_TIMEOUT = 0.05
+
+# Known item names for Tab completion and "did you mean", loaded on first use
+NAMES = None
+
+# --offline (or GROCERY_OFFLINE=1): menu writes are queued in this journal
+JOURNAL = None
+# The --list given while the database was unreachable; queued writes go there
+QUEUE_LIST_ID = None
+QUEUED = object()
+
+def _list_id():
+    import db
+    return QUEUE_LIST_ID or db.current_scope()[1]
+
+def _unreachable(e) -> bool:
+    from journal import is_unreachable
+    return is_unreachable(e)
+
+def _write(ops, direct):
+    """
+    Run a menu write. Offline, `ops` (apply records, see cli.py) are only
+    queued for `sync`, without touching the network. Online, `direct()`
+    runs against the database and `ops` are queued instead only if the
+    server turns out to be unreachable, so such a write waits for the
+    failed connection first. Returns what direct() returned, else QUEUED.
+    """
+    from journal import Journal
+    if JOURNAL is None:
+        try:
+            return direct()
+        except Exception as e:
+            if not _unreachable(e):
+                raise
+            print("Database unreachable.")
+    journal = JOURNAL or Journal()
+    keys = journal.append(ops, _list_id())
+    _update_saved_list(journal, ops)
+    print(f"Queued {len(keys)} operation(s); {journal.counts()['pending']} waiting for `sync`.")
+    return QUEUED
+
+def _update_saved_list(journal, ops):
+    # Show queued removals and check-offs in the list as last shown
+    saved = journal.saved_list(_list_id())
+    if saved is None:
+        return
+    removed = {o["id"] for o in ops if o["op"] == "remove"}
+    purchased = {o["id"]: o["op"] == "purchase" for o in ops if o["op"] in ("purchase", "unpurchase")}
+    lines = []
+    for line in saved[1]:
+        if removed.issuperset(line["ids"]):
+            continue
+        if line["ids"][0] in purchased:
+            line["purchased"] = purchased[line["ids"][0]]
+        lines.append(line)
+    lines.sort(key=lambda l: (l["purchased"], l["key"], l["family"]))
+    journal.save_list(_list_id(), lines)
+
+def _names():
+    global NAMES
+    if NAMES is None:
+        from matching import load_prefix_index
+        NAMES = load_prefix_index()
+    return NAMES
+
+def _input_completing(prompt, names):
+    try:
+        import readline
+    except ImportError:  # e.g. Windows: plain input()
+        return input(prompt)
+    matches = []
+
+    def complete(text, state):
+        if state == 0:
+            matches[:] = names.complete(text)
+        return matches[state] if state < len(matches) else None
+
+    saved = readline.get_completer(), readline.get_completer_delims()
+    readline.set_completer(complete)
+    readline.set_completer_delims("")  # complete the whole line, spaces included
+    readline.parse_and_bind("bind ^I rl_complete" if "libedit" in (readline.__doc__ or "") else "tab: complete")
+    try:
+        return input(prompt)
+    finally:
+        readline.set_completer(saved[0])
+        readline.set_completer_delims(saved[1])
+
+def ask_item(prompt):
+    """
+    Prompt for an item name with Tab completion from the household's names,
+    offering the closest known name for one that is new.
+    """
+    if JOURNAL is not None and NAMES is None:  # offline: no completion
+        return input(prompt).strip()
+    try:
+        names = _names()
+    except Exception as e:
+        if not _unreachable(e):
+            raise
+        return input(prompt).strip()
+    name = _input_completing(prompt, names).strip()
+    if not name:
+        return name
+    suggestion = names.suggest(name)
+    if suggestion and input(f"Did you mean '{suggestion}'? [y/N]: ").strip().lower() == "y":
+        name = suggestion
+    from recipes import canonical_name
+    names.add(canonical_name(name))
+    return name
+
+def _shopping_page(after=None, limit=PAGE_SIZE):
+    if LIVE:
+        LIVE.poll(LIVE_POLL_TIMEOUT)
+        return LIVE.shopping_list_page(after, limit)
+    import db
+    return db.shopping_list_page(after, limit)
+
+def _saved_page(after=None, limit=PAGE_SIZE):
+    # The list as last shown (see show_list), for when the database can't be used
+    from journal import Journal
+    saved = (JOURNAL or Journal()).saved_list(_list_id())
+    lines = saved[1] if saved else []
+    start = 0
+    if after:
+        start = next((i + 1 for i, l in enumerate(lines) if l["ids"] == after["ids"]), len(lines))
+    return lines[start:start + limit]
+
+def _pantry_page(after=None, limit=PAGE_SIZE):
+    if LIVE:
+        LIVE.poll(LIVE_POLL_TIMEOUT)
+        return LIVE.list_pantry_page(after, limit)
+    import db
+    return db.list_pantry_page(after, limit)
+
+def page_through(fetch_page, render, page_size: int = PAGE_SIZE, first_page=None):
+    """
+    Print rows page by page (keyset pages from `fetch_page(after, limit)`),
+    numbering them continuously. Returns the rows that were shown.
+    """
+    shown = []
+    page = first_page if first_page is not None else fetch_page(None, page_size)
+    while page:
+        for row in page:
+            shown.append(row)
+            render(len(shown), row)
+        if len(page) < page_size:
+            break
+        if input("-- Enter for more, q to stop: ").strip().lower() == "q":
+            break
+        page = fetch_page(page[-1], page_size)
+    return shown
+
+def _render_item(n, item):
+    box = "☑" if item["purchased"] else "☐"
+    qty_unit = f"{item['quantity']:.2f}".rstrip("0").rstrip(".")
+    if item.get("unit"):
+        qty_unit += f" {item['unit']}"
+    print(f"{n}. {box} {item['name']}  —  {qty_unit}  —  added {item['added_at']}")
+
+def show_list(page_size: int = PAGE_SIZE):
+    """
+    Show the list and return the lines shown, which the journal keeps.
+    Offline, or when the database can't be reached, show those instead.
+    """
+    fetch = _shopping_page if JOURNAL is None else _saved_page
+    try:
+        first_page = fetch(limit=page_size)
+    except Exception as e:
+        if not _unreachable(e):
+            raise
+        print("Database unreachable.")
+        fetch = _saved_page
+        first_page = fetch(limit=page_size)
+    if not first_page:
+        print("\nNo saved copy of the list to work from.\n" if fetch is _saved_page
+              else "\nYour grocery list is empty.\n")
+        return first_page
+    if fetch is _saved_page:
+        print("\nGrocery List (as last shown, with the changes waiting for `sync`):")
+    else:
+        print("\nGrocery List (auto-sorted: unpurchased first; by " + SORT_MODE + "):")
+    items = page_through(fetch, _render_item, page_size, first_page)
     print()
+    if fetch is _shopping_page:
+        from journal import Journal
+        Journal().save_list(_list_id(), items)
     return items
 
 def add_item():
-    name = input("Enter item to add: ").strip()
+    import db
+    name = ask_item("Enter item to add (Tab completes): ")
     if not name:
         print("No item entered.")
         return
@@ -34,24 +212,28 @@ def add_item():
         q = float(qty) if qty else 1.0
     except ValueError:
         q = 1.0
-    db_add_item(name, q, unit)
-    print(f"Added: {name}")
+    if _write([{"op": "add", "name": name, "quantity": q, "unit": unit}],
+              lambda: db.add_item(name, q, unit)) is not QUEUED:
+        print(f"Added: {name}")
 
 def remove_item():
+    import db
     items = show_list()
     if not items:
         return
     try:
         num = int(input("Enter number of item to remove: "))
         if 1 <= num <= len(items):
-            db_remove_item(items[num - 1]["id"])
-            print(f"Removed: {items[num - 1]['name']}")
+            ids = items[num - 1]["ids"]
+            if _write([{"op": "remove", "id": i} for i in ids], lambda: db.remove_items(ids)) is not QUEUED:
+                print(f"Removed: {items[num - 1]['name']}")
         else:
             print("Invalid number.")
     except ValueError:
         print("Please enter a valid number.")
 
 def toggle_purchased():
+    import db
     items = show_list()
     if not items:
         return
@@ -59,52 +241,144 @@ def toggle_purchased():
         num = int(input("Enter number of item to toggle purchased: "))
         if 1 <= num <= len(items):
             chosen = items[num - 1]  # snapshot before toggle
-            new_state = db_toggle_purchased(chosen["id"])
-            state = "purchased" if new_state else "not purchased"
-            print(f"Toggled '{chosen['name']}' to {state}.")
+            # A line may aggregate several rows; they share one purchased state
+            if chosen["purchased"]:
+                if _write([{"op": "unpurchase", "id": i} for i in chosen["ids"]],
+                          lambda: db.unpurchase_items(chosen["ids"])) is not QUEUED:
+                    print(f"Toggled '{chosen['name']}' to not purchased.")
+                return
+
+            # Marking it purchased also moves it into the pantry
+            print("→ Adding to pantry (press Enter to skip any field).")
+            # Pre-fill qty/unit from the grocery item
+            default_qty = chosen.get("quantity", 1)
+            default_unit = chosen.get("unit") or ""
 
-            # If we just marked it purchased, auto-move into pantry
-            if new_state:
-                print("→ Adding to pantry (press Enter to skip any field).")
-                # Pre-fill qty/unit from the grocery item
-                default_qty = chosen.get("quantity", 1)
-                default_unit = chosen.get("unit") or ""
+            exp = input("Expiration date (YYYY-MM-DD, optional): ").strip() or None
 
-                exp = input("Expiration date (YYYY-MM-DD, optional): ").strip() or None
+            # Quantity/unit prompts are optional; keep existing if blank
+            qty_in = input(f"Quantity [{default_qty}]: ").strip()
+            unit_in = input(f"Unit [{default_unit}]: ").strip()
 
-                # Quantity/unit prompts are optional; keep existing if blank
-                qty_in = input(f"Quantity [{default_qty}]: ").strip()
-                unit_in = input(f"Unit [{default_unit}]: ").strip()
+            try:
+                q = float(qty_in) if qty_in else float(default_qty or 1)
+            except ValueError:
+                q = float(default_qty or 1)
 
-                try:
-                    q = float(qty_in) if qty_in else float(default_qty or 1)
-                except ValueError:
-                    q = float(default_qty or 1)
+            u = unit_in if unit_in else (default_unit or None)
 
-                u = unit_in if unit_in else (default_unit or None)
+            price_in = input("Price paid (optional): ").strip()
+            try:
+                price = float(price_in) if price_in else None
+            except ValueError:
+                price = None
 
-                add_or_merge_pantry_item(chosen["name"], q, u, exp)
-                print(f"✓ Moved to pantry: {chosen['name']} — {q}{(' ' + u) if u else ''}{(' (exp ' + exp + ')') if exp else ''}")
+            # The whole line becomes one pantry entry (and one priced purchase)
+            overrides = {item_id: {"pantry": False} for item_id in chosen["ids"][1:]}
+            overrides[chosen["ids"][0]] = {"quantity": q, "unit": u, "expires_at": exp, "price": price}
+            bought = _write([{"op": "purchase", "id": i, **o} for i, o in overrides.items()],
+                            lambda: db.purchase_items(chosen["ids"], overrides))
+            if bought is QUEUED:
+                return
+            if not bought:
+                print(f"'{chosen['name']}' was already checked off.")
+                return
+            print(f"Toggled '{chosen['name']}' to purchased.")
+            print(f"✓ Moved to pantry: {chosen['name']} — {q}{(' ' + u) if u else ''}{(' (exp ' + exp + ')') if exp else ''}")
 
         else:
             print("Invalid number.")
     except ValueError:
         print("Please enter a valid number.")
 
+def checkout():
+    import db
+    items = show_list()
+    if not items:
+        return
+    picks = input("Numbers of items bought (comma-separated, or 'all'): ").strip().lower()
+    try:
+        if picks == "all":
+            chosen = [i for i in items if not i["purchased"]]
+        else:
+            nums = [int(p) for p in picks.split(",") if p.strip()]
+            if not all(1 <= n <= len(items) for n in nums):
+                print("Invalid number.")
+                return
+            chosen = [items[n - 1] for n in nums]
+    except ValueError:
+        print("Please enter valid numbers.")
+        return
+    ids = [item_id for item in chosen for item_id in item["ids"]]
+    if not ids:
+        print("Nothing to check off.")
+        return
+    bought = _write([{"op": "purchase", "id": i} for i in ids], lambda: db.purchase_items(ids))
+    if bought is not QUEUED:
+        print(f"✓ Checked off {len(bought)} row(s) and moved them to the pantry.")
+
 def add_recipe_from_url():
     url = input("Paste recipe URL: ").strip()
     if not url:
         print("No URL provided.")
         return
     try:
+        from recipes import spoonacular_from_url
         data = spoonacular_from_url(url)
     except Exception as e:
         print(f"Error fetching recipe: {e}")
         return
-    rid = create_recipe(data["title"], data["source_url"], data["ingredients"])
-    add_recipe_to_grocery(rid)
+    import db
+    db.import_recipe(data["title"], data["source_url"], data["ingredients"])
     print(f"Added '{data['title']}' ingredients to grocery list.")
 
+def read_url_list(path: str | None = None):
+    """URLs from a file (or stdin until an empty line); '#' starts a comment."""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    else:
+        lines = []
+        while True:
+            try:
+                line = input()
+            except EOFError:
+                break
+            if not line.strip():
+                break
+            lines.append(line)
+    return [l.strip() for l in lines if l.strip() and not l.strip().startswith("#")]
+
+def bulk_import_recipes(urls, max_workers: int = 8):
+    """Fetch recipes concurrently, then store them in batched transactions."""
+    from recipes import fetch_recipes
+    results = fetch_recipes(urls, max_workers=max_workers)
+    fetched = [data for _, data, err in results if err is None]
+    failed = [(url, err) for url, _, err in results if err is not None]
+    if fetched:
+        import db
+        db.import_recipes(fetched)
+    for data in fetched:
+        print(f"✓ {data['title']} ({len(data['ingredients'])} ingredients)")
+    for url, err in failed:
+        print(f"✗ {url}: {err}")
+    print(f"Imported {len(fetched)} of {len(results)} recipes.")
+    return fetched, failed
+
+def add_recipes_from_url_list():
+    path = input("File with one URL per line (blank = paste URLs, end with empty line): ").strip()
+    if not path:
+        print("Paste recipe URLs (one per line). Finish with an empty line:")
+    try:
+        urls = read_url_list(path or None)
+    except OSError as e:
+        print(f"Could not read {path}: {e}")
+        return
+    if not urls:
+        print("No URLs provided.")
+        return
+    bulk_import_recipes(urls)
+
 def add_recipe_by_paste():
     title = input("Recipe title: ").strip()
     print("Paste ingredients (one per line). Finish with an empty line:")
@@ -114,11 +388,158 @@ def add_recipe_by_paste():
         if not line.strip():
             break
         lines.append(line)
+    import db
+    from recipes import parse_pasted_ingredients
     data = parse_pasted_ingredients(title, "\n".join(lines))
-    rid = create_recipe(data["title"], data["source_url"], data["ingredients"])
-    add_recipe_to_grocery(rid)
+    db.import_recipe(data["title"], data["source_url"], data["ingredients"])
     print(f"Added '{data['title']}' ingredients to grocery list.")
 
+def expiration_digest():
+    days = input("Warn about items expiring within how many days? (default 3): ").strip()
+    try:
+        d = int(days) if days else 3
+    except ValueError:
+        d = 3
+    from expiry import FileSink, StdoutSink, scan as expiry_scan
+    sinks = [StdoutSink()]
+    if os.getenv("EXPIRY_DIGEST_FILE"):
+        sinks.append(FileSink(os.getenv("EXPIRY_DIGEST_FILE")))
+    if not expiry_scan(d, sinks):
+        print("No new expiration alerts since the last check.")
+
+def _render_pantry_item(n, item):
+    exp = f" (expires {item['expires_at']})" if item['expires_at'] else ""
+    unit = f" {item['unit']}" if item['unit'] else ""
+    print(f"{n}. {item['name']} — {item['quantity']}{unit}{exp}")
+
+def _fmt_qty(q):
+    return f"{q:.2f}".rstrip("0").rstrip(".")
+
+def plan_from_recipes():
+    import db
+    print("\nRecipes:")
+    shown = page_through(db.list_recipes_page, lambda n, r: print(f"{n}. {r['title']}"))
+    if not shown:
+        print("No recipes saved yet.")
+        return
+    picks = input("Recipe numbers to cook (comma-separated): ").strip()
+    try:
+        nums = [int(p) for p in picks.split(",") if p.strip()]
+    except ValueError:
+        print("Please enter valid numbers.")
+        return
+    if not nums or not all(1 <= n <= len(shown) for n in nums):
+        print("Invalid number.")
+        return
+    dry_run = input("Dry run only? [y/N]: ").strip().lower() == "y"
+    rows = db.plan_recipes([shown[n - 1]["id"] for n in nums], dry_run=dry_run)
+    for r in rows:
+        unit = f" {r['unit']}" if r["unit"] else ""
+        if r["missing"] > 1e-9:
+            print(f"+ {r['name']} — buy {_fmt_qty(r['missing'])}{unit} (need {_fmt_qty(r['needed'])}, have {_fmt_qty(r['have'])})")
+        else:
+            print(f"= {r['name']} — covered by pantry ({_fmt_qty(r['have'])}{unit})")
+    to_buy = sum(1 for r in rows if r["missing"] > 1e-9)
+    if dry_run:
+        print(f"Dry run: {to_buy} item(s) would be added.")
+    else:
+        print(f"Added {to_buy} item(s) to the grocery list.")
+
+def switch_list():
+    global NAMES, QUEUE_LIST_ID
+    import db
+    from sqlalchemy.exc import IntegrityError
+    household_id, current = db.current_scope()
+    for l in db.get_lists():
+        print(f"{'*' if l['id'] == current else ' '} {l['id']}. {l['name']}")
+    choice = input("List number, or a new list name: ").strip()
+    if not choice:
+        return
+    try:
+        list_id = int(choice) if choice.isdigit() else db.create_list(choice)
+        db.set_list(list_id)
+    except ValueError as e:
+        print(f"Could not switch: {e}")
+        return
+    except IntegrityError:  # uq_lists_household_name
+        print(f"Could not switch: list {choice!r} already exists.")
+        return
+    QUEUE_LIST_ID = None
+    if db.current_scope()[0] != household_id:
+        NAMES = None  # names are per household
+    if LIVE:
+        # The cache holds one list; reload it for the new one
+        LIVE.household_id, LIVE.list_id = db.current_scope()
+        LIVE.start()
+    print(f"Now on list {list_id}.")
+
+def run_action(action):
+    """Run one menu action as a profiled operation (a no-op unless --profile)."""
+    with profiling.operation(action.__name__):
+        try:
+            return action()
+        except Exception as e:
+            if not _unreachable(e):
+                raise
+            print(f"Database unreachable: {str(e.orig if e.orig is not None else e).splitlines()[0]}")
+
+def show_pantry():
+    if not page_through(_pantry_page, _render_pantry_item):
+        print("Pantry is empty.")
+
+def add_pantry():
+    import db
+    name = ask_item("Item name (Tab completes): ")
+    qty = input("Quantity (default 1): ").strip()
+    unit = input("Unit (optional): ").strip() or None
+    exp = input("Expiration date (YYYY-MM-DD, optional): ").strip() or None
+    try:
+        q = float(qty) if qty else 1.0
+    except ValueError:
+        q = 1.0
+    if _write([{"op": "pantry_add", "name": name, "quantity": q, "unit": unit, "expires_at": exp}],
+              lambda: db.add_pantry_item(name, q, unit, exp)) is not QUEUED:
+        print(f"Added {name} to pantry.")
+
+def show_expiring():
+    days = input("Show items expiring within how many days? (default 3): ").strip()
+    try:
+        d = int(days) if days else 3
+    except ValueError:
+        d = 3
+    import db
+    expiring = db.get_expiring_items(d)
+    if not expiring:
+        print(f"No items expiring in {d} days.")
+    else:
+        print(f"Items expiring in {d} days:")
+        for e in expiring:
+            unit = f" {e['unit']}" if e['unit'] else ""
+            print(f"- {e['name']} — {e['quantity']}{unit} (expires {e['expires_at']})")
+
+def suggest_from_pantry():
+    from suggest import suggest_meals
+    meals = suggest_meals(5)
+    if not meals:
+        print("No saved recipe uses anything in the pantry.")
+        return
+    print("Recipes you can (nearly) make:")
+    for m in meals:
+        line = f"- {m['title']} (have {m['have']}/{m['total']})"
+        if m["expiring"]:
+            line += f" — uses up {', '.join(m['expiring'])}"
+        print(line)
+        if m["missing"]:
+            print(f"    missing: {', '.join(m['missing'])}")
+
+PANTRY_ACTIONS = {
+    "1": show_pantry,
+    "2": add_pantry,
+    "3": show_expiring,
+    "5": expiration_digest,
+    "6": suggest_from_pantry,
+}
+
 def pantry_menu():
     while True:
         print("\n=== Pantry Menu ===")
@@ -126,49 +547,70 @@ def pantry_menu():
         print("2. Add pantry item")
         print("3. Show expiring soon")
         print("4. Back to main menu")
+        print("5. Expiration digest (new alerts only)")
+        print("6. Suggest meals from pantry")
         choice = input("Choose: ").strip()
 
-        if choice == "1":
-            items = list_pantry_items()
-            if not items:
-                print("Pantry is empty.")
-            else:
-                for i, item in enumerate(items, 1):
-                    exp = f" (expires {item['expires_at']})" if item['expires_at'] else ""
-                    unit = f" {item['unit']}" if item['unit'] else ""
-                    print(f"{i}. {item['name']} — {item['quantity']}{unit}{exp}")
-        elif choice == "2":
-            name = input("Item name: ").strip()
-            qty = input("Quantity (default 1): ").strip()
-            unit = input("Unit (optional): ").strip() or None
-            exp = input("Expiration date (YYYY-MM-DD, optional): ").strip() or None
-            try:
-                q = float(qty) if qty else 1.0
-            except ValueError:
-                q = 1.0
-            add_pantry_item(name, q, unit, exp)
-            print(f"Added {name} to pantry.")
-        elif choice == "3":
-            days = input("Show items expiring within how many days? (default 3): ").strip()
-            try:
-                d = int(days) if days else 3
-            except ValueError:
-                d = 3
-            expiring = get_expiring_items(d)
-            if not expiring:
-                print(f"No items expiring in {d} days.")
-            else:
-                print(f"Items expiring in {d} days:")
-                for e in expiring:
-                    unit = f" {e['unit']}" if e['unit'] else ""
-                    print(f"- {e['name']} — {e['quantity']}{unit} (expires {e['expires_at']})")
-        elif choice == "4":
+        if choice == "4":
             break
+        elif choice in PANTRY_ACTIONS:
+            run_action(PANTRY_ACTIONS[choice])
         else:
             print("Invalid choice.")
 
-def main():
-    init_db()
+def main(argv=None):
+    """Run a scripted subcommand if one is given, else the interactive menu."""
+    global LIVE, JOURNAL, QUEUE_LIST_ID
+    import cli
+    import db
+    from journal import Journal
+    args = cli.build_parser().parse_args(argv)
+    profile = args.profile or args.trace
+    if profile:
+        profiling.enable()
+    try:
+        # No connect or schema check here: db.get_engine() does both on first use
+        # Offline, --list is only recorded with the queued operations
+        if args.list_id and not (args.offline and cli.queued_operations(args) is not None):
+            try:
+                db.set_list(args.list_id)
+            except ValueError as e:
+                print(f"error: {e}", file=sys.stderr)
+                return 2
+            except Exception as e:
+                if not (args.offline and _unreachable(e)):
+                    raise
+                QUEUE_LIST_ID = args.list_id
+        if args.command:
+            return cli.run(args)
+        if args.offline:
+            JOURNAL = Journal()
+        if os.getenv("GROCERY_LIVE_CACHE") == "1":
+            from live_cache import LiveCache
+            LIVE = LiveCache().start()
+        menu()
+        return 0
+    finally:
+        if profile:
+            profiling.print_summary(file=sys.stderr)
+            if args.trace:
+                profiling.write_trace(args.trace)
+
+# Menu choice -> action; each call is one profiled operation (see profiling.py)
+MENU_ACTIONS = {
+    "1": show_list,
+    "2": add_item,
+    "3": toggle_purchased,
+    "4": remove_item,
+    "5": add_recipe_from_url,
+    "6": add_recipe_by_paste,
+    "9": add_recipes_from_url_list,
+    "10": plan_from_recipes,
+    "11": checkout,
+    "12": switch_list,
+}
+
+def menu():
     while True:
         print("=== Family Grocery List ===")
         print("1. Show list")
@@ -179,28 +621,22 @@ def main():
         print("6. Add recipe by pasting ingredients")
         print("7. Quit")
         print("8. Pantry Menu")
+        print("9. Bulk import recipes from URL list")
+        print("10. Plan recipes against pantry")
+        print("11. Checkout (check off several items)")
+        print("12. Switch list")
         choice = input("Choose an option: ").strip()
 
-        if choice == "1":
-            show_list()
-        elif choice == "2":
-            add_item()
-        elif choice == "3":
-            toggle_purchased()
-        elif choice == "4":
-            remove_item()
-        elif choice == "5":
-            add_recipe_from_url()
-        elif choice == "6":
-            add_recipe_by_paste()
-        elif choice == "7":
+        if choice == "7":
             print("Goodbye!")
             break
         elif choice == "8":
             pantry_menu()
+        elif choice in MENU_ACTIONS:
+            run_action(MENU_ACTIONS[choice])
         else:
             print("Invalid choice, try again.")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
@@ -0,0 +1,128 @@
+"""
+Shared HTTP plumbing for recipe APIs: one pooled requests.Session with
+timeouts and retry/backoff, plus a small persistent response cache.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (3.05, 20)
+
+_session = None
+_session_lock = threading.Lock()
+
+# Optional observer, called as on_request(url, status, seconds) after every
+# request (status None if it failed outright); profiling.py installs one.
+on_request = None
+
+def get_session():
+    """Return the process-wide pooled requests.Session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # requests is a heavy import; only pay for it when a fetch happens
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({"GET"}),
+                respect_retry_after_header=True,
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+            s = requests.Session()
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+        return _session
+
+def get_json(url: str, params: dict | None = None, timeout=DEFAULT_TIMEOUT):
+    import requests
+    start, status = time.perf_counter(), None
+    try:
+        resp = get_session().get(url, params=params, timeout=timeout)
+        status = resp.status_code
+    finally:
+        if on_request is not None:
+            on_request(url, status, time.perf_counter() - start)
+    if not resp.ok:
+        # Don't echo the full URL: query params carry the API key
+        raise requests.HTTPError(f"{resp.status_code} {resp.reason} from {urlsplit(url).netloc}", response=resp)
+    return resp.json()
+
+class ResponseCache:
+    """
+    Key -> JSON value cache stored in SQLite, with a TTL and a bound on the
+    number of entries (least recently used entries are evicted first).
+    Safe to share between threads.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 30 * 24 * 3600, max_entries: int = 500):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    used_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_used_at ON responses (used_at)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, stored_at = row
+            if now - stored_at > self.ttl_seconds:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                db.commit()
+                return None
+            db.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+            db.commit()
+        return json.loads(value)
+
+    def put(self, key: str, value) -> None:
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, stored_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            # Drop expired entries, then the least recently used beyond the bound
+            db.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.ttl_seconds,))
+            db.execute("""
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM responses")
+            db.commit()
@@ -0,0 +1,220 @@
+"""
+Bulk importer for legacy grocery lists and CSV dumps.
+
+Input is parsed lazily and streamed into a temporary staging table with
+Postgres COPY, then merged into the real table by one set-based statement,
+all in a single transaction. A file of any size costs a fixed handful of
+statements, and memory stays flat.
+
+    python grocery.py import data/grocery_list.txt       # "[x] Name created_at: ..." lines
+    python grocery.py import pantry.csv                   # name,quantity,unit,expires_at[,added_at]
+    python grocery.py import groceries.csv --into grocery # name,quantity,unit,purchased[,added_at]
+
+Rows go to the current list and household (see db.use_list). Unpurchased
+grocery rows are merged into matching unpurchased items, keyed the same
+way as add_items. Purchased rows go straight to purchase_history, dated by
+their timestamp (counted under "history"). Pantry rows are merged on
+(ingredient, unit, expires_at), as at checkout. Names new to the ingredient
+catalog are added to it.
+"""
+import csv
+import io
+import itertools
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+
+import db
+from db import current_scope, get_engine
+
+_LEGACY_LINE = re.compile(r"^\[(?P<mark>[ xX])\]\s*(?P<name>.*?)(?:\s+created_at:\s*(?P<ts>\S+(?:\s+\S+)?))?\s*$")
+
+_TRUE = {"1", "true", "t", "yes", "y", "x"}
+
+def parse_legacy_list(lines, errors: list):
+    """
+    Yield (ord, name, purchased, added_at, quantity, unit) from the pre-Postgres
+    text format. Plain lines (no checkbox) from the oldest files are unpurchased items.
+    """
+    for n, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        m = _LEGACY_LINE.match(line)
+        if m:
+            name, purchased, ts = m["name"].strip(), m["mark"] != " ", m["ts"]
+        else:
+            name, purchased, ts = line, False, None
+        added_at = None
+        if ts:
+            try:
+                added_at = datetime.fromisoformat(ts)
+            except ValueError:
+                errors.append({"line": n, "error": f"bad created_at {ts!r}"})
+                continue
+        if not name:
+            errors.append({"line": n, "error": "missing name"})
+            continue
+        yield n, name, purchased, added_at, 1.0, None
+
+def _csv_records(f, errors: list, convert):
+    for n, rec in enumerate(csv.DictReader(f), 2):
+        rec = {(k or "").strip().lower(): (v.strip() if isinstance(v, str) else v) or None
+               for k, v in rec.items()}
+        try:
+            if not rec.get("name"):
+                raise ValueError("missing name")
+            yield convert(n, rec)
+        except ValueError as e:
+            errors.append({"line": n, "error": str(e)})
+
+def _timestamp(value):
+    return datetime.fromisoformat(value) if value else None
+
+def _date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+def _quantity(value):
+    return float(value) if value else 1.0
+
+def parse_grocery_csv(f, errors: list):
+    """Yield (ord, name, purchased, added_at, quantity, unit) from a CSV with a header row."""
+    return _csv_records(f, errors, lambda n, r: (
+        n, r["name"], (r.get("purchased") or "").lower() in _TRUE,
+        _timestamp(r.get("added_at")), _quantity(r.get("quantity")), r.get("unit"),
+    ))
+
+def parse_pantry_csv(f, errors: list):
+    """Yield (ord, name, quantity, unit, expires_at, added_at) from a CSV with a header row."""
+    return _csv_records(f, errors, lambda n, r: (
+        n, r["name"], _quantity(r.get("quantity")), r.get("unit"),
+        _date(r.get("expires_at")), _timestamp(r.get("added_at")),
+    ))
+
+class CopyStream:
+    """
+    Read-only file object that renders rows to CSV on demand, so COPY can
+    consume a generator without the whole file being held in memory.
+    None becomes an unquoted empty field, which COPY reads as NULL.
+    """
+
+    def __init__(self, rows, chunk_rows: int = 1000):
+        self._rows = iter(rows)
+        self._chunk_rows = chunk_rows
+        self._buf = io.StringIO()
+        self._writer = csv.writer(self._buf, lineterminator="\n")
+        self._done = False
+        self.rows = 0
+
+    def read(self, size: int = -1) -> str:
+        while not self._done and (size < 0 or self._buf.tell() < size):
+            chunk = list(itertools.islice(self._rows, self._chunk_rows))
+            if not chunk:
+                self._done = True
+                break
+            self._writer.writerows(chunk)
+            self.rows += len(chunk)
+        data = self._buf.getvalue()
+        rest = ""
+        if 0 <= size < len(data):
+            data, rest = data[:size], data[size:]
+        self._buf.seek(0)
+        self._buf.truncate()
+        self._buf.write(rest)
+        return data
+
+_GROCERY_STAGING = """
+    CREATE TEMP TABLE import_grocery (
+        ord integer, name text, purchased boolean, added_at timestamp,
+        quantity double precision, unit text, ingredient_id integer
+    ) ON COMMIT DROP
+"""
+
+# Timestamped rows keep their (earliest) added_at; the rest are stamped now
+_ADDED_AT = "coalesce(min(src.added_at), :now)"
+
+_GROCERY_MERGE = "WITH " + db._merge_ctes("SELECT * FROM import_grocery WHERE NOT purchased", _ADDED_AT) + """,
+    history AS (
+        INSERT INTO purchase_history
+            (household_id, list_id, ingredient_id, name, quantity, unit, purchased_at, delta)
+        SELECT :household_id, :list_id, s.ingredient_id, s.name, coalesce(s.quantity, 1), s.unit,
+               coalesce(s.added_at, :now), 1
+        FROM import_grocery s
+        WHERE s.purchased
+        ORDER BY s.ord
+        RETURNING id
+    )
+    SELECT """ + db._MERGE_COUNTS + """,
+           (SELECT count(*) FROM history) AS history
+"""
+
+_PANTRY_STAGING = """
+    CREATE TEMP TABLE import_pantry (
+        ord integer, name text, quantity double precision, unit text,
+        expires_at date, added_at timestamp, ingredient_id integer
+    ) ON COMMIT DROP
+"""
+
+_PANTRY_MERGE = "WITH " + db._pantry_merge_ctes("SELECT * FROM import_pantry", _ADDED_AT) + """
+    SELECT (SELECT count(*) FROM pantry_updated) AS updated,
+           (SELECT count(*) FROM pantry_inserted) AS inserted
+"""
+
+# Intern the staged names: new ones join the catalog, then every row gets its id
+_CATALOG = (
+    """INSERT INTO ingredients (name)
+       SELECT DISTINCT canonical_name(name) FROM {staging}
+       ON CONFLICT (name) DO NOTHING""",
+    """UPDATE {staging} s SET ingredient_id = i.id
+       FROM ingredients i WHERE i.name = canonical_name(s.name)""",
+)
+
+_TABLES = {
+    "grocery": (_GROCERY_STAGING, "import_grocery (ord, name, purchased, added_at, quantity, unit)", _GROCERY_MERGE),
+    "pantry": (_PANTRY_STAGING, "import_pantry (ord, name, quantity, unit, expires_at, added_at)", _PANTRY_MERGE),
+}
+
+def copy_import(rows, into: str) -> dict:
+    """
+    COPY `rows` (tuples from one of the parsers above) into a staging table
+    and merge them into grocery_items or pantry_items in one transaction.
+    Returns {"read": n, "updated": n, "inserted": n}, plus "history": n for grocery rows.
+    """
+    staging, target, merge = _TABLES[into]
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("bulk import needs Postgres (COPY)")
+    stream = CopyStream(rows)
+    with engine.begin() as conn:
+        conn.execute(text(staging))
+        with conn.connection.cursor() as cur:
+            cur.copy_expert(f"COPY {target} FROM STDIN WITH (FORMAT csv)", stream)
+        for sql in _CATALOG:
+            conn.execute(text(sql.format(staging=f"import_{into}")))
+        household_id, list_id = current_scope()
+        params = {"now": datetime.utcnow(), "household_id": household_id, "list_id": list_id}
+        counts = conn.execute(text(merge), params).mappings().one()
+    return {"read": stream.rows, **counts}
+
+def import_file(path: str, into: str | None = None) -> dict:
+    """
+    Import a legacy .txt list or a CSV dump. `into` ("grocery"/"pantry")
+    defaults to grocery for .txt and pantry for .csv. Lines that don't parse
+    are skipped and reported under "errors".
+    """
+    is_csv = path.lower().endswith(".csv")
+    into = into or ("pantry" if is_csv else "grocery")
+    errors = []
+    with open(path, encoding="utf-8", newline="") as f:
+        if not is_csv:
+            if into != "grocery":
+                raise ValueError("legacy text lists can only be imported into the grocery list")
+            rows = parse_legacy_list(f, errors)
+        elif into == "grocery":
+            rows = parse_grocery_csv(f, errors)
+        else:
+            rows = parse_pantry_csv(f, errors)
+        summary = copy_import(rows, into)
+    summary["errors"] = errors
+    return summary
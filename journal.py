@@ -0,0 +1,256 @@
+"""
+Offline-first write journal.
+
+    python grocery.py --offline add milk --qty 2    # or GROCERY_OFFLINE=1
+    python grocery.py --offline purchase 12 --price 3.49
+    python grocery.py sync --batch-size 500
+
+With --offline, add, remove, purchase and pantry add don't touch the
+database: their operations (the records of `apply`, see cli.py) are
+appended to a local SQLite file in one small transaction and the command
+returns. `sync` replays them to the database in the order they were
+queued, `--batch-size` operations per transaction, through the same path
+as `apply`. If the server can't be reached, everything stays queued and
+the next sync picks it up.
+
+The interactive menu (`python grocery.py --offline`) queues its writes
+the same way: adding, removing and checking off items, and adding to the
+pantry. It works from the shopping list as last shown, which the journal
+keeps (with the queued changes applied), so offline it never waits on the
+network. Without --offline a write goes to the database first and is
+queued only if the server turns out to be unreachable (is_unreachable;
+a failed statement is reported, not queued); the list as last shown is
+used the same way then.
+
+Every operation gets an idempotency key when it is queued. The database
+records the keys it applied (applied_operations, migration 11) in the
+same transaction as the changes, so a batch that committed but whose
+acknowledgement was lost (the connection dropped, the process was killed
+before the journal was updated) is skipped when it is sent again.
+
+Conflicts resolve the same way whichever device syncs first: operations
+are states, not toggles. Checking off an item that another phone already
+checked off is a no-op (the pantry is stocked once), un-checking one that
+isn't checked is a no-op, and removing or purchasing an item that is gone
+changes nothing. Operations from one journal are applied in the order
+they were queued, so the last thing done on this device wins.
+
+A batch that fails while the server is up is retried one operation per
+transaction; the ones that still fail are marked rejected (kept in the
+journal with the error, never retried) and the rest are applied.
+
+To try it, stop the database (`docker compose stop db`), queue a few
+changes with --offline, run `sync` (it reports the server offline), start
+the database again and run `sync` once more.
+"""
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+import db
+
+JOURNAL_PATH = os.getenv("GROCERY_JOURNAL_PATH",
+                         os.path.join(os.path.dirname(__file__), "data", "journal.sqlite3"))
+
+# Synced operations are kept this long (for `sync` reports), then dropped
+KEEP_SYNCED_SECONDS = 7 * 24 * 3600
+
+class Journal:
+    """Append-only queue of operations in SQLite. Safe to share between threads."""
+
+    def __init__(self, path: str = JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL: an append is one sequential write, and a sync in another
+            # process doesn't block it. NORMAL doesn't fsync every commit;
+            # a power cut can lose the last appends, never corrupt the file.
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS operations (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    key TEXT NOT NULL UNIQUE,
+                    list_id INTEGER NOT NULL,
+                    op TEXT NOT NULL,
+                    queued_at REAL NOT NULL,
+                    synced_at REAL,
+                    error TEXT
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_operations_pending ON operations (seq) "
+                "WHERE synced_at IS NULL AND error IS NULL"
+            )
+            # The shopping list as last shown, per list, for the menu to use offline
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS saved_lists (
+                    list_id INTEGER PRIMARY KEY,
+                    saved_at REAL NOT NULL,
+                    lines TEXT NOT NULL
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def append(self, ops, list_id: int) -> list[str]:
+        """Queue `ops` (apply records) for `list_id`. Returns their keys."""
+        now = time.time()
+        rows = [(uuid.uuid4().hex, list_id, json.dumps(op), now) for op in ops]
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.executemany("INSERT INTO operations (key, list_id, op, queued_at) VALUES (?, ?, ?, ?)", rows)
+        return [r[0] for r in rows]
+
+    def pending(self, limit: int | None = None) -> list[tuple[int, str, int, dict]]:
+        """The oldest operations not yet synced: [(seq, key, list_id, op)]."""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT seq, key, list_id, op FROM operations WHERE synced_at IS NULL AND error IS NULL "
+                "ORDER BY seq LIMIT ?", (-1 if limit is None else limit,)
+            ).fetchall()
+        return [(seq, key, list_id, json.loads(op)) for seq, key, list_id, op in rows]
+
+    def counts(self) -> dict:
+        with self._lock:
+            pending, rejected = self._db().execute(
+                "SELECT count(*) FILTER (WHERE synced_at IS NULL AND error IS NULL), "
+                "count(*) FILTER (WHERE error IS NOT NULL) FROM operations"
+            ).fetchone()
+        return {"pending": pending, "rejected": rejected}
+
+    def mark(self, synced=(), rejected=None):
+        """Record `synced` seqs as applied and `rejected` ({seq: error}) as failed."""
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.executemany("UPDATE operations SET synced_at = ? WHERE seq = ?", [(now, s) for s in synced])
+                conn.executemany("UPDATE operations SET error = ? WHERE seq = ?",
+                                 [(e, s) for s, e in (rejected or {}).items()])
+
+    def compact(self, older_than: float = KEEP_SYNCED_SECONDS) -> int:
+        """Drop operations synced more than `older_than` seconds ago."""
+        with self._lock:
+            conn = self._db()
+            with conn:
+                return conn.execute("DELETE FROM operations WHERE synced_at < ?",
+                                    (time.time() - older_than,)).rowcount
+
+    def save_list(self, list_id: int, lines: list[dict]):
+        """Keep `lines` (shopping list lines) as the list last shown for `list_id`."""
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO saved_lists (list_id, saved_at, lines) VALUES (?, ?, ?)",
+                             (list_id, time.time(), json.dumps(lines)))
+
+    def saved_list(self, list_id: int) -> tuple[float, list[dict]] | None:
+        """(saved_at, lines) of the list last shown for `list_id`, or None."""
+        with self._lock:
+            row = self._db().execute(
+                "SELECT saved_at, lines FROM saved_lists WHERE list_id = ?", (list_id,)
+            ).fetchone()
+        return row and (row[0], json.loads(row[1]))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def reachable() -> bool:
+    try:
+        with db.get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except (OperationalError, InterfaceError):
+        return False
+
+def is_unreachable(exc) -> bool:
+    """
+    True if `exc` means the server can't be reached, as opposed to a bad
+    operation. The DBAPI raises the same OperationalError for a refused
+    connection as for a deadlock or a statement timeout, so unless the
+    connection was seen to drop, this asks the server with reachable().
+    """
+    if not isinstance(exc, DBAPIError):
+        return False
+    if exc.connection_invalidated:
+        return True
+    return isinstance(exc, (OperationalError, InterfaceError)) and not reachable()
+
+def _errors_by_seq(summary) -> dict:
+    return {e["line"] if "line" in e else e["lines"][0]: e["error"] for e in summary["errors"]}
+
+def _replay(list_id, records, batch_size) -> tuple[dict, dict]:
+    # (apply summary, {seq: error} of operations to reject)
+    from cli import apply_operations
+    try:
+        with db.use_list(list_id):
+            summary = apply_operations(records, batch_size)
+            if not any("lines" in e for e in summary["errors"]):
+                return summary, _errors_by_seq(summary)
+            if not reachable():
+                raise OperationalError("sync", None, Exception(summary["errors"][-1]["error"]), connection_invalidated=True)
+            # The server is up, so some operation is bad: retry the failed
+            # batches one operation per transaction to find it
+            failed = [e["lines"] for e in summary["errors"] if "lines" in e]
+            retried = apply_operations([r for r in records if any(a <= r[0] <= b for a, b in failed)], 1)
+            if retried["errors"] and not reachable():
+                raise OperationalError("sync", None, Exception(retried["errors"][-1]["error"]),
+                                       connection_invalidated=True)
+            rejected = {e["line"]: e["error"] for e in summary["errors"] if "line" in e}
+            rejected.update(_errors_by_seq(retried))
+            summary["applied"] += retried["applied"]
+            summary["skipped"] += retried["skipped"]
+            return summary, rejected
+    except ValueError as e:  # the list was deleted
+        return {"applied": 0, "skipped": 0, "errors": []}, {seq: str(e) for seq, _ in records}
+
+def sync(journal: Journal | None = None, batch_size: int = 500) -> dict:
+    """
+    Send the journal's pending operations to the database, oldest first.
+    Returns {applied, skipped, rejected: [{seq, error}], pending, offline}:
+    `skipped` were already applied (by an earlier, unacknowledged sync),
+    `pending` are still queued (all of them when `offline`).
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive")
+    journal = journal or Journal()
+    summary = {"applied": 0, "skipped": 0, "rejected": [], "offline": False}
+    try:
+        while True:
+            rows = journal.pending(batch_size)
+            if not rows:
+                break
+            # One run per list, in queue order
+            for list_id, run in itertools.groupby(rows, key=lambda r: r[2]):
+                records = [(seq, {**op, "key": key}) for seq, key, _, op in run]
+                result, rejected = _replay(list_id, records, batch_size)
+                journal.mark([seq for seq, _ in records if seq not in rejected], rejected)
+                summary["applied"] += result["applied"]
+                summary["skipped"] += result["skipped"]
+                summary["rejected"] += [{"seq": seq, "error": e} for seq, e in sorted(rejected.items())]
+    except DBAPIError as e:
+        if not is_unreachable(e):
+            raise
+        summary["offline"] = True
+        summary["error"] = str(e.orig if e.orig is not None else e).splitlines()[0]
+    journal.compact()
+    summary["pending"] = journal.counts()["pending"]
+    return summary
@@ -0,0 +1,210 @@
+"""
+In-process cache of grocery and pantry state for the interactive session.
+
+Triggers (migration 6) publish every row change on the `grocery_changes`
+channel with the new row in the payload. LiveCache loads one snapshot,
+LISTENs on a dedicated connection (kept out of the engine's pool: it is in
+autocommit and listening) and applies those deltas, so showing
+the list again costs no query at all, and edits made by other family
+members show up on the next poll. The cache holds the list and household
+that were current when it started; changes to other tenants are ignored.
+"""
+import json
+import select
+from bisect import bisect_right
+from datetime import date, datetime
+
+from sqlalchemy import select as sql_select
+
+from db import current_scope, get_engine, grocery_items, ingredients, pantry_items, unit_measures
+from recipes import canonical_name
+
+CHANNEL = "grocery_changes"
+
+def _as_datetime(v):
+    return datetime.fromisoformat(v) if isinstance(v, str) else v
+
+def _as_date(v):
+    return date.fromisoformat(v) if isinstance(v, str) else v
+
+class LiveCache:
+    def __init__(self, engine=None):
+        self.engine = engine or get_engine()
+        self.household_id, self.list_id = current_scope()
+        self._conn = None
+        self.grocery = {}   # id -> row
+        self.pantry = {}    # id -> row
+        self.catalog = {}   # ingredient id -> catalog name (append-only, never stale)
+        self.measure = None  # db.unit_measures(), loaded with the snapshot
+        self._lines = None  # memoized shopping list, dropped on every delta
+        self._pantry_sorted = None
+
+    # --- lifecycle ---
+    def start(self):
+        """LISTEN first, then snapshot, so no change falls between the two."""
+        self.close()
+        raw = self.engine.raw_connection()
+        # Never back to the pool: a later engine.begin() would get autocommit
+        raw.detach()
+        pg = raw.dbapi_connection
+        pg.autocommit = True
+        with pg.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL}")
+        self._conn = pg
+        g, p = grocery_items.c, pantry_items.c
+        with self.engine.connect() as conn:
+            self.measure = unit_measures(conn)
+            rows = conn.execute(
+                sql_select(grocery_items, ingredients.c.name.label("catalog_name"))
+                .outerjoin(ingredients, ingredients.c.id == g.ingredient_id)
+                .where(g.household_id == self.household_id, g.list_id == self.list_id)
+            ).mappings().all()
+            self.catalog.update((r["ingredient_id"], r["catalog_name"]) for r in rows if r["ingredient_id"])
+            self.grocery = {r["id"]: self._grocery(r) for r in rows}
+            rows = conn.execute(sql_select(pantry_items).where(p.household_id == self.household_id)).mappings()
+            self.pantry = {r["id"]: self._pantry(r) for r in rows}
+        self._invalidate()
+        return self
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def poll(self, timeout: float = 0.0) -> int:
+        """Apply pending change notifications; returns how many were applied."""
+        if self._conn is None:
+            self.start()
+        pg = self._conn
+        try:
+            if not pg.notifies and select.select([pg], [], [], timeout) == ([], [], []):
+                return 0
+            pg.poll()
+        except Exception as e:
+            # psycopg2 raises its own OperationalError/InterfaceError on a dropped socket
+            if not isinstance(e, OSError) and type(e).__name__ not in ("OperationalError", "InterfaceError"):
+                raise
+            self.start()  # lost the listener: resync from a fresh snapshot
+            return 0
+        applied = 0
+        while pg.notifies:
+            self.apply(json.loads(pg.notifies.pop(0).payload))
+            applied += 1
+        return applied
+
+    # --- deltas ---
+    def apply(self, change: dict):
+        # Partitioned tables (partitioning.py) report the partition, e.g. grocery_items_p3
+        table = self.grocery if change["table"].startswith("grocery_items") else self.pantry
+        row = change["row"]
+        if change["op"] == "DELETE":
+            table.pop(row["id"], None)
+        elif row["household_id"] != self.household_id or row.get("list_id", self.list_id) != self.list_id:
+            return
+        elif table is self.grocery:
+            iid = row.get("ingredient_id")
+            if iid is not None and iid not in self.catalog:
+                with self.engine.connect() as conn:
+                    self.catalog[iid] = conn.execute(
+                        sql_select(ingredients.c.name).where(ingredients.c.id == iid)).scalar()
+            table[row["id"]] = self._grocery(row)
+        else:
+            table[row["id"]] = self._pantry(row)
+        self._invalidate()
+
+    def _invalidate(self):
+        self._lines = None
+        self._pantry_sorted = None
+
+    def _grocery(self, r):
+        iid = r.get("ingredient_id")
+        return {
+            "id": r["id"],
+            "name": r["name"],
+            "ingredient_id": iid,
+            # Same grouping key as db._SHOPPING_LIST
+            "key": self.catalog.get(iid) or canonical_name(r["name"]),
+            "purchased": r["purchased"],
+            "added_at": _as_datetime(r["added_at"]),
+            "quantity": 1 if r["quantity"] is None else r["quantity"],
+            "unit": r["unit"],
+        }
+
+    @staticmethod
+    def _pantry(r):
+        return {
+            "id": r["id"],
+            "name": r["name"],
+            "quantity": r["quantity"],
+            "unit": r["unit"],
+            "expires_at": _as_date(r["expires_at"]),
+            "added_at": _as_datetime(r["added_at"]),
+        }
+
+    # --- reads (same shapes as db.shopping_list_page / db.list_pantry_page) ---
+    def shopping_list(self):
+        if self._lines is None:
+            self._lines = _aggregate(self.grocery.values(), self.measure)
+        return self._lines
+
+    def shopping_list_page(self, after: dict | None = None, limit: int = 50):
+        lines = self.shopping_list()
+        start = 0
+        if after:
+            keys = [(l["purchased"], l["key"], l["family"]) for l in lines]
+            start = bisect_right(keys, (after["purchased"], after["key"], after["family"]))
+        return lines[start:start + limit]
+
+    def list_pantry_page(self, after: dict | None = None, limit: int = 50):
+        if self._pantry_sorted is None:
+            rows = sorted(self.pantry.values(),
+                          key=lambda r: (r["expires_at"] is None, r["expires_at"] or date.min, r["id"]))
+            self._pantry_sorted = [
+                {**r,
+                 "expires_at": r["expires_at"].strftime("%Y-%m-%d") if r["expires_at"] else None,
+                 "added_at": r["added_at"].strftime("%Y-%m-%d %H:%M")}
+                for r in rows
+            ]
+        start = 0
+        if after:
+            ids = [r["id"] for r in self._pantry_sorted]
+            start = ids.index(after["id"]) + 1 if after["id"] in ids else 0
+        return self._pantry_sorted[start:start + limit]
+
+def _aggregate(rows, measure):
+    """
+    Python twin of db.shopping_list(): group rows by their "key" (the
+    catalog name, else the canonical name) and unit family. `measure` is
+    db.unit_measures(), so units resolve exactly as the SQL resolves them.
+    """
+    groups = {}
+    for r in sorted(rows, key=lambda r: r["id"]):
+        unit, family, factor = measure(r["unit"])
+        key = (r["purchased"], r["key"], family)
+        g = groups.setdefault(key, {"rows": [], "base_total": 0.0, "units": {}})
+        g["rows"].append(r)
+        g["base_total"] += (1 if r["quantity"] is None else r["quantity"]) * factor
+        g["units"][unit] = factor
+
+    lines = []
+    for (purchased, name_key, family), g in sorted(groups.items()):
+        # Ties go to the first unit name, NULL last, as in the SQL
+        small_unit, small_factor = min(g["units"].items(), key=lambda u: (u[1], u[0] is None, u[0] or ""))
+        big_unit, big_factor = min(g["units"].items(), key=lambda u: (-u[1], u[0] is None, u[0] or ""))
+        if g["base_total"] / big_factor >= 1:
+            unit, qty = big_unit, g["base_total"] / big_factor
+        else:
+            unit, qty = small_unit, g["base_total"] / small_factor
+        first = g["rows"][0]
+        lines.append({
+            "id": first["id"],
+            "ids": [r["id"] for r in g["rows"]],
+            "key": name_key,
+            "family": family,
+            "name": first["name"],
+            "purchased": purchased,
+            "added_at": min(r["added_at"] for r in g["rows"]).strftime("%Y-%m-%d %H:%M"),
+            "quantity": round(qty, 3),
+            "unit": unit,
+        })
+    return lines
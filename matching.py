@@ -0,0 +1,149 @@
+"""
+Item-name matching: fuzzy "did you mean" and autocomplete.
+
+similarity() is pg_trgm's trigram similarity, computed the same way in
+Python (words padded with two spaces in front and one behind, shared
+trigrams over all distinct trigrams), so the Python fallback and the
+server agree on every score. On Postgres with pg_trgm (migration 10),
+db.add_items(snap=...) finds the closest item already on the list
+through a trigram GIN index on the ingredient catalog. Without the
+extension, or on SQLite, it scores the list's items here.
+
+PrefixIndex is the autocomplete for the interactive prompts: a sorted
+array of every name and every word suffix of it ("roma tomato" is also
+found under "tomato"), searched by bisection. Its "did you mean" only
+scores names that share a trigram with the input, found through a
+trigram -> names map (the in-memory counterpart of the GIN index). It is
+loaded once per session with a single query, ranked by how often the
+household used each ingredient, and grown as new names are entered.
+"""
+import heapq
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+
+from sqlalchemy import text
+
+import db
+
+# Default for db.add_items(snap=...) and the CLI's --snap
+SNAP_THRESHOLD = 0.5
+
+_WORD = re.compile(r"[^\W_]+")
+
+def trigrams(s: str) -> set[str]:
+    grams = set()
+    for word in _WORD.findall(s.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def similarity(a: str, b: str) -> float:
+    """pg_trgm's similarity(a, b): 0 (nothing shared) to 1 (same trigrams)."""
+    ta, tb = trigrams(a), trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    shared = len(ta & tb)
+    return shared / (len(ta) + len(tb) - shared)
+
+def closest(name: str, candidates, threshold: float = SNAP_THRESHOLD):
+    """
+    The (key, candidate name) of `candidates` ((key, name) pairs) most similar
+    to `name`, if at least `threshold`; ties go to the smaller key. Else None.
+    """
+    grams = trigrams(name)
+    best, best_score = None, threshold
+    for key, other in candidates:
+        og = trigrams(other)
+        shared = len(grams & og)
+        score = shared / (len(grams) + len(og) - shared) if grams and og else 0.0
+        if score > best_score or (score == best_score and (best is None or key < best[0])):
+            best, best_score = (key, other), score
+    return best
+
+def _key(s: str) -> str:
+    return " ".join(s.lower().split())
+
+class PrefixIndex:
+    def __init__(self, names=()):
+        self.uses = {}    # name -> weight (how often the household used it)
+        self._keys = []   # sorted (suffix, name): every name under each of its word starts
+        self._grams = {}  # trigram -> names having it, for suggest()
+        self._sizes = {}  # name -> number of distinct trigrams
+        for name, uses in dict(names).items():
+            self.add(name, uses)
+
+    def __len__(self):
+        return len(self.uses)
+
+    def __contains__(self, name):
+        return _key(name) in self.uses
+
+    def add(self, name: str, uses: int = 1):
+        name = _key(name)
+        if not name:
+            return
+        if name not in self.uses:
+            words = name.split(" ")
+            for i in range(len(words)):
+                insort(self._keys, (" ".join(words[i:]), name))
+            grams = trigrams(name)
+            self._sizes[name] = len(grams)
+            for g in grams:
+                self._grams.setdefault(g, []).append(name)
+        self.uses[name] = self.uses.get(name, 0) + uses
+
+    def complete(self, prefix: str, k: int = 8) -> list[str]:
+        """Up to k names with a word starting with `prefix`, most used first."""
+        prefix = _key(prefix)
+        if not prefix:
+            return []
+        found = set()
+        i = bisect_left(self._keys, (prefix, ""))
+        while i < len(self._keys) and self._keys[i][0].startswith(prefix):
+            found.add(self._keys[i][1])
+            i += 1
+        # Whole-name matches before ones found through a later word
+        return heapq.nsmallest(k, found, key=lambda n: (not n.startswith(prefix), -self.uses[n], n))
+
+    def suggest(self, name: str, threshold: float = SNAP_THRESHOLD):
+        """The known name closest to `name` (a typo or another spelling), or None."""
+        from recipes import canonical_name
+        key = canonical_name(name)
+        if key in self.uses:
+            return None
+        grams = trigrams(key)
+        # Only names sharing a trigram can score above 0
+        shared = Counter(n for g in grams for n in self._grams.get(g, ()))
+        best, best_rank = None, None
+        for n, common in shared.items():
+            score = common / (len(grams) + self._sizes[n] - common)
+            rank = (score, self.uses[n], n)
+            if score >= threshold and (best_rank is None or rank > best_rank):
+                best, best_rank = n, rank
+        return best
+
+# Every ingredient the household has had on a list, in the pantry, in a
+# recipe or in its purchase history, with how many times
+_HOUSEHOLD_NAMES = text("""
+    SELECT i.name, count(*) AS uses
+    FROM (
+        SELECT ingredient_id FROM grocery_items WHERE household_id = :household_id
+        UNION ALL
+        SELECT ingredient_id FROM pantry_items WHERE household_id = :household_id
+        UNION ALL
+        SELECT ingredient_id FROM purchase_history WHERE household_id = :household_id AND delta > 0
+        UNION ALL
+        SELECT ri.ingredient_id FROM recipe_ingredients ri
+        JOIN recipes r ON r.id = ri.recipe_id
+        WHERE r.household_id = :household_id
+    ) AS u
+    JOIN ingredients i ON i.id = u.ingredient_id
+    GROUP BY i.name
+""")
+
+def load_prefix_index(conn=None) -> PrefixIndex:
+    """PrefixIndex of the current household's names, in one query."""
+    with db._begin(conn) as conn:
+        rows = conn.execute(_HOUSEHOLD_NAMES, db._scope_params()).all()
+    return PrefixIndex(rows)
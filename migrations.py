@@ -0,0 +1,456 @@
+"""
+Versioned schema migrations.
+
+Each step runs once, in order, and is recorded in `schema_version`.
+When the database is current, startup costs a single version query.
+Postgres is the real backend; on SQLite (benchmarks, throwaway databases)
+the Postgres-only parts are skipped.
+"""
+from datetime import datetime
+
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, inspect, select, text
+)
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from db import (
+    units, expiry_scans, ingredients, households, lists, purchase_history, purchase_rollups,
+    applied_operations,
+)
+
+# Arbitrary key so concurrent CLI launches don't migrate at the same time
+_LOCK_KEY = 0x67726f63
+
+# The tables step 1 creates, as they were in Week 6. Pinned here rather than
+# taken from db.metadata: every later table and column has its own step.
+_BASELINE = MetaData()
+Table(
+    "grocery_items", _BASELINE,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("name", String(200), nullable=False),
+    Column("purchased", Boolean, nullable=False, default=False),
+    Column("added_at", DateTime, nullable=False, default=datetime.utcnow),
+    Column("quantity", Float, nullable=False, server_default=text("1")),
+    Column("unit", String(50), nullable=True),
+)
+Table(
+    "pantry_items", _BASELINE,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("name", String(200), nullable=False),
+    Column("quantity", Float, nullable=False, server_default=text("1")),
+    Column("unit", String(50), nullable=True),
+    Column("expires_at", Date, nullable=True),
+    Column("added_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+Table(
+    "recipes", _BASELINE,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("title", String(300), nullable=False),
+    Column("source_url", String(1000), nullable=True),
+    Column("created_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+Table(
+    "recipe_ingredients", _BASELINE,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("recipe_id", Integer, ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False),
+    Column("name", String(200), nullable=False),
+    Column("quantity", Float, nullable=False, server_default=text("1")),
+    Column("unit", String(50), nullable=True),
+)
+
+def _baseline(conn):
+    # Tables as of Week 6, plus the columns older databases are missing
+    _BASELINE.create_all(conn)
+    if conn.dialect.name != "postgresql":
+        return
+    conn.execute(text("""
+        ALTER TABLE grocery_items
+        ADD COLUMN IF NOT EXISTS quantity DOUBLE PRECISION DEFAULT 1
+    """))
+    conn.execute(text("""
+        ALTER TABLE grocery_items
+        ADD COLUMN IF NOT EXISTS unit VARCHAR(50)
+    """))
+
+def _unit_conversions(conn):
+    from recipes import UNIT_ALIASES, UNIT_CONVERSIONS
+    units.create(conn, checkfirst=True)
+    rows = []
+    for canon, variants in UNIT_ALIASES.items():
+        family, factor = UNIT_CONVERSIONS.get(canon, (None, 1.0))
+        for alias in variants:
+            rows.append({"alias": alias, "unit": canon, "family": family, "factor": factor})
+    conn.execute(text("""
+        INSERT INTO units (alias, unit, family, factor)
+        VALUES (:alias, :unit, :family, :factor)
+        ON CONFLICT (alias) DO NOTHING
+    """), rows)
+    # SQL twin of recipes.canonical_name, so grouping can happen in the database
+    # (SQLite connections register the Python one instead, see db.get_engine)
+    if conn.dialect.name != "postgresql":
+        return
+    conn.execute(text(r"""
+        CREATE OR REPLACE FUNCTION canonical_name(n text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT CASE
+                WHEN length(s) > 3 AND s LIKE '%ies' THEN left(s, -3) || 'y'
+                WHEN length(s) > 3 AND s LIKE '%es' THEN left(s, -2)
+                WHEN length(s) > 3 AND s LIKE '%s' THEN left(s, -1)
+                ELSE s
+            END
+            FROM (SELECT regexp_replace(regexp_replace(lower(btrim(n)), '[^\w\s\-]', '', 'g'),
+                                        '\s+', ' ', 'g') AS s) AS t
+        $$
+    """))
+
+def _add_column(conn, table, column, ddl):
+    # Databases whose step 1 ran db.metadata.create_all() already have it
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+_CATALOGED = ("grocery_items", "pantry_items", "recipe_ingredients")
+
+def _ingredient_catalog(conn):
+    ingredients.create(conn, checkfirst=True)
+    for table in _CATALOGED:
+        _add_column(conn, table, "ingredient_id", "INTEGER REFERENCES ingredients (id)")
+    # Backfill: one catalog row per canonical name already in use
+    union = " UNION ".join(f"SELECT name FROM {t}" for t in _CATALOGED)
+    conn.execute(text(f"""
+        INSERT INTO ingredients (name)
+        SELECT DISTINCT canonical_name(name) FROM ({union}) AS n
+        WHERE name IS NOT NULL
+        ON CONFLICT (name) DO NOTHING
+    """))
+    for table in _CATALOGED:
+        conn.execute(text(f"""
+            UPDATE {table} SET ingredient_id = i.id
+            FROM ingredients i
+            WHERE i.name = canonical_name({table}.name) AND {table}.ingredient_id IS NULL
+        """))
+
+def _households(conn):
+    households.create(conn, checkfirst=True)
+    lists.create(conn, checkfirst=True)
+    # Everything so far belongs to the first household and its first list
+    conn.execute(text("""
+        INSERT INTO households (name, created_at)
+        SELECT 'Home', CURRENT_TIMESTAMP WHERE NOT EXISTS (SELECT 1 FROM households)
+    """))
+    conn.execute(text("""
+        INSERT INTO lists (household_id, name, created_at)
+        SELECT min(id), 'Groceries', CURRENT_TIMESTAMP FROM households
+        HAVING NOT EXISTS (SELECT 1 FROM lists)
+    """))
+    tenant = "INTEGER NOT NULL DEFAULT 1 REFERENCES households (id)"
+    _add_column(conn, "grocery_items", "household_id", tenant)
+    _add_column(conn, "grocery_items", "list_id", "INTEGER NOT NULL DEFAULT 1 REFERENCES lists (id)")
+    _add_column(conn, "pantry_items", "household_id", tenant)
+    _add_column(conn, "recipes", "household_id", tenant)
+    # The expiration scanner keeps one set of marks per household now
+    conn.execute(text("UPDATE expiry_scans SET name = 'pantry:1' WHERE name = 'pantry'"))
+
+def _purchase_history(conn):
+    purchase_history.create(conn, checkfirst=True)
+    purchase_rollups.create(conn, checkfirst=True)
+    _add_column(conn, "grocery_items", "purchased_at", "TIMESTAMP")
+    _add_column(conn, "grocery_items", "price", "DOUBLE PRECISION")
+    if conn.dialect.name == "postgresql":
+        # One upsert per statement (transition table), however many rows it logged
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION purchase_rollup() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                INSERT INTO purchase_rollups AS r
+                    (household_id, period, period_start, item_count, priced_count, spent)
+                SELECT n.household_id, p.period, CAST(date_trunc(p.period, n.purchased_at) AS date),
+                       sum(n.delta), sum(CASE WHEN n.price IS NULL THEN 0 ELSE n.delta END),
+                       coalesce(sum(n.price), 0)
+                FROM logged n CROSS JOIN (VALUES ('week'), ('month')) AS p(period)
+                GROUP BY 1, 2, 3
+                ON CONFLICT (household_id, period, period_start) DO UPDATE
+                SET item_count = r.item_count + EXCLUDED.item_count,
+                    priced_count = r.priced_count + EXCLUDED.priced_count,
+                    spent = r.spent + EXCLUDED.spent;
+                RETURN NULL;
+            END
+            $$
+        """))
+        conn.execute(text("DROP TRIGGER IF EXISTS purchase_history_rollup ON purchase_history"))
+        conn.execute(text("""
+            CREATE TRIGGER purchase_history_rollup
+            AFTER INSERT ON purchase_history REFERENCING NEW TABLE AS logged
+            FOR EACH STATEMENT EXECUTE FUNCTION purchase_rollup()
+        """))
+    # Rows checked off so far: the best purchase date we have is added_at
+    conn.execute(text("""
+        UPDATE grocery_items SET purchased_at = added_at
+        WHERE purchased = true AND purchased_at IS NULL
+    """))
+    conn.execute(text("""
+        INSERT INTO purchase_history
+            (household_id, list_id, item_id, ingredient_id, name, quantity, unit, price, purchased_at, delta)
+        SELECT household_id, list_id, id, ingredient_id, name, coalesce(quantity, 1), unit, price, purchased_at, 1
+        FROM grocery_items
+        WHERE purchased = true
+        ORDER BY id
+    """))
+
+def _trigram_index(conn):
+    # pg_trgm ships with Postgres (contrib) but may be missing or need rights
+    # we don't have; then db._snap_ingredient_ids scores in Python instead.
+    if conn.dialect.name != "postgresql":
+        return
+    available = conn.execute(text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).first()
+    if available is None:
+        return
+    try:
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except (ProgrammingError, OperationalError):
+        return
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS ix_ingredients_name_trgm
+        ON ingredients USING gin (name gin_trgm_ops)
+    """))
+
+def _expiry_alerts(conn):
+    _add_column(conn, "pantry_items", "alerted", "VARCHAR(10)")
+    # Rows the old date marks already covered were reported; rows added after
+    # the last scan weren't yet
+    conn.execute(text("""
+        UPDATE pantry_items SET alerted = (
+            SELECT CASE WHEN pantry_items.expires_at <= s.expired_through THEN 'expired'
+                        WHEN pantry_items.expires_at <= s.soon_through THEN 'expiring' END
+            FROM expiry_scans s
+            WHERE s.name = 'pantry:' || pantry_items.household_id AND pantry_items.added_at <= s.scanned_at
+        )
+        WHERE expires_at IS NOT NULL
+    """))
+    # A new date is a new alert
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION pantry_items_realert() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                NEW.alerted := NULL;
+                RETURN NEW;
+            END
+            $$
+        """))
+        conn.execute(text("DROP TRIGGER IF EXISTS pantry_items_realert ON pantry_items"))
+        conn.execute(text("""
+            CREATE TRIGGER pantry_items_realert
+            BEFORE UPDATE OF expires_at ON pantry_items
+            FOR EACH ROW WHEN (OLD.expires_at IS DISTINCT FROM NEW.expires_at)
+            EXECUTE FUNCTION pantry_items_realert()
+        """))
+    else:
+        conn.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS pantry_items_realert
+            AFTER UPDATE OF expires_at ON pantry_items
+            WHEN OLD.expires_at IS NOT NEW.expires_at
+            BEGIN
+                UPDATE pantry_items SET alerted = NULL WHERE id = NEW.id;
+            END
+        """))
+
+# recipes.canonical_name() in regex classes that don't depend on the server
+# locale: Python's whitespace (str.isspace, so also strip() and \s), and the
+# ASCII characters it drops (all but letters, digits, "_", "-", whitespace)
+_PY_SPACE = r"[\x09-\x0d\x1c-\x20\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]"
+_PY_DROPPED_ASCII = r"[\x01-\x08\x0e-\x1b\x21-\x2c\x2e\x2f\x3a-\x40\x5b-\x5e\x60\x7b-\x7f]"
+
+def _canonical_names(conn):
+    from recipes import canonical_name
+    postgres = conn.dialect.name == "postgresql"
+    # Step 7 linked rows through the SQL canonical_name(), which only agreed
+    # with the Python one on printable ASCII. Relink those (while the old
+    # function still tells which links it made) and any unlinked row.
+    stale = r"t.name ~ '[^\x20-\x7e]' AND i.name = canonical_name(t.name)" if postgres else "1 = 0"
+    for table in _CATALOGED:
+        rows = conn.execute(text(f"""
+            SELECT t.id, t.name, i.name FROM {table} t
+            LEFT JOIN ingredients i ON i.id = t.ingredient_id
+            WHERE t.name IS NOT NULL AND (i.id IS NULL OR ({stale}))
+        """)).all()
+        relink = [(rid, canonical_name(name)) for rid, name, linked in rows if canonical_name(name) != linked]
+        if not relink:
+            continue
+        keys = sorted({key for _, key in relink})
+        conn.execute(text("INSERT INTO ingredients (name) VALUES (:name) ON CONFLICT (name) DO NOTHING"),
+                     [{"name": key} for key in keys])
+        ids = dict(conn.execute(select(ingredients.c.name, ingredients.c.id).where(ingredients.c.name.in_(keys))).all())
+        conn.execute(text(f"UPDATE {table} SET ingredient_id = :iid WHERE id = :id"),
+                     [{"id": rid, "iid": ids[key]} for rid, key in relink])
+    if not postgres:
+        return
+    # Same steps in the same order as the Python one. lower() under "C"
+    # only folds ASCII, so names with non-ASCII capitals, punctuation or
+    # combining marks still differ; ingredient_ids() (Python) names every
+    # row written since step 7, and the relink above the ones before.
+    conn.execute(text(r"""
+        CREATE OR REPLACE FUNCTION canonical_name(n text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT CASE
+                WHEN length(s) > 3 AND s LIKE '%ies' THEN left(s, -3) || 'y'
+                WHEN length(s) > 3 AND s LIKE '%es' THEN left(s, -2)
+                WHEN length(s) > 3 AND s LIKE '%s' THEN left(s, -1)
+                ELSE s
+            END
+            FROM (SELECT regexp_replace(
+                             regexp_replace(lower(regexp_replace(n, '^SPACE+|SPACE+$', '', 'g') COLLATE "C"),
+                                            'DROPPED', '', 'g'),
+                             'SPACE+', ' ', 'g') AS s) AS t
+        $$
+    """.replace("SPACE", _PY_SPACE).replace("DROPPED", _PY_DROPPED_ASCII)))
+
+# (version, description, step) -- a step is a callable taking a connection,
+# or a list of SQL statements and/or such callables.
+# Never edit a released step; append a new one.
+MIGRATIONS = [
+    (1, "baseline tables", _baseline),
+    (2, "indexes for list, merge, expiry and recipe lookups", [
+        """CREATE INDEX IF NOT EXISTS ix_grocery_items_merge_key
+           ON grocery_items (lower(name), unit) WHERE purchased = false""",
+        """CREATE INDEX IF NOT EXISTS ix_grocery_items_list_order
+           ON grocery_items (purchased, name, id)""",
+        """CREATE INDEX IF NOT EXISTS ix_pantry_items_expires_at
+           ON pantry_items (expires_at)""",
+        """CREATE INDEX IF NOT EXISTS ix_recipe_ingredients_recipe_id
+           ON recipe_ingredients (recipe_id)""",
+    ]),
+    (3, "keyset pagination index for the pantry", [
+        # Serves ORDER BY expires_at NULLS LAST, id and the expiry range scans
+        """CREATE INDEX IF NOT EXISTS ix_pantry_items_list_order
+           ON pantry_items (expires_at, id)""",
+        "DROP INDEX IF EXISTS ix_pantry_items_expires_at",
+    ]),
+    (4, "unit conversion table and canonical_name()", _unit_conversions),
+    (5, "expiration scanner state", [
+        lambda conn: expiry_scans.create(conn, checkfirst=True),
+        # Catches pantry rows added since the last scan with already-passed dates
+        """CREATE INDEX IF NOT EXISTS ix_pantry_items_added_at
+           ON pantry_items (added_at)""",
+    ]),
+    (6, "change notifications for the live cache", [
+        """CREATE OR REPLACE FUNCTION grocery_notify_change() RETURNS trigger
+           LANGUAGE plpgsql AS $$
+           BEGIN
+               PERFORM pg_notify('grocery_changes', json_build_object(
+                   'table', TG_TABLE_NAME,
+                   'op', TG_OP,
+                   'row', CASE WHEN TG_OP = 'DELETE'
+                               THEN json_build_object('id', OLD.id)
+                               ELSE row_to_json(NEW) END
+               )::text);
+               RETURN NULL;
+           END
+           $$""",
+        "DROP TRIGGER IF EXISTS grocery_items_notify ON grocery_items",
+        """CREATE TRIGGER grocery_items_notify
+           AFTER INSERT OR UPDATE OR DELETE ON grocery_items
+           FOR EACH ROW EXECUTE FUNCTION grocery_notify_change()""",
+        "DROP TRIGGER IF EXISTS pantry_items_notify ON pantry_items",
+        """CREATE TRIGGER pantry_items_notify
+           AFTER INSERT OR UPDATE OR DELETE ON pantry_items
+           FOR EACH ROW EXECUTE FUNCTION grocery_notify_change()""",
+    ]),
+    (7, "ingredient catalog; merges keyed on ingredient_id", [
+        _ingredient_catalog,
+        """CREATE INDEX IF NOT EXISTS ix_grocery_items_ingredient_merge
+           ON grocery_items (ingredient_id, unit) WHERE purchased = false""",
+        "DROP INDEX IF EXISTS ix_grocery_items_merge_key",
+        """CREATE INDEX IF NOT EXISTS ix_pantry_items_ingredient
+           ON pantry_items (ingredient_id, unit, expires_at)""",
+        """CREATE INDEX IF NOT EXISTS ix_recipe_ingredients_ingredient_id
+           ON recipe_ingredients (ingredient_id)""",
+    ]),
+    (8, "households and lists; indexes lead with the tenant key", [
+        _households,
+        """CREATE INDEX IF NOT EXISTS ix_grocery_items_scoped_order
+           ON grocery_items (household_id, list_id, purchased, name, id)""",
+        "DROP INDEX IF EXISTS ix_grocery_items_list_order",
+        """CREATE INDEX IF NOT EXISTS ix_grocery_items_scoped_merge
+           ON grocery_items (household_id, list_id, ingredient_id, unit) WHERE purchased = false""",
+        "DROP INDEX IF EXISTS ix_grocery_items_ingredient_merge",
+        """CREATE INDEX IF NOT EXISTS ix_pantry_items_scoped_order
+           ON pantry_items (household_id, expires_at, id)""",
+        "DROP INDEX IF EXISTS ix_pantry_items_list_order",
+        """CREATE INDEX IF NOT EXISTS ix_pantry_items_scoped_ingredient
+           ON pantry_items (household_id, ingredient_id, unit, expires_at)""",
+        "DROP INDEX IF EXISTS ix_pantry_items_ingredient",
+        """CREATE INDEX IF NOT EXISTS ix_pantry_items_scoped_added_at
+           ON pantry_items (household_id, added_at)""",
+        "DROP INDEX IF EXISTS ix_pantry_items_added_at",
+        """CREATE INDEX IF NOT EXISTS ix_recipes_scoped_title
+           ON recipes (household_id, title, id)""",
+    ]),
+    (9, "purchase history, weekly/monthly rollups, archival of purchased rows", [
+        _purchase_history,
+        # archive.py: purchased rows, oldest first
+        """CREATE INDEX IF NOT EXISTS ix_grocery_items_archive
+           ON grocery_items (purchased_at) WHERE purchased = true""",
+        """CREATE INDEX IF NOT EXISTS ix_purchase_history_scoped
+           ON purchase_history (household_id, purchased_at)""",
+    ]),
+    (10, "trigram index on ingredient names for fuzzy matching", _trigram_index),
+    (11, "idempotency keys for replayed offline operations", [
+        lambda conn: applied_operations.create(conn, checkfirst=True),
+    ]),
+    (12, "per-row expiry alerts instead of date/added_at marks", [
+        _expiry_alerts,
+        # The rows a scan can still report: once 'expired', a row drops out
+        """CREATE INDEX IF NOT EXISTS ix_pantry_items_unalerted
+           ON pantry_items (household_id, expires_at) WHERE alerted IS NULL OR alerted <> 'expired'""",
+    ]),
+    (13, "canonical_name() as recipes.canonical_name; catalog links recomputed in Python", _canonical_names),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Released steps written for Postgres alone (plpgsql triggers). Other
+# backends record them as applied without running them.
+_POSTGRES_ONLY = {6}
+
+def current_version(conn) -> int:
+    return conn.execute(text("SELECT coalesce(max(version), 0) FROM schema_version")).scalar_one()
+
+def migrate(engine) -> int:
+    """Bring the schema up to LATEST_VERSION. Returns the resulting version."""
+    try:
+        with engine.connect() as conn:
+            version = current_version(conn)
+    except (ProgrammingError, OperationalError):
+        version = 0  # schema_version doesn't exist yet
+    if version >= LATEST_VERSION:
+        return version
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+        # Re-read under the lock: another process may have migrated meanwhile
+        version = current_version(conn)
+        for step_version, description, step in MIGRATIONS:
+            if step_version <= version:
+                continue
+            if step_version in _POSTGRES_ONLY and conn.dialect.name != "postgresql":
+                step = []
+            for action in ([step] if callable(step) else step):
+                if callable(action):
+                    action(conn)
+                else:
+                    conn.execute(text(action))
+            conn.execute(
+                text("INSERT INTO schema_version (version, description) VALUES (:v, :d)"),
+                {"v": step_version, "d": description},
+            )
+            version = step_version
+    return version
@@ -0,0 +1,108 @@
+"""
+Optional hash partitioning of the per-household tables, for installs with
+very many households on one Postgres instance.
+
+    python partitioning.py --partitions 16
+
+grocery_items and pantry_items are rebuilt as tables PARTITION BY HASH
+(household_id) with `--partitions` partitions, and every row is copied
+across. Each household's rows then live in one small partition with its
+own small indexes. db.py scopes every query by household_id, so the
+planner prunes to that one partition. Their primary keys become
+(household_id, id); ids keep coming from the same sequences. Indexes and
+the change-notification triggers are carried over.
+
+Run it once, during a quiet moment: the copy holds an exclusive lock on
+both tables. It is not a numbered migration, because small installs are
+better off without it. Running it again does nothing.
+"""
+import argparse
+import sys
+
+from sqlalchemy import text
+
+from db import get_engine, grocery_items, pantry_items
+
+PARTITIONED = (grocery_items, pantry_items)
+
+def is_partitioned(conn, table: str) -> bool:
+    return conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = CAST(:t AS regclass)"), {"t": table}
+    ).scalar_one()
+
+def _partition(conn, table, partitions: int):
+    name = table.name
+    old = f"{name}_unpartitioned"
+    seq = conn.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": name}).scalar_one()
+    pkey = conn.execute(text("""
+        SELECT conname FROM pg_constraint WHERE conrelid = CAST(:t AS regclass) AND contype = 'p'
+    """), {"t": name}).scalar_one()
+    indexes = conn.execute(text("""
+        SELECT i.relname, pg_get_indexdef(x.indexrelid)
+        FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = CAST(:t AS regclass) AND NOT x.indisprimary
+    """), {"t": name}).all()
+    triggers = conn.execute(text("""
+        SELECT pg_get_triggerdef(oid) FROM pg_trigger
+        WHERE tgrelid = CAST(:t AS regclass) AND NOT tgisinternal
+    """), {"t": name}).scalars().all()
+
+    # Index names are schema-wide, so free them before the new table claims them
+    for index, _ in indexes:
+        conn.execute(text(f'DROP INDEX "{index}"'))
+    conn.execute(text(f"ALTER SEQUENCE {seq} OWNED BY NONE"))
+    conn.execute(text(f"ALTER TABLE {name} RENAME TO {old}"))
+    conn.execute(text(f'ALTER TABLE {old} RENAME CONSTRAINT "{pkey}" TO "{old}_pkey"'))
+    conn.execute(text(f"""
+        CREATE TABLE {name} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY HASH (household_id)
+    """))
+    conn.execute(text(f'ALTER TABLE {name} ADD CONSTRAINT "{pkey}" PRIMARY KEY (household_id, id)'))
+    for fk in table.foreign_keys:
+        conn.execute(text(
+            f"ALTER TABLE {name} ADD FOREIGN KEY ({fk.parent.name}) "
+            f"REFERENCES {fk.column.table.name} ({fk.column.name})"
+        ))
+    for i in range(partitions):
+        conn.execute(text(f"""
+            CREATE TABLE {name}_p{i} PARTITION OF {name}
+            FOR VALUES WITH (MODULUS {partitions}, REMAINDER {i})
+        """))
+    conn.execute(text(f"INSERT INTO {name} SELECT * FROM {old}"))
+    conn.execute(text(f"DROP TABLE {old}"))
+    conn.execute(text(f"ALTER SEQUENCE {seq} OWNED BY {name}.id"))
+    for _, ddl in indexes:
+        conn.execute(text(ddl))
+    for ddl in triggers:
+        conn.execute(text(ddl))
+    conn.execute(text(f"ANALYZE {name}"))
+
+def partition_by_household(partitions: int = 16, engine=None) -> list[str]:
+    """
+    Hash-partition grocery_items and pantry_items on household_id, in one
+    transaction. Returns the names of the tables that were converted.
+    """
+    if partitions < 2:
+        raise ValueError("need at least 2 partitions")
+    engine = engine or get_engine()
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("partitioning needs Postgres")
+    done = []
+    with engine.begin() as conn:
+        for table in PARTITIONED:
+            if not is_partitioned(conn, table.name):
+                _partition(conn, table, partitions)
+                done.append(table.name)
+    return done
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--partitions", type=int, default=16)
+    args = ap.parse_args(argv)
+    done = partition_by_household(args.partitions)
+    print(f"Partitioned {', '.join(done)} into {args.partitions} partitions." if done
+          else "Already partitioned.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
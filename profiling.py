@@ -0,0 +1,161 @@
+"""
+Per-action profiling: statements, rows, transactions and time spent in the
+database and in HTTP calls, attributed to the menu action or subcommand
+that caused them.
+
+    python grocery.py --profile                  # summary when the menu exits
+    python grocery.py --trace trace.json list    # summary + full JSON trace
+
+Database numbers come from SQLAlchemy engine events (any engine, including
+the live cache's), HTTP numbers from http_client.on_request. Nothing is
+hooked until enable() is called, so the normal path pays nothing.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+_enabled = False
+_lock = threading.Lock()
+# Operations are process-wide rather than per-thread: fetch_recipes() makes
+# its HTTP calls from a thread pool on behalf of the current menu action.
+_stack = []
+_finished = []
+_OTHER = None
+
+class Operation:
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.time()
+        self.seconds = 0.0
+        self.statements = 0
+        self.rows = 0
+        self.db_seconds = 0.0
+        self.transactions = 0
+        self.http_calls = 0
+        self.http_seconds = 0.0
+        self.events = []
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "started": self.started,
+            "ms": self.seconds * 1000,
+            "statements": self.statements,
+            "rows": self.rows,
+            "db_ms": self.db_seconds * 1000,
+            "transactions": self.transactions,
+            "http_calls": self.http_calls,
+            "http_ms": self.http_seconds * 1000,
+            "events": self.events,
+        }
+
+def _current() -> Operation:
+    return _stack[-1] if _stack else _OTHER
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profiling_start", []).append(time.perf_counter())
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["profiling_start"].pop()
+    rows = max(cursor.rowcount, 0)
+    with _lock:
+        op = _current()
+        op.statements += 1
+        op.rows += rows
+        op.db_seconds += elapsed
+        op.events.append({
+            "type": "sql",
+            # Whitespace collapsed and cut short; parameters are left out on purpose
+            "sql": " ".join(statement.split())[:200],
+            "executemany": executemany,
+            "rows": rows,
+            "ms": elapsed * 1000,
+        })
+
+def _begin(conn):
+    with _lock:
+        _current().transactions += 1
+
+def _on_request(url, status, seconds):
+    with _lock:
+        op = _current()
+        op.http_calls += 1
+        op.http_seconds += seconds
+        parts = urlsplit(url)
+        # Host and path only: query strings carry the API key
+        op.events.append({"type": "http", "url": f"{parts.netloc}{parts.path}", "status": status, "ms": seconds * 1000})
+
+def enable():
+    """Start recording. Safe to call more than once."""
+    global _enabled, _OTHER
+    if _enabled:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    import http_client
+    _OTHER = Operation("(outside any action)")
+    event.listen(Engine, "before_cursor_execute", _before_execute)
+    event.listen(Engine, "after_cursor_execute", _after_execute)
+    event.listen(Engine, "begin", _begin)
+    http_client.on_request = _on_request
+    _enabled = True
+
+@contextmanager
+def operation(name: str):
+    """Attribute everything inside the block to `name`. Nested blocks count separately."""
+    if not _enabled:
+        yield
+        return
+    op = Operation(name)
+    start = time.perf_counter()
+    with _lock:
+        _stack.append(op)
+    try:
+        yield op
+    finally:
+        op.seconds = time.perf_counter() - start
+        with _lock:
+            _stack.remove(op)
+            _finished.append(op)
+
+def operations() -> list[Operation]:
+    with _lock:
+        ops = list(_finished)
+        if _OTHER is not None and (_OTHER.statements or _OTHER.http_calls):
+            ops.append(_OTHER)
+    return ops
+
+def summary() -> list[dict]:
+    """One row per action name, totals over all of its calls."""
+    rows = {}
+    for op in operations():
+        r = rows.setdefault(op.name, {
+            "action": op.name, "calls": 0, "ms": 0.0, "statements": 0, "rows": 0,
+            "db_ms": 0.0, "transactions": 0, "http_calls": 0, "http_ms": 0.0,
+        })
+        r["calls"] += 1
+        r["ms"] += op.seconds * 1000
+        r["statements"] += op.statements
+        r["rows"] += op.rows
+        r["db_ms"] += op.db_seconds * 1000
+        r["transactions"] += op.transactions
+        r["http_calls"] += op.http_calls
+        r["http_ms"] += op.http_seconds * 1000
+    return sorted(rows.values(), key=lambda r: r["ms"], reverse=True)
+
+def print_summary(file=None):
+    rows = summary()
+    if not rows:
+        return
+    # Wall time includes waiting at prompts, so compare db/http columns across actions
+    print(f"\n{'action':<28}{'calls':>6}{'wall ms':>10}{'stmts':>7}{'rows':>8}"
+          f"{'txns':>6}{'db ms':>9}{'http':>6}{'http ms':>9}", file=file)
+    for r in rows:
+        print(f"{r['action']:<28}{r['calls']:>6}{r['ms']:>10.1f}{r['statements']:>7}{r['rows']:>8}"
+              f"{r['transactions']:>6}{r['db_ms']:>9.1f}{r['http_calls']:>6}{r['http_ms']:>9.1f}", file=file)
+
+def write_trace(path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"summary": summary(), "operations": [op.to_dict() for op in operations()]}, f, indent=2)
@@ -1,16 +1,28 @@
 import os
 import re
-import requests
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urldefrag
 from dotenv import load_dotenv
-from slugify import slugify
+
+from http_client import ResponseCache, get_json
 
 load_dotenv()
 SPOON_KEY = os.getenv("SPOONACULAR_API_KEY")
+# Overridable so a local stub server can stand in for the real API
+SPOON_BASE_URL = os.getenv("SPOONACULAR_BASE_URL", "https://api.spoonacular.com")
+
+# Normalized extract results, keyed by recipe URL
+extract_cache = ResponseCache(
+    os.getenv("SPOONACULAR_CACHE_PATH", os.path.join(os.path.dirname(__file__), "data", "spoonacular_cache.sqlite3")),
+    ttl_seconds=float(os.getenv("SPOONACULAR_CACHE_TTL", 30 * 24 * 3600)),
+    max_entries=int(os.getenv("SPOONACULAR_CACHE_MAX_ENTRIES", 500)),
+)
 
 # Very light normalization for units and names
 UNIT_ALIASES = {
-    "tsp": ["tsp", "teaspoon", "teaspoons"],
-    "tbsp": ["tbsp", "tablespoon", "tablespoons"],
+    "tsp": ["tsp", "tsps", "teaspoon", "teaspoons"],
+    "tbsp": ["tbsp", "tbsps", "tablespoon", "tablespoons"],
     "cup": ["cup", "cups"],
     "oz": ["oz", "ounce", "ounces"],
     "lb": ["lb", "lbs", "pound", "pounds"],
@@ -18,22 +30,46 @@ UNIT_ALIASES = {
     "kg": ["kg", "kilogram", "kilograms"],
     "ml": ["ml", "milliliter", "milliliters"],
     "l": ["l", "liter", "liters"],
+    # Count-style units: kept as units so they don't end up in the name
+    "can": ["can", "cans"],
+    "clove": ["clove", "cloves"],
+    "pinch": ["pinch", "pinches"],
+    "slice": ["slice", "slices"],
+    "package": ["package", "packages", "pkg"],
+    "bunch": ["bunch", "bunches"],
 }
 
+# Convertible units: family and factor to the family's base unit (ml / g)
+UNIT_CONVERSIONS = {
+    "tsp": ("volume", 4.92892),
+    "tbsp": ("volume", 14.7868),
+    "cup": ("volume", 236.588),
+    "ml": ("volume", 1.0),
+    "l": ("volume", 1000.0),
+    "g": ("mass", 1.0),
+    "kg": ("mass", 1000.0),
+    "oz": ("mass", 28.3495),
+    "lb": ("mass", 453.592),
+}
+
+# Reverse table: any spelling -> canonical unit, O(1) per token
+_UNIT_LOOKUP = {variant: canon for canon, variants in UNIT_ALIASES.items() for variant in variants}
+
 def canonical_unit(token: str | None):
     if not token:
         return None
-    t = token.lower().strip()
-    for canon, variants in UNIT_ALIASES.items():
-        if t in variants:
-            return canon
-    return t  # leave as-is if unknown
+    t = token.lower().strip().rstrip(".")
+    return _UNIT_LOOKUP.get(t, t)  # leave as-is if unknown
 
+_PUNCT_RE = re.compile(r"[^\w\s\-]")
+_SPACE_RE = re.compile(r"\s+")
+
+@lru_cache(maxsize=8192)
 def canonical_name(name: str):
     # Lowercase, remove extra punctuation, crude lemmatization for plural 's'
     n = name.strip().lower()
-    n = re.sub(r"[^\w\s\-]", "", n)
-    n = re.sub(r"\s+", " ", n)
+    n = _PUNCT_RE.sub("", n)
+    n = _SPACE_RE.sub(" ", n)
     if n.endswith("es") and len(n) > 3:
         if n.endswith("ies"):
             n = n[:-3] + "y"   # berries -> berry
@@ -43,42 +79,86 @@ def canonical_name(name: str):
         n = n[:-1]              # carrots -> carrot
     return n
 
+# Unicode vulgar fractions -> " n/d" so "1½" reads as "1 1/2"
+_VULGAR_FRACTIONS = str.maketrans({
+    "½": " 1/2", "⅓": " 1/3", "⅔": " 2/3", "¼": " 1/4", "¾": " 3/4",
+    "⅕": " 1/5", "⅖": " 2/5", "⅗": " 3/5", "⅘": " 4/5", "⅙": " 1/6",
+    "⅚": " 5/6", "⅛": " 1/8", "⅜": " 3/8", "⅝": " 5/8", "⅞": " 7/8",
+    "⁄": "/",
+})
+
+_NUM = r"(?:\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?|\.\d+)"
+_LINE_RE = re.compile(rf"""
+    ^(?:[-*•]\s*)?                                          # list bullet
+    (?:(?P<qty>{_NUM})(?:\s*(?:-|–|to)\s*(?P<qty_hi>{_NUM}))?\s*)?  # 2 | 1 1/2 | 2-3
+    (?:\(\s*(?P<size>{_NUM})\s*-?\s*(?P<size_unit>[a-zA-Z.]+)\s*\)\s*)?  # (14 oz)
+    (?P<rest>.*)$
+""", re.X)
+
+def _to_number(s: str) -> float:
+    whole, _, frac = s.strip().rpartition(" ")
+    if "/" in frac:
+        num, den = frac.split("/")
+        value = float(num) / float(den) if float(den) else 0.0
+    else:
+        value = float(frac)
+    return value + (float(whole) if whole else 0.0)
+
+@lru_cache(maxsize=8192)
 def parse_quantity_unit(text: str):
     """
     Try to pull quantity + unit from a line like:
     "2 cups chopped tomatoes" -> qty=2, unit=cup, name="chopped tomatoes"
     "1.5 lb ground beef" -> qty=1.5, unit=lb, name="ground beef"
+    "1 ½ cups milk" / "1 1/2 cups milk" -> qty=1.5, unit=cup
+    "2-3 carrots" -> qty=3 (ranges take the upper bound)
+    "2 (14 oz) cans tomatoes" -> qty=28, unit=oz, name="tomato"
+    "(14 oz) can tomatoes" -> qty=14, unit=oz, name="tomato"
+    "3 large eggs" -> qty=3, unit=None, name="large egg"
     "tomato" -> qty=None, unit=None, name="tomato"
     """
-    t = text.strip()
-    m = re.match(r"^\s*(\d+(?:\.\d+)?)\s+([a-zA-Z]+)\s+(.*)$", t)
-    if m:
-        qty = float(m.group(1))
-        unit = canonical_unit(m.group(2))
-        name = canonical_name(m.group(3))
-        return qty, unit, name
-    m2 = re.match(r"^\s*(\d+(?:\.\d+)?)\s+(.*)$", t)
-    if m2:
-        qty = float(m2.group(1))
-        unit = None
-        name = canonical_name(m2.group(2))
-        return qty, unit, name
-    # fallback: no qty/unit
-    return None, None, canonical_name(t)
+    t = text.translate(_VULGAR_FRACTIONS).strip()
+    m = _LINE_RE.match(t)
+    qty = None
+    if m.group("qty"):
+        qty = _to_number(m.group("qty_hi") or m.group("qty"))
+    rest = m.group("rest").strip()
+
+    unit = None
+    word, _, tail = rest.partition(" ")
+    if (qty is not None or m.group("size")) and word.lower().rstrip(".") in _UNIT_LOOKUP:
+        # "10 oz" alone is a unit with no name
+        unit = canonical_unit(word)
+        rest = tail
+
+    if m.group("size"):
+        size_unit = canonical_unit(m.group("size_unit"))
+        size = _to_number(m.group("size"))
+        # "2 (14 oz) cans" -> buy 28 oz; the container word is dropped
+        qty = (qty if qty is not None else 1.0) * size
+        unit = size_unit
+
+    return qty, unit, canonical_name(rest)
 
 # -------- Spoonacular by URL (optional) --------
-def spoonacular_from_url(url: str):
+def spoonacular_from_url(url: str, use_cache: bool = True):
     """
     Given a recipe URL, use Spoonacular to extract ingredients.
     Requires SPOONACULAR_API_KEY in your .env
+    Results are cached on disk, so importing the same URL again is local.
     """
+    url = urldefrag(url.strip())[0]
+    if use_cache:
+        cached = extract_cache.get(url)
+        if cached is not None:
+            return cached
     if not SPOON_KEY:
         raise RuntimeError("SPOONACULAR_API_KEY not set")
     # 1) Find recipe id from URL
-    info = requests.get(
-        "https://api.spoonacular.com/recipes/extract",
+    info = get_json(
+        SPOON_BASE_URL + "/recipes/extract",
         params={"apiKey": SPOON_KEY, "url": url}
-    ).json()
+    )
 
     title = info.get("title") or "Untitled Recipe"
     ingredients = []
@@ -94,35 +174,63 @@ def spoonacular_from_url(url: str):
             "unit": canonical_unit(unit),
         })
 
-    return {
+    result = {
         "title": title.strip(),
         "source_url": url,
         "ingredients": ingredients,
     }
+    extract_cache.put(url, result)
+    return result
+
+def fetch_recipes(urls, max_workers: int = 8):
+    """
+    Extract many recipe URLs concurrently over the shared session.
+    Returns (url, data, error) tuples in input order; one failing URL
+    doesn't stop the others. Duplicate URLs are fetched once.
+    """
+    unique = list(dict.fromkeys(u.strip() for u in urls if u.strip()))
+    if not unique:
+        return []
+
+    def fetch(url):
+        try:
+            return url, spoonacular_from_url(url), None
+        except Exception as e:
+            return url, None, e
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique))) as pool:
+        return list(pool.map(fetch, unique))
 
 # -------- Paste-a-list (no API) --------
-def parse_pasted_ingredients(title: str, raw_text: str):
+def parse_ingredient_lines(lines):
     """
-    raw_text: lines like:
-      2 cups spinach
-      1 lb chicken breast
-      3 tomatoes
-      salt
+    Batch parser: yield {name, quantity, unit} for every non-empty line of an
+    iterable (a pasted document, a file object, ...). Repeated lines hit the
+    parse cache.
     """
-    ingredients = []
-    for line in raw_text.splitlines():
+    for line in lines:
         line = line.strip()
         if not line:
             continue
         qty, unit, name = parse_quantity_unit(line)
-        ingredients.append({
+        if not name:
+            continue
+        yield {
             "name": name,
             "quantity": float(qty) if qty is not None else 1.0,
-            "unit": canonical_unit(unit),
-        })
+            "unit": unit,
+        }
 
+def parse_pasted_ingredients(title: str, raw_text: str):
+    """
+    raw_text: lines like:
+      2 cups spinach
+      1 lb chicken breast
+      3 tomatoes
+      salt
+    """
     return {
         "title": title.strip() or "Untitled Recipe",
         "source_url": None,
-        "ingredients": ingredients,
+        "ingredients": list(parse_ingredient_lines(raw_text.splitlines())),
     }
@@ -0,0 +1,203 @@
+"""
+Meal suggestions from what is in the pantry.
+
+    python grocery.py recipe suggest --top 5
+
+RecipeIndex is an inverted index from ingredient (catalog id, see
+db.ingredient_ids) to the recipes that use it. Scoring a pantry only
+touches the posting lists of the ingredients in it: each recipe's covered
+weight is one bincount over those postings, so a library of tens of
+thousands of recipes is ranked in milliseconds. NumPy is used when it is
+installed; without it the same sums run in plain Python.
+
+Every pantry ingredient weighs 1, plus up to `urgency` more as it gets
+closer to expiring within `horizon_days`, so recipes that use up food that
+is about to go off come first. A recipe's score is its covered weight
+divided by its number of ingredients.
+
+There is one index per household. It is built on first use with a single
+query and kept current by db.on_recipe_created. Recipes added by other
+processes are picked up by the same query, limited to ids past the last
+one loaded.
+"""
+import heapq
+import itertools
+import threading
+from datetime import datetime
+
+from sqlalchemy import func, or_, select
+
+import db
+from db import ingredients, pantry_items, recipe_ingredients, recipes
+
+try:
+    import numpy as np
+except ImportError:  # optional; the pure-Python path gives the same ranking
+    np = None
+
+class RecipeIndex:
+    def __init__(self, use_numpy: bool | None = None):
+        self.use_numpy = np is not None if use_numpy is None else use_numpy
+        self.recipe_ids = []    # position -> recipe id
+        self.titles = []
+        self.ingredients = []   # position -> distinct ingredient ids
+        self.postings = {}      # ingredient id -> positions of the recipes using it
+        self.loaded_through = 0  # highest recipe id read from the database
+        self._positions = {}    # recipe id -> position
+        self._lock = threading.Lock()
+        # NumPy copies, rebuilt lazily for whatever add() touched
+        self._arrays = {}
+        self._sizes = None
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def __contains__(self, recipe_id):
+        return recipe_id in self._positions
+
+    def add(self, recipe_id: int, title: str, ingredient_ids):
+        ids = tuple(dict.fromkeys(i for i in ingredient_ids if i is not None))
+        with self._lock:
+            if recipe_id in self._positions:
+                return
+            pos = len(self.recipe_ids)
+            self._positions[recipe_id] = pos
+            self.recipe_ids.append(recipe_id)
+            self.titles.append(title)
+            self.ingredients.append(ids)
+            for iid in ids:
+                self.postings.setdefault(iid, []).append(pos)
+                self._arrays.pop(iid, None)
+            self._sizes = None
+
+    def top(self, weights: dict, k: int = 10) -> list[tuple[int, float]]:
+        """
+        The k best (position, score) pairs for pantry `weights`
+        ({ingredient id: weight}), best first; ties go to the older recipe.
+        Recipes that use nothing from the pantry are left out.
+        """
+        with self._lock:
+            terms = [(iid, w) for iid, w in weights.items() if iid in self.postings]
+            if not terms or k <= 0:
+                return []
+            if self.use_numpy:
+                return self._top_numpy(terms, k)
+            return self._top_python(terms, k)
+
+    def _top_python(self, terms, k):
+        covered = {}
+        for iid, w in terms:
+            for pos in self.postings[iid]:
+                covered[pos] = covered.get(pos, 0.0) + w
+        scores = {pos: c / len(self.ingredients[pos]) for pos, c in covered.items()}
+        best = heapq.nlargest(k, scores, key=lambda pos: (scores[pos], -pos))
+        return [(pos, scores[pos]) for pos in best]
+
+    def _postings_array(self, iid):
+        a = self._arrays.get(iid)
+        if a is None:
+            a = self._arrays[iid] = np.array(self.postings[iid], dtype=np.intp)
+        return a
+
+    def _top_numpy(self, terms, k):
+        n = len(self.recipe_ids)
+        if self._sizes is None:
+            self._sizes = np.fromiter((len(ids) for ids in self.ingredients), dtype=np.float64, count=n)
+        arrays = [self._postings_array(iid) for iid, _ in terms]
+        w = np.fromiter((w for _, w in terms), dtype=np.float64, count=len(terms))
+        covered = np.bincount(np.concatenate(arrays), weights=np.repeat(w, [len(a) for a in arrays]),
+                              minlength=n)
+        # Recipes with no ingredients have covered == 0, so the divisor can't matter
+        score = covered / np.maximum(self._sizes, 1)
+        k = min(k, int(np.count_nonzero(covered)))
+        if k == 0:
+            return []
+        # Everything above the k-th best score, then the oldest of those tied with it
+        kth = np.partition(score, n - k)[n - k]
+        above = np.flatnonzero(score > kth)
+        tied = np.flatnonzero(score == kth)[:k - len(above)]
+        best = np.concatenate([above, tied])
+        best = best[np.lexsort((best, -score[best]))]
+        return [(int(pos), float(score[pos])) for pos in best]
+
+_INDEXES = {}  # household id -> RecipeIndex
+_indexes_lock = threading.Lock()
+
+def _catch_up(index, household_id, conn):
+    # One query: every recipe past the last id loaded, with its ingredients
+    rows = conn.execute(
+        select(recipes.c.id, recipes.c.title, recipe_ingredients.c.ingredient_id)
+        .outerjoin(recipe_ingredients, recipe_ingredients.c.recipe_id == recipes.c.id)
+        .where(recipes.c.household_id == household_id, recipes.c.id > index.loaded_through)
+        .order_by(recipes.c.id)
+    )
+    for recipe_id, group in itertools.groupby(rows, key=lambda r: r[0]):
+        group = list(group)
+        index.add(recipe_id, group[0][1], [r[2] for r in group])
+        index.loaded_through = recipe_id
+
+def recipe_index(household_id: int | None = None, conn=None) -> RecipeIndex:
+    """The (up to date) index for `household_id`, default the current one."""
+    household_id = household_id or db.current_scope()[0]
+    with _indexes_lock:
+        index = _INDEXES.setdefault(household_id, RecipeIndex())
+        with db._begin(conn) as conn:
+            _catch_up(index, household_id, conn)
+    return index
+
+def _on_recipe_created(household_id, recipe_id, title, ingredient_ids):
+    index = _INDEXES.get(household_id)
+    if index is not None:
+        index.add(recipe_id, title, ingredient_ids)
+
+db.on_recipe_created = _on_recipe_created
+
+def pantry_weights(conn, household_id: int, today, horizon_days: int = 7, urgency: float = 1.0) -> dict:
+    """{ingredient id: weight} for the household's usable (unexpired) stock."""
+    p = pantry_items.c
+    rows = conn.execute(
+        select(p.ingredient_id, func.min(p.expires_at))
+        .where(p.household_id == household_id, p.ingredient_id.is_not(None), p.quantity > 0,
+               or_(p.expires_at.is_(None), p.expires_at >= today))
+        .group_by(p.ingredient_id)
+    )
+    weights = {}
+    for iid, expires_at in rows:
+        w = 1.0
+        if expires_at is not None and horizon_days > 0:
+            days_left = (expires_at - today).days
+            if days_left < horizon_days:
+                w += urgency * (horizon_days - days_left) / horizon_days
+        weights[iid] = w
+    return weights
+
+def suggest_meals(k: int = 10, horizon_days: int = 7, urgency: float = 1.0, today=None) -> list[dict]:
+    """
+    The current household's k recipes best covered by its pantry, best first:
+    [{id, title, score, have, total, missing, expiring}], where `missing`
+    and `expiring` (pantry items that expire within `horizon_days`) are
+    canonical ingredient names.
+    """
+    household_id = db.current_scope()[0]
+    today = today or datetime.now().date()
+    with db.get_engine().connect() as conn:
+        index = recipe_index(household_id, conn)
+        weights = pantry_weights(conn, household_id, today, horizon_days, urgency)
+        best = index.top(weights, k)
+        used = {iid for pos, _ in best for iid in index.ingredients[pos]}
+        names = dict(conn.execute(
+            select(ingredients.c.id, ingredients.c.name).where(ingredients.c.id.in_(used))
+        ).all()) if used else {}
+    results = []
+    for pos, score in best:
+        ids = index.ingredients[pos]
+        results.append({
+            "id": index.recipe_ids[pos],
+            "title": index.titles[pos],
+            "score": round(score, 3),
+            "have": sum(1 for i in ids if i in weights),
+            "total": len(ids),
+            "missing": [names[i] for i in ids if i not in weights],
+            "expiring": [names[i] for i in ids if weights.get(i, 1.0) > 1.0],
+        })
+    return results
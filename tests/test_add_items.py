@@ -0,0 +1,21 @@
+def test_units_are_canonical_in_the_merge_key(store):
+    import db
+    db.add_item("Flour", 1, "cups")
+    db.add_item("flour", 2, "cup")
+    db.add_items([{"name": "flour", "quantity": 1, "unit": "Cup"}, {"name": "flour", "quantity": 100, "unit": "g"}])
+    rows = [(r["name"], r["quantity"], r["unit"]) for r in db.list_items()]
+    assert sorted(rows) == [("Flour", 4, "cup"), ("flour", 100, "g")]
+
+def test_ingredient_ids_are_memoized_per_database(sqlite_db, monkeypatch):
+    import db
+    from migrations import migrate
+    from sqlalchemy import create_engine, event
+    db.add_item("milk")
+    other = create_engine("sqlite://", future=True)
+    event.listen(other, "connect", db._sqlite_connect)
+    migrate(other)
+    monkeypatch.setattr(db, "_engine", other)
+    db.add_item("bread")
+    db.add_item("milk")
+    assert sorted((r["name"], r["quantity"]) for r in db.list_items()) == [("bread", 1), ("milk", 1)]
+    other.dispose()
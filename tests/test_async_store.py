@@ -0,0 +1,94 @@
+import asyncio
+import uuid
+from datetime import date, timedelta
+
+ITEMS = [
+    {"name": "milk", "quantity": 1, "unit": "l"},
+    {"name": "eggs", "quantity": 6, "unit": None},
+    {"name": "flour", "quantity": 500, "unit": "g"},
+]
+
+def _store(**kwargs):
+    from async_store import AsyncGroceryStore
+    return AsyncGroceryStore(**kwargs)
+
+def _new_list():
+    import db
+    return db.create_household(f"test {uuid.uuid4().hex[:8]}")[1]
+
+def test_concurrent_dashboards_match_the_sync_reads(household):
+    import db
+    db.add_items(ITEMS)
+    soon = (date.today() + timedelta(days=1)).isoformat()
+    db.add_pantry_items([{"name": "yogurt", "expires_at": soon}, {"name": "rice", "quantity": 2, "unit": "kg"}])
+    expected = {
+        "shopping_list": db.shopping_list_page(limit=50),
+        "pantry": db.list_pantry_page(limit=50),
+        "expiring": db.get_expiring_items(3),
+    }
+
+    async def run():
+        # Fewer connections than queries in flight: renders queue, not fail
+        store = _store(pool_size=2, max_overflow=0)
+        try:
+            return await asyncio.gather(*(store.dashboard() for _ in range(8)))
+        finally:
+            await store.dispose()
+
+    assert asyncio.run(run()) == [expected] * 8
+
+def test_set_list_is_per_task(household):
+    import db
+    lists = [_new_list() for _ in range(3)]
+
+    async def run():
+        store = _store()
+
+        async def request(i, list_id):
+            await store.set_list(list_id)
+            await store.add_items([{"name": f"item {i}", "quantity": 1, "unit": None}])
+            await asyncio.sleep(0)  # let the other tasks switch lists in between
+            return db.current_scope()[1], [r["name"] for r in await store.list_items()]
+
+        try:
+            seen = await asyncio.gather(*(request(i, l) for i, l in enumerate(lists)))
+            return seen, db.current_scope()
+        finally:
+            await store.dispose()
+
+    seen, after = asyncio.run(run())
+    assert seen == [(l, [f"item {i}"]) for i, l in enumerate(lists)]
+    assert after == household  # the caller's list is untouched
+    assert db.list_items() == []
+
+def test_writes_match_the_sync_api(household):
+    import db
+    sync_list, async_list = _new_list(), _new_list()
+    batches = [ITEMS, ITEMS[:1] + [{"name": "sugar", "quantity": 1, "unit": "kg"}]]
+
+    with db.use_list(sync_list):
+        sync_counts = [db.add_items(rows) for rows in batches]
+        ids = [r["id"] for r in db.list_items()]
+        sync_toggles = [db.toggle_purchased(ids[0], 2.5), db.toggle_purchased(ids[1]),
+                        db.toggle_purchased(ids[1]), db.toggle_purchased(-1)]
+        sync_rows = db.list_items()
+
+    async def run():
+        store = _store()
+        try:
+            await store.set_list(async_list)
+            counts = [await store.add_items(rows) for rows in batches]
+            ids = [r["id"] for r in await store.list_items()]
+            toggles = [await store.toggle_purchased(ids[0], 2.5), await store.toggle_purchased(ids[1]),
+                       await store.toggle_purchased(ids[1]), await store.toggle_purchased(-1)]
+            return counts, toggles, await store.list_items()
+        finally:
+            await store.dispose()
+
+    async_counts, async_toggles, async_rows = asyncio.run(run())
+    assert async_counts == sync_counts == [{"updated": 0, "inserted": 3}, {"updated": 1, "inserted": 1}]
+    assert async_toggles == sync_toggles == [True, True, False, False]
+
+    def strip(rows):
+        return [{k: v for k, v in r.items() if k not in ("id", "added_at")} for r in rows]
+    assert strip(async_rows) == strip(sync_rows)
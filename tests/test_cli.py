@@ -0,0 +1,21 @@
+import pytest
+
+import cli
+
+@pytest.mark.parametrize("argv", [
+    ["apply", "missing.ndjson"],
+    ["recipe", "import", "--file", "missing.txt"],
+    ["import", "missing.csv"],
+    ["import", "."],
+])
+def test_unreadable_files_are_a_one_line_error(argv, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    assert cli.run(cli.build_parser().parse_args(argv)) == 2
+    out, err = capsys.readouterr()
+    assert out == "" and err.startswith("error: ") and err.count("\n") == 1
+
+def test_text_lists_only_import_into_the_grocery_list(tmp_path, capsys):
+    path = tmp_path / "list.txt"
+    path.write_text("milk\n")
+    assert cli.run(cli.build_parser().parse_args(["import", str(path), "--into", "pantry"])) == 2
+    assert capsys.readouterr().err == "error: legacy text lists can only be imported into the grocery list\n"
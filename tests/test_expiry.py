@@ -0,0 +1,93 @@
+import threading
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import expiry
+
+TODAY = date(2030, 6, 10)
+
+class Collect:
+    def __init__(self):
+        self.digests = []
+
+    def send(self, digest):
+        self.digests.append(digest)
+
+class Broken:
+    def send(self, digest):
+        raise OSError("mail server down")
+
+def _day(n):
+    return (TODAY + timedelta(days=n)).isoformat()
+
+def _names(digest):
+    return [e["name"] for e in digest.expired], [e["name"] for e in digest.expiring]
+
+def _update(item_id, **values):
+    import db
+    with db.get_engine().begin() as conn:
+        conn.execute(db.pantry_items.update().where(db.pantry_items.c.id == item_id).values(**values))
+
+def test_each_crossing_is_reported_once(store):
+    import db
+    db.add_pantry_items([
+        {"name": "milk", "expires_at": _day(-2)},
+        {"name": "yogurt", "expires_at": _day(1)},
+        {"name": "cheese", "expires_at": _day(3)},
+        {"name": "rice", "expires_at": _day(30)},
+        {"name": "salt"},
+    ])
+    sink = Collect()
+    assert _names(expiry.scan(3, [sink], today=TODAY)) == (["milk"], ["yogurt", "cheese"])
+    assert len(sink.digests) == 1
+    # Nothing new: no digest is sent
+    assert not expiry.scan(3, [sink], today=TODAY)
+    assert len(sink.digests) == 1
+    # Two days on, yogurt has expired and nothing else crossed
+    assert _names(expiry.scan(3, [sink], today=TODAY + timedelta(days=2))) == (["yogurt"], [])
+    assert _names(expiry.scan(3, [sink], today=TODAY + timedelta(days=4))) == (["cheese"], [])
+
+def test_late_rows_and_new_dates_are_reported(store):
+    import db
+    db.add_pantry_items([{"name": "rice", "expires_at": _day(30)}])
+    assert not expiry.scan(3, today=TODAY)
+    # Committed after the scan, but stamped before it
+    db.add_pantry_items([{"name": "tofu", "expires_at": _day(1)}])
+    ids = {r["name"]: r["id"] for r in db.list_pantry_items()}
+    _update( ids["tofu"], added_at=datetime(2020, 1, 1))
+    assert _names(expiry.scan(3, today=TODAY)) == ([], ["tofu"])
+    # Dates moved into (and within) the window already scanned
+    _update( ids["rice"], expires_at=TODAY - timedelta(days=1))
+    _update( ids["tofu"], expires_at=TODAY + timedelta(days=2))
+    assert _names(expiry.scan(3, today=TODAY)) == (["rice"], ["tofu"])
+    assert not expiry.scan(3, today=TODAY)
+
+def test_failed_delivery_is_retried(store):
+    import db
+    db.add_pantry_items([{"name": "yogurt", "expires_at": _day(1)}])
+    with pytest.raises(OSError):
+        expiry.scan(3, [Collect(), Broken()], today=TODAY)
+    sink = Collect()
+    assert _names(expiry.scan(3, [sink], today=TODAY)) == ([], ["yogurt"])
+    assert len(sink.digests) == 1
+
+def test_concurrent_first_scans_report_once(household):
+    import db
+    db.add_pantry_items([{"name": "yogurt", "expires_at": _day(1)}])
+    barrier, found, errors = threading.Barrier(4), [], []
+
+    def run():
+        try:
+            with db.use_list(household[1]):
+                barrier.wait()
+                found.extend(_names(expiry.scan(3, today=TODAY))[1])
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == [] and found == ["yogurt"]
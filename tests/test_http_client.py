@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import pytest
+
+import http_client
+import recipes
+from http_client import ResponseCache
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self):
+        self.now += 0.001  # every call is a distinct instant, as LRU order needs
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(http_client, "time", SimpleNamespace(time=clock.time, perf_counter=clock.time))
+    return clock
+
+def test_cache_hit_skips_the_api(stub, extract_cache):
+    url = "https://example.com/recipe/1"
+    first = recipes.spoonacular_from_url(url)
+    second = recipes.spoonacular_from_url(url + "#comments")  # same recipe
+    assert second == first
+    assert first["title"] == "Recipe 1"
+    assert stub.hits[url] == 1
+
+def test_cache_bypass_refetches(stub, extract_cache):
+    url = "https://example.com/recipe/2"
+    recipes.spoonacular_from_url(url)
+    recipes.spoonacular_from_url(url, use_cache=False)
+    assert stub.hits[url] == 2
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "c.sqlite3"), ttl_seconds=60)
+    cache.put("a", {"v": 1})
+    clock.now += 59
+    assert cache.get("a") == {"v": 1}
+    clock.now += 2
+    assert cache.get("a") is None
+
+def test_least_recently_used_is_evicted_at_the_cap(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "c.sqlite3"), max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # b is now the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+@pytest.mark.parametrize("statuses", [[429], [503], [500, 502]])
+def test_retries_throttling_and_server_errors(stub, extract_cache, statuses):
+    url = f"https://example.com/recipe/{'-'.join(map(str, statuses))}"
+    stub.script[url] = list(statuses)
+    data = recipes.spoonacular_from_url(url)
+    assert data["ingredients"]
+    assert stub.hits[url] == len(statuses) + 1
+    # Only the success was cached
+    assert extract_cache.get(url) == data
+
+def test_client_errors_are_not_retried(stub, extract_cache):
+    import requests
+    url = "https://example.com/recipe/missing"
+    stub.script[url] = [404]
+    with pytest.raises(requests.HTTPError) as e:
+        recipes.spoonacular_from_url(url)
+    assert "apiKey" not in str(e.value)
+    assert stub.hits[url] == 1
@@ -0,0 +1,46 @@
+import importer
+
+def _import(tmp_path, name, content, into=None):
+    path = tmp_path / name
+    path.write_text(content)
+    return importer.import_file(str(path), into)
+
+def test_grocery_import_merges_like_add_items(household, tmp_path):
+    import db
+    db.add_items([{"name": "tomato", "quantity": 1, "unit": "cup"}])
+    summary = _import(tmp_path, "groceries.csv", "\n".join([
+        "name,quantity,unit,purchased,added_at",
+        "Tomatoes,2,cup,,2025-01-02 10:00:00",          # merges into the tomato row
+        "rice,1,kg,,2025-01-03 09:00:00",
+        "Rice,0.5,kg,,2025-01-01 08:00:00",             # same ingredient: one new row
+        "bread,1,,,",
+        "milk,2,l,yes,2025-01-04 12:00:00",             # history only
+        ",1,kg,,",
+    ]), into="grocery")
+    assert summary == {"read": 5, "updated": 1, "inserted": 2, "history": 1,
+                       "errors": [{"line": 7, "error": "missing name"}]}
+    rows = {r["name"]: r for r in db.list_items()}
+    assert rows.keys() == {"tomato", "rice", "bread"}
+    assert (rows["tomato"]["quantity"], rows["rice"]["quantity"]) == (3, 1.5)
+    # The earliest timestamp of the group is kept; untimed rows are stamped now
+    assert rows["rice"]["added_at"] == "2025-01-01 08:00"
+    assert rows["bread"]["added_at"] > "2026"
+
+def test_pantry_import_merges_like_checkout(household, tmp_path):
+    import db
+    db.add_items([{"name": "eggs", "quantity": 6, "unit": None}])
+    db.purchase_items([r["id"] for r in db.list_items()], {})
+    summary = _import(tmp_path, "pantry.csv", "\n".join([
+        "name,quantity,unit,expires_at,added_at",
+        "egg,4,,,",                                      # merges into the checked-out eggs
+        "yogurt,1,,2025-02-01,2025-01-20 07:30:00",
+        "Yogurt,2,,2025-02-01,",
+        "yogurt,1,,2025-02-05,",
+    ]))
+    assert summary == {"read": 4, "updated": 1, "inserted": 2, "errors": []}
+    rows = [(r["name"], r["quantity"], r["expires_at"]) for r in db.list_pantry_items()]
+    assert sorted(rows, key=str) == sorted([
+        ("eggs", 10, None), ("yogurt", 3, "2025-02-01"), ("yogurt", 1, "2025-02-05"),
+    ], key=str)
+    added = {r["expires_at"]: r["added_at"] for r in db.list_pantry_items()}
+    assert added["2025-02-01"] == "2025-01-20 07:30"
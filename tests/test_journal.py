@@ -0,0 +1,134 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+import journal
+from journal import Journal
+
+@pytest.fixture
+def queue(tmp_path):
+    j = Journal(str(tmp_path / "journal.sqlite3"))
+    yield j
+    j.close()
+
+@pytest.fixture
+def unreachable(monkeypatch):
+    """db pointed at a port nothing listens on."""
+    import db
+    eng = create_engine("postgresql+psycopg2://grocery@127.0.0.1:1/grocery", future=True)
+    monkeypatch.setattr(db, "_engine", eng)
+    yield eng
+    eng.dispose()
+
+def _quantities():
+    import db
+    return {r["name"]: r["quantity"] for r in db.list_items()}
+
+def test_resync_skips_operations_already_applied(household, queue):
+    _, list_id = household
+    queue.append([{"op": "add", "name": "milk", "quantity": 2, "unit": None},
+                  {"op": "add", "name": "eggs", "quantity": 6, "unit": None},
+                  {"op": "add", "name": "milk", "quantity": 1, "unit": None}], list_id)
+    summary = journal.sync(queue, batch_size=2)
+    assert (summary["applied"], summary["skipped"], summary["pending"]) == (3, 0, 0)
+    assert _quantities() == {"milk": 3, "eggs": 6}
+    assert journal.sync(queue)["applied"] == 0  # nothing pending
+
+    # The acknowledgement was lost: the same operations are sent again
+    with queue._db() as conn:
+        conn.execute("UPDATE operations SET synced_at = NULL")
+    summary = journal.sync(queue, batch_size=2)
+    assert (summary["applied"], summary["skipped"], summary["pending"]) == (0, 3, 0)
+    assert _quantities() == {"milk": 3, "eggs": 6}
+
+def test_bad_operations_are_rejected_and_the_rest_applied(household, queue):
+    _, list_id = household
+    queue.append([{"op": "add", "name": "milk", "quantity": 1, "unit": None},
+                  {"op": "remove", "id": "twelve"},
+                  {"op": "pantry_add", "name": "rice", "quantity": "lots", "unit": None, "expires_at": None},
+                  {"op": "purchase", "id": 1, "price": "cheap"},  # fails in the database
+                  {"op": "add", "name": "eggs", "quantity": 6, "unit": None}], list_id)
+    summary = journal.sync(queue)
+    assert summary["applied"] == 2
+    assert [r["seq"] for r in summary["rejected"]] == [2, 3, 4]
+    assert queue.counts() == {"pending": 0, "rejected": 3}
+    assert _quantities() == {"milk": 1, "eggs": 6}
+    # Rejected operations are never retried
+    assert journal.sync(queue)["rejected"] == []
+
+def test_unreachable_database_keeps_everything_queued(unreachable, queue):
+    queue.append([{"op": "add", "name": "milk", "quantity": 1, "unit": None}], 1)
+    summary = journal.sync(queue)
+    assert summary["offline"] and summary["pending"] == 1
+    assert queue.counts() == {"pending": 1, "rejected": 0}
+
+def _answers(monkeypatch, *answers):
+    it = iter(answers)
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(it))
+
+def test_menu_write_is_queued_when_the_database_is_unreachable(unreachable, queue, monkeypatch, capsys):
+    import grocery
+    monkeypatch.setattr(journal, "Journal", lambda: queue)
+    _answers(monkeypatch, "rice", "2", "kg", "2030-01-01")
+    grocery.add_pantry()
+    assert "Queued 1 operation(s)" in capsys.readouterr().out
+    assert [op for _, _, _, op in queue.pending()] == [
+        {"op": "pantry_add", "name": "rice", "quantity": 2.0, "unit": "kg", "expires_at": "2030-01-01"},
+    ]
+
+def test_offline_menu_works_from_the_list_last_shown(household, queue, monkeypatch, capsys, request):
+    import db
+    import grocery
+    db.add_items([{"name": "milk", "quantity": 1, "unit": None}, {"name": "eggs", "quantity": 6, "unit": None},
+                  {"name": "bread", "quantity": 1, "unit": None}])
+    monkeypatch.setattr(journal, "Journal", lambda: queue)
+    assert [l["name"] for l in grocery.show_list()] == ["bread", "eggs", "milk"]
+
+    # Offline from here on: nothing may touch the database
+    engine = db.get_engine()
+    request.getfixturevalue("unreachable")
+    monkeypatch.setattr(grocery, "JOURNAL", queue)
+    monkeypatch.setattr(grocery, "NAMES", None)
+    _answers(monkeypatch, "jam", "2", "")
+    grocery.add_item()
+    _answers(monkeypatch, "1")
+    grocery.remove_item()
+    _answers(monkeypatch, "all")
+    grocery.checkout()
+    capsys.readouterr()
+    assert [(l["name"], l["purchased"]) for l in grocery.show_list()] == [("eggs", True), ("milk", True)]
+    assert "as last shown" in capsys.readouterr().out
+
+    monkeypatch.setattr(db, "_engine", engine)
+    summary = journal.sync(queue)
+    assert (summary["applied"], summary["rejected"]) == (4, [])
+    assert {r["name"]: (r["quantity"], r["purchased"]) for r in db.list_items()} == {
+        "milk": (1, True), "eggs": (6, True), "jam": (2, False)}
+    assert sorted(r["name"] for r in db.list_pantry_items()) == ["eggs", "milk"]
+
+def test_menu_shows_the_list_last_shown_when_the_database_is_unreachable(unreachable, queue, monkeypatch, capsys):
+    import grocery
+    queue.save_list(1, [{"id": 7, "ids": [7], "key": "milk", "family": "", "name": "milk", "purchased": False,
+                         "added_at": "2030-01-01 09:00", "quantity": 1, "unit": None}])
+    monkeypatch.setattr(journal, "Journal", lambda: queue)
+    assert [l["name"] for l in grocery.show_list()] == ["milk"]
+    out = capsys.readouterr().out
+    assert "Database unreachable." in out and "1. ☐ milk" in out
+
+def test_failed_statements_are_not_queued(household, queue, monkeypatch):
+    import db
+    import grocery
+    from sqlalchemy.exc import OperationalError
+
+    def slow():
+        with db.get_engine().begin() as conn:
+            conn.execute(text("SET LOCAL statement_timeout = 1"))
+            conn.execute(text("SELECT pg_sleep(1)"))
+
+    # A statement timeout is an OperationalError too, but the server is up
+    with pytest.raises(OperationalError) as e:
+        slow()
+    assert not journal.is_unreachable(e.value)
+    monkeypatch.setattr(journal, "Journal", lambda: queue)
+    with pytest.raises(OperationalError):
+        grocery._write([{"op": "remove", "id": 1}], slow)
+    assert queue.counts() == {"pending": 0, "rejected": 0}
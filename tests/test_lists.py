@@ -0,0 +1,16 @@
+import cli
+
+def test_duplicate_list_name_is_reported(household, capsys):
+    import db
+    args = cli.build_parser().parse_args(["lists", "add", "Groceries"])
+    assert cli.run(args) == 2
+    assert "already exists" in capsys.readouterr().err
+    assert [l["name"] for l in db.get_lists()] == ["Groceries"]
+
+def test_switching_to_a_duplicate_name_stays_put(household, monkeypatch, capsys):
+    import db
+    import grocery
+    monkeypatch.setattr("builtins.input", lambda prompt="": "Groceries")
+    grocery.switch_list()
+    assert "already exists" in capsys.readouterr().out
+    assert db.current_scope() == household
@@ -0,0 +1,48 @@
+import time
+
+from sqlalchemy import text
+
+def _lines(rows):
+    return [(r["purchased"], r["key"], r["family"], r["ids"], r["quantity"], r["unit"]) for r in rows]
+
+def _insert_snapped(household, name, catalog_name):
+    # A row stored under another catalog name, as db.add_items(snap=...) leaves it
+    import db
+    household_id, list_id = household
+    with db.get_engine().begin() as conn:
+        conn.execute(text("""
+            INSERT INTO grocery_items (name, purchased, added_at, quantity, household_id, list_id, ingredient_id)
+            VALUES (:name, false, CURRENT_TIMESTAMP, 2, :household_id, :list_id, :ingredient_id)
+        """), {"name": name, "household_id": household_id, "list_id": list_id,
+               "ingredient_id": db.ingredient_ids([catalog_name])[0]})
+
+def test_groups_like_the_database(household):
+    import db
+    from live_cache import LiveCache
+    db.add_items([{"name": "tomato", "quantity": 1, "unit": None}, {"name": "rice", "quantity": 1, "unit": "kg"}])
+    _insert_snapped(household, "roma tomatoes", "tomato")
+    live = LiveCache().start()
+    try:
+        assert _lines(live.shopping_list()) == _lines(db.shopping_list())
+        # A delta whose catalog name the cache hasn't seen yet
+        _insert_snapped(household, "bell peppers", "pepper")
+        deadline = time.monotonic() + 5
+        while not live.poll(0.2) and time.monotonic() < deadline:
+            pass
+        assert _lines(live.shopping_list()) == _lines(db.shopping_list())
+    finally:
+        live.close()
+
+def test_listener_connection_never_returns_to_the_pool(household):
+    import db
+    from live_cache import LiveCache
+    engine = db.get_engine()
+    LiveCache().start().close()
+    conns = [engine.raw_connection() for _ in range(engine.pool.size())]
+    try:
+        assert not any(c.driver_connection.autocommit for c in conns)
+    finally:
+        for c in conns:
+            c.close()
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM pg_listening_channels()")).scalar() == 0
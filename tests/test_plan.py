@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+
+def _kitchen(db):
+    today = date.today()
+    pancakes = db.create_recipe("pancakes", None, [
+        {"name": "eggs", "quantity": 2}, {"name": "flour", "quantity": 1, "unit": "cup"},
+        {"name": "milk", "quantity": 250, "unit": "ml"},
+    ])
+    cake = db.create_recipe("cake", None, [
+        {"name": "egg", "quantity": 3}, {"name": "flour", "quantity": 2, "unit": "cups"},
+        {"name": "butter", "quantity": 100, "unit": "g"},
+    ])
+    db.add_pantry_items([
+        {"name": "eggs", "quantity": 4},
+        {"name": "milk", "quantity": 1, "unit": "l", "expires_at": (today + timedelta(days=2)).isoformat()},
+        {"name": "butter", "quantity": 250, "unit": "g", "expires_at": (today - timedelta(days=1)).isoformat()},
+    ])
+    return [pancakes, cake]
+
+def _rounded(rows):
+    return [(r["name"], r["unit"], round(r["needed"], 3), round(r["have"], 3), round(r["missing"], 3)) for r in rows]
+
+def test_plan_adds_only_the_shortfall(store):
+    import db
+    recipe_ids = _kitchen(db)
+    expected = [
+        ("butter", "g", 100, 0, 100),     # the pantry's butter has expired
+        ("eggs", None, 5, 4, 1),
+        ("flour", "cup", 3, 0, 3),
+        ("milk", "ml", 250, 1000, 0),
+    ]
+    assert _rounded(db.plan_recipes(recipe_ids, dry_run=True)) == expected
+    assert db.list_items() == []
+    assert _rounded(db.plan_recipes(recipe_ids)) == expected
+    assert sorted((r["name"], r["quantity"], r["unit"]) for r in db.list_items()) == [
+        ("butter", 100, "g"), ("eggs", 1, None), ("flour", 3, "cup"),
+    ]
@@ -0,0 +1,26 @@
+from sqlalchemy import select
+
+def test_purchase_moves_rows_into_the_pantry(store):
+    import db
+    db.add_items([{"name": "milk", "quantity": 2, "unit": "l"}, {"name": "eggs", "quantity": 6, "unit": None},
+                  {"name": "bread", "quantity": 1, "unit": None}])
+    db.add_pantry_items([{"name": "egg", "quantity": 4}])
+    ids = {r["name"]: r["id"] for r in db.list_items()}
+    flipped = db.purchase_items(list(ids.values()) + [-1], {
+        ids["milk"]: {"quantity": 1.5, "unit": "l", "expires_at": "2030-01-05", "price": 2.5},
+        ids["bread"]: {"pantry": False, "price": 1},
+    })
+    assert sorted((r["name"], r["quantity"]) for r in flipped) == [("bread", 1), ("eggs", 6), ("milk", 2)]
+    # Already purchased: nothing is stocked twice
+    assert db.purchase_items(list(ids.values())) == []
+
+    assert all(r["purchased"] for r in db.list_items())
+    pantry = sorted((r["name"], r["quantity"], r["unit"], r["expires_at"]) for r in db.list_pantry_items())
+    assert pantry == [("egg", 10, None, None), ("milk", 1.5, "l", "2030-01-05")]
+    h = db.purchase_history.c
+    with db.get_engine().begin() as conn:
+        history = conn.execute(
+            select(h.name, h.quantity, h.price, h.delta)
+            .where(h.household_id == db.current_scope()[0]).order_by(h.item_id)
+        ).all()
+    assert sorted(map(tuple, history)) == [("bread", 1, 1, 1), ("eggs", 6, None, 1), ("milk", 2, 2.5, 1)]
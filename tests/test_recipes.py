@@ -0,0 +1,128 @@
+import pytest
+from sqlalchemy import func, select
+
+import recipes
+
+URLS = [f"https://example.com/recipe/{i}" for i in range(1, 6)]
+
+@pytest.mark.parametrize("line, expected", [
+    # fractions
+    ("1/2 cup sugar", (0.5, "cup", "sugar")),
+    ("1 1/2 cups milk", (1.5, "cup", "milk")),
+    (".5 kg rice", (0.5, "kg", "rice")),
+    # vulgar fractions
+    ("1½ cups milk", (1.5, "cup", "milk")),
+    ("½ tsp salt", (0.5, "tsp", "salt")),
+    ("2 ¾ cups flour", (2.75, "cup", "flour")),
+    # ranges take the upper bound
+    ("2-3 carrots", (3.0, None, "carrot")),
+    ("1 to 2 tbsp olive oil", (2.0, "tbsp", "olive oil")),
+    ("1–1½ lb beef", (1.5, "lb", "beef")),
+    # parenthesized sizes: the container word is dropped
+    ("2 (14 oz) cans tomatoes", (28.0, "oz", "tomato")),
+    ("(14 oz) can tomatoes", (14.0, "oz", "tomato")),
+    ("2 (8-oz) packages cream cheese", (16.0, "oz", "cream cheese")),
+    # unit-less counts and bare names
+    ("3 large eggs", (3.0, None, "large egg")),
+    ("- 4 tomatoes", (4.0, None, "tomato")),
+    ("salt", (None, None, "salt")),
+    # a unit with no name
+    ("10 oz", (10.0, "oz", "")),
+    ("1 tbsp. butter", (1.0, "tbsp", "butter")),
+])
+def test_parse_quantity_unit(line, expected):
+    assert recipes.parse_quantity_unit(line) == expected
+
+def test_pasted_lines_without_a_name_are_skipped():
+    data = recipes.parse_pasted_ingredients(" Stew ", "2 cups stock\n\n10 oz\n3 large eggs\n")
+    assert data["title"] == "Stew"
+    assert data["ingredients"] == [{"name": "stock", "quantity": 2.0, "unit": "cup"},
+                                   {"name": "large egg", "quantity": 3.0, "unit": None}]
+
+def test_one_failing_url_leaves_the_rest_of_the_batch(stub, extract_cache):
+    stub.script[URLS[2]] = [404]
+    results = recipes.fetch_recipes(URLS + [URLS[0]], max_workers=4)
+    assert [url for url, _, _ in results] == URLS  # input order, duplicate fetched once
+    assert stub.hits[URLS[0]] == 1
+    for url, data, err in results:
+        if url == URLS[2]:
+            assert data is None and "404" in str(err)
+        else:
+            assert err is None and data["title"] == f"Recipe {url[-1]}"
+
+def test_blank_urls_are_ignored(stub, extract_cache):
+    assert recipes.fetch_recipes(["", "  "]) == []
+    assert not stub.hits
+
+def _recipe_titles(conn, household_id):
+    import db
+    return list(conn.execute(
+        select(db.recipes.c.title).where(db.recipes.c.household_id == household_id).order_by(db.recipes.c.id)
+    ).scalars())
+
+def test_import_recipes_in_batches(household, stub, extract_cache):
+    import db
+    fetched = [data for _, data, err in recipes.fetch_recipes(URLS) if err is None]
+    ids = db.import_recipes(fetched, batch_size=2)
+    assert len(ids) == len(URLS) == len(set(ids))
+    with db.get_engine().connect() as conn:
+        assert _recipe_titles(conn, household[0]) == [d["title"] for d in fetched]
+        n = conn.execute(select(func.count()).select_from(db.recipe_ingredients)
+                         .where(db.recipe_ingredients.c.recipe_id.in_(ids))).scalar()
+    assert n == 2 * len(URLS)
+    # Every recipe's ingredients were merged into the list
+    totals = {(r["name"], r["unit"]): r["quantity"] for r in db.list_items()}
+    assert totals[("tomato", "cup")] == 2 * len(URLS)
+
+def test_failed_batch_keeps_the_committed_ones(household, stub, extract_cache):
+    import db
+    fetched = [data for _, data, err in recipes.fetch_recipes(URLS) if err is None]
+    fetched[3] = {**fetched[3], "title": None}  # NOT NULL violation in the second batch
+    with pytest.raises(Exception):
+        db.import_recipes(fetched, batch_size=2)
+    with db.get_engine().connect() as conn:
+        assert _recipe_titles(conn, household[0]) == [d["title"] for d in fetched[:2]]
+
+# Every Python whitespace character around and between words, every ASCII
+# character, plurals, and non-ASCII letters and digits (kept by both)
+TRICKY_NAMES = (
+    [f"{chr(c)}Red{chr(c)}{chr(c)}Onions{chr(c)}" for c in range(0x110000) if chr(c).isspace()]
+    + [f"Ab{chr(c)}cd" for c in range(1, 128)]
+    + ["", "   ", "\t", "ies", "fries", "berries", "gas", "peas", "glasses", "boxes", "es", "Cherry  Tomatoes",
+       "salt &", "& salt", "O'Brien potatoes", "half-and-half", "snake_case", "100% juice", "x--y",
+       "jalapeños", "crème fraîche", "phở", "½ avocados", "１２ eggs"]
+)
+
+def test_sql_canonical_name_matches_python(household):
+    import db
+    from sqlalchemy import text
+    with db.get_engine().connect() as conn:
+        sql = [conn.execute(text("SELECT canonical_name(:n)"), {"n": n}).scalar() for n in TRICKY_NAMES]
+    assert sql == [recipes.canonical_name(n) for n in TRICKY_NAMES]
+
+def test_catalog_links_are_recomputed_in_python(household):
+    import db
+    import migrations
+    from sqlalchemy import text
+    household_id, list_id = household
+    with db.get_engine().connect() as conn, conn.begin() as tx:
+        migrations._unit_conversions(conn)  # step 4's canonical_name() again, until the rollback
+        old = conn.execute(text("SELECT canonical_name(:n)"), {"n": "Jalapeños\t"}).scalar()
+        for name in (old, "tomato"):
+            conn.execute(text("INSERT INTO ingredients (name) VALUES (:n) ON CONFLICT (name) DO NOTHING"), {"n": name})
+        rows = {}
+        for name, linked in (("Jalapeños\t", old), ("roma tomatoes", "tomato")):
+            rows[name] = conn.execute(text("""
+                INSERT INTO grocery_items (name, purchased, added_at, quantity, household_id, list_id, ingredient_id)
+                VALUES (:name, false, CURRENT_TIMESTAMP, 1, :h, :l, (SELECT id FROM ingredients WHERE name = :linked))
+                RETURNING id
+            """), {"name": name, "h": household_id, "l": list_id, "linked": linked}).scalar()
+        migrations._canonical_names(conn)
+        linked = dict(conn.execute(text("""
+            SELECT g.name, i.name FROM grocery_items g JOIN ingredients i ON i.id = g.ingredient_id
+            WHERE g.id IN (:a, :b)
+        """), {"a": rows["Jalapeños\t"], "b": rows["roma tomatoes"]}).all())
+        assert old != "jalapeño"
+        # Snapped rows keep the ingredient they were snapped to
+        assert linked == {"Jalapeños\t": "jalapeño", "roma tomatoes": "tomato"}
+        tx.rollback()
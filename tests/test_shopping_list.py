@@ -0,0 +1,51 @@
+ITEMS = [
+    {"name": "tomato", "quantity": 1, "unit": "cup"},
+    {"name": "tomatoes", "quantity": 250, "unit": "ml"},
+    {"name": "rice", "quantity": 500, "unit": "g"},
+    {"name": "rice", "quantity": 1, "unit": "kg"},
+    {"name": "eggs", "quantity": 6, "unit": None},
+    {"name": "milk", "quantity": None, "unit": None},
+    {"name": "basil", "quantity": 1, "unit": "bunch"},
+]
+
+def _walk(db, limit):
+    pages, after = [], None
+    while True:
+        page = db.shopping_list_page(after, limit)
+        pages += page
+        if len(page) < limit:
+            return pages
+        after = page[-1]
+
+def _check_pages(db):
+    db.add_items(ITEMS)
+    db.toggle_purchased(next(r["id"] for r in db.list_items() if r["name"] == "basil"))
+    full = db.shopping_list()
+    assert [l["key"] for l in full] == ["egg", "milk", "rice", "tomato", "basil"]
+    assert [(l["quantity"], l["unit"], len(l["ids"])) for l in full[2:4]] == [(1.5, "kg", 2), (2.057, "cup", 2)]
+    for limit in (1, 2, 5):
+        assert _walk(db, limit) == full
+
+def test_pages_walk_the_whole_list(household):
+    import db
+    _check_pages(db)
+
+def test_pages_on_sqlite(sqlite_db):
+    _check_pages(sqlite_db)
+
+def test_python_grouping_matches_the_sql(household):
+    # Units stored as typed (legacy rows, direct inserts), not canonicalized
+    import db
+    from sqlalchemy import text
+    household_id, list_id = household
+    rows = [("sugar", 2, "tbsp."), ("sugar", 1, "Tbsp"), ("sugars", 1, "tablespoons"),
+            ("oil", 0, "ml"), ("oil", 1, "TSP"), ("chips", 1, "bag"), ("chips", 2, "Bag"),
+            ("chips", 1, None), ("salt", 0.5, "pinches"), ("salt", 1, "pinch"), ("flour", 1, " cup")]
+    with db.get_engine().begin() as conn:
+        conn.execute(text("""
+            INSERT INTO grocery_items (name, purchased, added_at, quantity, unit, household_id, list_id)
+            VALUES (:name, false, CURRENT_TIMESTAMP, :quantity, :unit, :household_id, :list_id)
+        """), [{"name": n, "quantity": q, "unit": u, "household_id": household_id, "list_id": list_id}
+               for n, q, u in rows])
+    with db.get_engine().connect() as conn:
+        assert db._shopping_list_portable(conn) == db.shopping_list()